@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+Модуль bench_parse_table.py
+---------------------------
+Замер времени разбора ячеек таблицы Word: однопроходная сборка промежуточного
+представления (build_block) и построение <entry> из него (cell_entry) против
+прежней схемы с поиском по потомкам (gridspan + vmerged + parse_cell со
+своими .//w:r, .//w:t, .//w:footnoteReference и склейкой текста f-строками).
+
+Таблица генерируется: у ячеек есть свойства (<w:tcPr>), объединения,
+несколько абзацев и фрагментов текста, часть ячеек со сносками.
+
+Запуск из корня репозитория (нужен settings.ini):
+    python -m benchmarks.bench_parse_table --rows 2000 --cols 8
+"""
+
+import time
+import random
+import argparse
+import xml.etree.ElementTree as ET
+
+from dita.services.docx_body import build_block
+from dita.services.docx_tables import cell_entry, parse_table
+
+W = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+_W = f'{{{W}}}'
+
+
+def make_table(rows: int, cols: int, seed: int = 1) -> ET.Element:
+    """Генерирует <w:tbl> размером rows × cols с объединениями и сносками."""
+    rnd = random.Random(seed)
+    cells_xml = []
+    for r in range(rows):
+        row = []
+        for c in range(cols):
+            props = ['<w:tcW w:w="1200" w:type="dxa"/>']
+            if r and c == 0 and rnd.random() < 0.5:
+                props.append('<w:vMerge/>')
+            elif c == cols - 1 and rnd.random() < 0.1:
+                props.append('<w:gridSpan w:val="1"/>')
+            paragraphs = []
+            for p in range(rnd.randint(1, 3)):
+                runs = ''.join(
+                    f'<w:r><w:rPr><w:b/></w:rPr><w:t xml:space="preserve">cell {r}.{c} part {n} </w:t></w:r>'
+                    for n in range(rnd.randint(1, 4))
+                )
+                if rnd.random() < 0.05:
+                    runs += f'<w:r><w:footnoteReference w:id="{r}"/></w:r>'
+                paragraphs.append(f'<w:p><w:pPr><w:spacing w:after="0"/></w:pPr>{runs}</w:p>')
+            row.append(f'<w:tc><w:tcPr>{"".join(props)}</w:tcPr>{"".join(paragraphs)}</w:tc>')
+        cells_xml.append(f'<w:tr>{"".join(row)}</w:tr>')
+    grid = ''.join('<w:gridCol w:w="1200"/>' for _ in range(cols))
+    return ET.fromstring(f'<w:tbl xmlns:w="{W}"><w:tblGrid>{grid}</w:tblGrid>{"".join(cells_xml)}</w:tbl>')
+
+
+def vmerged(cell):
+    """Прежняя проверка вертикального объединения: поиск <w:vMerge> по потомкам ячейки."""
+    v_merge = cell.find(f'.//{_W}vMerge')
+    if v_merge is None:
+        return False
+    # val="restart" — начало объединения, без val — продолжение
+    return v_merge.get(f'{_W}val') != "restart"
+
+
+def gridspan(cell):
+    """Прежнее чтение w:gridSpan: поиск по потомкам ячейки (значение или None)."""
+    span = cell.find(f'.//{_W}gridSpan')
+    return span.get(f'{_W}val') if span is not None else None
+
+
+def legacy_cell(cell):
+    """Прежняя схема доступа к ячейке: отдельные поиски по потомкам для каждого признака."""
+    span = gridspan(cell)
+    merged = vmerged(cell)
+    entry = ET.Element('entry')
+    for paragraph in cell.findall(f'{_W}p'):
+        paragraph.find(f'.//{_W}numPr')
+        el = ET.SubElement(entry, 'div')
+        text_buffer = ""
+        for run in paragraph.findall(f'.//{_W}r'):
+            footnote = run.find(f'.//{_W}footnoteReference')
+            if footnote is not None:
+                el.text = text_buffer
+                text_buffer = ""
+                continue
+            for t_el in run.findall(f'.//{_W}t'):
+                text_buffer = f"""{text_buffer}{t_el.text}"""
+        el.text = text_buffer
+    return span, merged, entry
+
+
+def bench(func, items, repeat: int) -> float:
+    """Лучшее из repeat время обработки всех элементов функцией func (секунды)."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in items:
+            func(item)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замер разбора ячеек таблицы Word")
+    parser.add_argument('--rows', type=int, default=2000, help="число строк таблицы")
+    parser.add_argument('--cols', type=int, default=8, help="число колонок таблицы")
+    parser.add_argument('--repeat', type=int, default=5, help="число повторов (берётся лучшее)")
+    args = parser.parse_args()
+
+    table = make_table(args.rows, args.cols)
+    cells = table.findall(f'{_W}tr/{_W}tc')
+
+    legacy = bench(legacy_cell, cells, args.repeat)
+    built = bench(build_block, [table], args.repeat)
+    word_cells = [cell for row in build_block(table).rows for cell in row]
+    rendered = bench(cell_entry, word_cells, args.repeat)
+
+    start = time.perf_counter()
+    parse_table(table)
+    whole = time.perf_counter() - start
+
+    per_cell = 1e6 / len(cells)
+    print(f"cells: {len(cells)} ({args.rows} x {args.cols})")
+    print(f"descendant searches: {legacy * per_cell:8.2f} us/cell")
+    print(f"build_block:         {built * per_cell:8.2f} us/cell")
+    print(f"cell_entry:          {rendered * per_cell:8.2f} us/cell  (x{legacy / (built + rendered):.2f} together)")
+    print(f"parse_table:         {whole:8.3f} s total")
+
+
+if __name__ == '__main__':
+    main()
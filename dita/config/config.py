@@ -1,5 +1,6 @@
 import configparser
-from dita.services.docx import Docx
+import logging
+import os
 
 config = configparser.ConfigParser()
 config.read('settings.ini')
@@ -11,11 +12,84 @@ document_type = config['settings']['document_type']
 # Флаги обработки
 process_tables_in_docx = config.getboolean('tables', 'process_docx')
 process_text_in_tables = config.getboolean('tables', 'process_text')
+# Число процессов для конвертации таблиц (0 или 1 — в текущем процессе), не больше числа ядер
+table_workers = min(config.getint('tables', 'workers', fallback=8), os.cpu_count() or 1)
 
 process_images_in_docx = config.getboolean('images', 'process_docx')
 process_icons_in_docx  = config.getboolean('images', 'process_icons')
+# Контентно-адресуемое хранилище изображений (общее для всех документов публикации)
+image_store = config.get('images', 'store', fallback=f"{output_dir}/images")
+# Число потоков для извлечения медиафайлов из .docx (0 или 1 — в текущем потоке)
+media_workers = config.getint('images', 'workers', fallback=min(8, os.cpu_count() or 1))
 
-try:
-    docx = Docx()
-except Exception as e:
-    docx = None
\ No newline at end of file
+# Потоковое чтение document.xml (по одному блоку тела вместо всего дерева)
+docx_streaming = config.getboolean('docx', 'streaming', fallback=False)
+# Число процессов для разбора document.xml по чанкам (0 или 1 — последовательно), не больше числа ядер
+docx_workers = min(config.getint('docx', 'workers', fallback=1), os.cpu_count() or 1)
+# Кэш разобранных документов: повторный запуск на том же .docx не разбирает XML (dita.storage.doc_cache).
+# Кэш доверяет своей папке, поэтому по умолчанию он лежит в папке пользователя, а не в папке вывода
+docx_cache = config.getboolean('docx', 'cache', fallback=False)
+docx_cache_dir = config.get('docx', 'cache_dir',
+                            fallback=os.path.join(os.path.expanduser('~'), '.cache', 'dita-docx'))
+
+# Сохранять выданные ID в .ids.json между запусками
+ids_persist = config.getboolean('ids', 'persist', fallback=False)
+# Размер LRU-кэша get_proper_id (none — без ограничения)
+_id_cache_size = config.get('ids', 'cache_size', fallback='4096')
+id_cache_size = None if _id_cache_size.strip().lower() == 'none' else int(_id_cache_size)
+
+# Отложенная запись выходных файлов: число потоков-писателей (0 — синхронно) и длина очереди
+output_writers = config.getint('output', 'writers', fallback=4)
+output_queue_size = config.getint('output', 'queue_size', fallback=256)
+# Режим вывода: dir — дерево папок, zip — один архив-пакет для DITA-OT
+output_mode = config.get('output', 'mode', fallback='dir').strip().lower()
+# Путь к архиву в режиме zip ({document_type} заменяется типом документа)
+output_zip = config.get('output', 'zip', fallback=f"{output_dir}/{{document_type}}.zip")
+
+# Источник оглавления: word (word.txt), docx (стили заголовков .docx) или auto
+toc_source = config.get('toc', 'source', fallback='auto').strip().lower()
+# Записывать отладочную структуру оглавления doc_structure.txt
+toc_write_structure = config.getboolean('toc', 'write_structure', fallback=False)
+
+# Инкрементальная пересборка по манифесту (перезаписываются только изменённые файлы)
+incremental_build = config.getboolean('build', 'incremental', fallback=False)
+
+# Путь к обрабатываемому .docx (None — первый .docx в текущей папке)
+docx_path = None
+
+
+def configure(path: str | None = None, doc_type: str | None = None, out_dir: str | None = None):
+    """
+    Переключает настройки на другой документ: путь к .docx, тип документа и
+    папку вывода. Ранее открытый config.docx сбрасывается и будет создан заново
+    при следующем обращении. Используется пакетным режимом (dita.services.batch).
+    """
+    global docx_path, document_type, output_dir, image_store, output_zip
+    docx_path = path
+    if doc_type is not None:
+        document_type = doc_type
+    if out_dir is not None:
+        output_dir = out_dir
+        if not config.has_option('images', 'store'):
+            image_store = f"{output_dir}/images"
+        if not config.has_option('output', 'zip'):
+            output_zip = f"{output_dir}/{{document_type}}.zip"
+    globals().pop('docx', None)
+
+
+def __getattr__(name: str):
+    """
+    Ленивое создание объекта Docx при первом обращении к config.docx.
+    Импорт модуля настроек не открывает документ: это происходит только
+    когда этап обработки действительно обращается к .docx.
+    """
+    global docx
+    if name == 'docx':
+        from dita.services.docx import Docx
+        try:
+            docx = Docx(docx_path, streaming=docx_streaming)
+        except Exception as e:
+            logging.getLogger(__name__).error(f"Could not open the docx file: {e}")
+            docx = None
+        return docx
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
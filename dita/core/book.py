@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+Модуль book.py
+--------------
+Этап топиков: по оглавлению документа (dita.core.toc) создаются DITA-топики,
+карты глав и BookMap. Используется обычным запуском (main.py) и пакетным
+режимом (dita.services.batch).
+
+Функции:
+    add_topic_to_map(parent_element, topic_id, topic_title)
+        — добавляет ссылку на топик в карту.
+    build_chapter(book, chapter)
+        — создаёт топики одной главы и сохраняет её карту.
+    process_topics(headings, directory)
+        — строит топики, карты глав и BookMap документа.
+"""
+
+import xml.etree.ElementTree as ET
+
+from dita.core.topic import create_topic
+from dita.utils.id_generators import gen_id
+from dita.core.toc import Heading, toc
+from dita.core.map import BookBuilder
+
+
+def add_topic_to_map(parent_element: ET.Element, topic_id: str, topic_title: str) -> ET.Element:
+    """
+    Добавляет ссылку на DITA-топик в карту (map) XML.
+    
+    Параметры:
+        parent_element: родительский XML-элемент (map или topicref)
+        topic_id: уникальный идентификатор топика
+        topic_title: заголовок топика (navtitle)
+    
+    Возвращает:
+        Элемент topicref, добавленный в map
+    """
+    topicref_element = ET.SubElement(parent_element, 'topicref')
+    topicref_element.set('keys', topic_id)
+    topicref_element.set('href', f'topic/{topic_id}.dita')
+    topicref_element.set('navtitle', topic_title)
+    return topicref_element
+
+def build_chapter(book: BookBuilder, chapter: list[tuple[int, str, str]]) -> tuple[str, str]:
+    """
+    Создаёт топики одной главы и сохраняет её карту (map).
+    Запись файлов выполняют потоки общего приёмника (dita.storage.sink),
+    поэтому главы обрабатываются последовательно: на главу приходится лишь
+    построение небольших XML-деревьев, пул не окупает свои накладные расходы.
+
+    Параметры:
+        book: книга, в папку которой сохраняется карта
+        chapter: заголовки главы в порядке документа — (уровень, ID топика, заголовок);
+                 ID выданы заранее, чтобы не зависеть от порядка выполнения глав
+
+    Возвращает:
+        ID карты и заголовок навигации (для добавления в bookmap)
+    """
+    topic_levels = []  # стек для отслеживания текущих уровней заголовков
+    current_map_root = ET.Element('map')  # корень карты главы
+    for heading_level, topic_id, heading in chapter:
+        # Создание DITA-топика с заранее выданным ID
+        create_topic(heading, topic_id)
+
+        if heading_level == 1:
+            # Заголовок первого уровня — корень карты
+            parent_element = current_map_root
+        else:
+            # Для второго и более глубокого уровней берем родителя из стека
+            parent_element = topic_levels[heading_level - 2]
+
+        if heading_level > len(topic_levels):
+            # Добавляется новый уровень
+            topicref_element = add_topic_to_map(parent_element, topic_id, heading)
+            topic_levels.append(topicref_element)
+        elif heading_level == len(topic_levels):
+            # Перезапись текущего уровня
+            topicref_element = add_topic_to_map(parent_element, topic_id, heading)
+            topic_levels[heading_level - 1] = topicref_element
+        else:
+            # Удаление лишних уровней
+            while len(topic_levels) > heading_level:
+                removed = topic_levels.pop()
+            topicref_element = add_topic_to_map(parent_element, topic_id, heading)
+            topic_levels[heading_level - 1] = topicref_element
+
+    return book.write_map(current_map_root) # сохраняет DITA-карту главы в файл
+
+
+def process_topics(headings: list[Heading] | None = None, directory: str | None = None) -> int:
+    """
+    Основная функция обработки тем документа
+    (headings — заголовки, собранные в общем проходе по .docx;
+    directory — папка CSV и doc_structure.txt; см. toc):
+    1. Строит оглавление (заголовки с уровнями) и CSV
+    2. Выдаёт ID топиков в порядке документа и делит заголовки на главы
+    3. Генерирует DITA-топики и карты (map) глав
+    4. Собирает BookMap в исходном порядке глав
+
+    Возвращает число созданных топиков.
+    """
+    book = BookBuilder()  # книга текущего документа (bookmap и карты глав)
+
+    # Заголовки поступают из оглавления в памяти, без промежуточного файла.
+    # ID выдаются здесь, в порядке документа
+    chapters = []
+    for heading_level, _, heading in toc(headings, directory):
+        if heading_level == 1 or not chapters:
+            # Заголовки первого уровня начинают новую главу (карту)
+            chapters.append([])
+        chapters[-1].append((heading_level, gen_id(heading), heading))
+
+    results = [build_chapter(book, chapter) for chapter in chapters]
+
+    # Ссылки на карты добавляются в порядке глав документа
+    for map_id, map_navtitle in results:
+        book.add_map(map_id, map_navtitle)
+    book.save() # Сохранение BookMap с ссылками на все карты
+    return sum(len(chapter) for chapter in chapters)
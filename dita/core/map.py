@@ -1,86 +1,175 @@
 # -*- coding: utf-8 -*-
 # Файл отвечает за создание и сохранение DITA-карт (map) и BookMap для документации
+#
+# Структуру книги хранит объект BookBuilder: у каждого свой bookmap, папка вывода
+# и тип документа, поэтому несколько книг можно собирать в одном процессе
+# (в потоках, в долгоживущем исполнителе) без взаимного влияния.
+# Функции save_map/save_bookmap оставлены для совместимости и работают
+# с книгой по умолчанию для текущих настроек.
+import threading
+from typing import BinaryIO
 import xml.etree.ElementTree as ET
 import dita.config.config as config
-import os
+from dita.storage.manifest import write_artifact
+from dita.utils.xml_writer import write_tree
 
-# Глобальный элемент bookmap, который будет хранить структуру всей книги
-bookmap = ET.Element('bookmap') # корневой элемент BookMap (главный контейнер всей книги)
-booktitle = ET.SubElement(bookmap, 'booktitle') # элемент заголовка книги
-mainbooktitle = ET.SubElement(booktitle, 'mainbooktitle') # основной заголовок книги
 
-def save_map(map_root):
+class BookBuilder:
     """
-    Сохраняет отдельную карту (map) документа в формате DITA.
-    Также добавляет ссылку на карту в глобальный bookmap.
-    
-    Параметры:
-        map_root (xml.etree.ElementTree.Element): корневой элемент карты (map)
+    Сборщик книги: владеет bookmap, картами глав и местом их сохранения.
+
+    Аргументы конструктора:
+        output_dir (str | None): папка вывода (по умолчанию — из settings.ini)
+        document_type (str | None): тип документа (по умолчанию — из settings.ini)
+
+    Пример:
+        book = BookBuilder("C:/output", "RO")
+        book.save_map(map_root)   # для каждой главы
+        book.save()               # C:/output/RO.ditamap
     """
-    global bookmap # используем глобальный bookmap для добавления ссылок на новые карты
-    try:
-        # Извлечение идентификатора и заголовка навигации из первого topicref
-        map_id = map_root.find('topicref').attrib['keys'] # ищет первый элемент <topicref> внутри карты (map_id — уникальный ключ карты, нужен для идентификации и сохранения файла)
-        map_navtitle  = map_root.find('topicref').attrib['navtitle'] # заголовок для навигации (будет отображаться в BookMap)
-        map_root.set('id', map_id) # добавляем id к корневой карте
-        map_root.set('xml:lang', 'ru')
-    except Exception as e:
-        print('Could not extract keys element from the first topic') # если не удалось получить атрибуты
-
-    # Автоматическое форматирование XML с отступами
-    ET.indent(map_root)
-    
-    # Заголовок DITA файла (header)
-    header = b"""<?xml version="1.0" encoding="UTF-8"?>\n<!DOCTYPE map PUBLIC "-//OASIS//DTD DITA Map//EN" "map.dtd">\n"""
-    map_txt = ET.tostring(map_root, encoding='utf-8') # сериализация XML в байты
-
-    # Папка для сохранения карты
-    dir = f"{config.output_dir}/{config.document_type}"
-    os.makedirs(dir, exist_ok=True)   # создание папки, если не существует
-
-    # Сохраняем карту в файл
-    with open(f'{dir}/{map_id}.ditamap', 'xb') as f: # 'xb' — создать новый файл, если существует, ошибка
-        f.write(header)
-        f.write(map_txt)
-
-    # В зависимости от типа карты (приложение или глава) добавляем в bookmap
-    if map_id.startswith('appendix'):
+
+    def __init__(self, output_dir: str | None = None, document_type: str | None = None):
+        self.output_dir = output_dir if output_dir is not None else config.output_dir
+        self.document_type = document_type if document_type is not None else config.document_type
+
+        self.bookmap = ET.Element('bookmap') # корневой элемент BookMap (главный контейнер всей книги)
+        self.booktitle = ET.SubElement(self.bookmap, 'booktitle') # элемент заголовка книги
+        self.mainbooktitle = ET.SubElement(self.booktitle, 'mainbooktitle') # основной заголовок книги
+
+        # Пути сохранённых карт в порядке добавления
+        self.maps: list[str] = []
+        self._lock = threading.Lock()
+
+    def save_map(self, map_root: ET.Element):
+        """
+        Сохраняет отдельную карту (map) документа в формате DITA.
+        Также добавляет ссылку на карту в bookmap этой книги.
+
+        Параметры:
+            map_root (xml.etree.ElementTree.Element): корневой элемент карты (map)
+        """
+        self.add_map(*self.write_map(map_root))
+
+    def write_map(self, map_root: ET.Element) -> tuple[str, str]:
+        """
+        Сохраняет карту (map) в файл, не добавляя её в bookmap.
+        Можно вызывать из нескольких потоков; ссылки на карты затем
+        добавляются методом add_map в нужном порядке.
+
+        Возвращает:
+            tuple[str, str]: ID карты и заголовок навигации
+        """
+        try:
+            # Извлечение идентификатора и заголовка навигации из первого topicref
+            map_id = map_root.find('topicref').attrib['keys'] # ищет первый элемент <topicref> внутри карты (map_id — уникальный ключ карты, нужен для идентификации и сохранения файла)
+            map_navtitle  = map_root.find('topicref').attrib['navtitle'] # заголовок для навигации (будет отображаться в BookMap)
+            map_root.set('id', map_id) # добавляем id к корневой карте
+            map_root.set('xml:lang', 'ru')
+        except Exception as e:
+            print('Could not extract keys element from the first topic') # если не удалось получить атрибуты
+
+        # Папка для сохранения карты (создаётся приёмником при записи)
+        dir = f"{self.output_dir}/{self.document_type}"
+
+        # Сохраняем карту в файл (отложенная запись; 'x' — если файл существует, ошибка).
+        # XML с отступами и заголовком DITA-карты выводится прямо в файл
+        map_path = f'{dir}/{map_id}.ditamap'
+        write_artifact(map_path, lambda stream: write_tree(stream, map_root, 'map'), 'topics', exclusive=True)
+        return map_id, map_navtitle
+
+    def add_map(self, map_id: str, map_navtitle: str):
+        """
+        Добавляет ссылку на сохранённую карту в bookmap: приложения — в <appendix>,
+        остальные карты — как главы <chapter>.
+        """
+        href = f'{self.document_type}/{map_id}.ditamap' # путь к файлу карты для BookMap
+        with self._lock:
+            self.maps.append(f'{self.output_dir}/{href}')
+            if map_id.startswith('appendix'):
+                self._add_appendix(map_navtitle, href)
+            else:
+                self._add_chapter(map_navtitle, href)
+
+    def add_chapter(self, navtitle: str, href: str) -> ET.Element:
+        """
+        Добавляет новую главу в bookmap.
+        Используется как для save_map, так и напрямую.
+        """
+        with self._lock:
+            return self._add_chapter(navtitle, href)
+
+    def save(self):
+        """
+        Сохраняет bookmap, который содержит структуру всей книги.
+        """
+        dir = f'{self.output_dir}' # папка вывода
+
+        # Сохраняем bookmap в файл с именем, соответствующим типу документа
+        # (XML с отступами и заголовком BookMap выводится прямо в файл)
+        write_artifact(f'{dir}/{self.document_type}.ditamap', self._write_bookmap, 'topics', exclusive=True)
+
+    def _write_bookmap(self, stream: BinaryIO):
+        """Выводит bookmap в поток (вызывается приёмником при записи файла)."""
+        with self._lock:
+            write_tree(stream, self.bookmap, 'bookmap')
+
+    def _add_chapter(self, navtitle: str, href: str) -> ET.Element:
+        """Добавляет элемент <chapter> (вызывается под блокировкой)."""
+        chapter = ET.SubElement(self.bookmap, 'chapter')
+        chapter.set('navtitle', navtitle)
+        chapter.set('href', href)
+        chapter.set('format', 'ditamap')
+        return chapter
+
+    def _add_appendix(self, navtitle: str, href: str) -> ET.Element:
+        """Добавляет приложение <appendix><mapref .../></appendix> (вызывается под блокировкой)."""
         # Для приложений создается элемент <appendix>
-        appendix = ET.SubElement(bookmap, 'appendix')
+        appendix = ET.SubElement(self.bookmap, 'appendix')
         mapref = ET.SubElement(appendix, 'mapref')
-        mapref.set('navtitle', map_navtitle)
-        mapref.set('href', f'{config.document_type}/{map_id}.ditamap') # путь к файлу карты для BookMap
+        mapref.set('navtitle', navtitle)
+        mapref.set('href', href)
         mapref.set('format', 'ditamap')
         mapref.set('importance', 'required')
-    else:
-        # Для обычных глав создается элемент <chapter>
-        _add_chapter(map_navtitle, f'{config.document_type}/{map_id}.ditamap')
+        return appendix
+
+
+# Книга по умолчанию для функций совместимости (создаётся при первом обращении)
+_default_book: BookBuilder | None = None
+_default_book_lock = threading.Lock()
+
+
+def default_book() -> BookBuilder:
+    """Возвращает книгу по умолчанию для текущих настроек (config.output_dir, config.document_type)."""
+    global _default_book
+    with _default_book_lock:
+        if (_default_book is None or _default_book.output_dir != config.output_dir
+                or _default_book.document_type != config.document_type):
+            _default_book = BookBuilder()
+        return _default_book
+
+
+def save_map(map_root):
+    """
+    Сохраняет карту (map) и добавляет её в книгу по умолчанию.
+    Оставлено для совместимости — новый код использует BookBuilder.save_map.
+    """
+    default_book().save_map(map_root)
+
 
 def _add_chapter(navtitle: str, href: str):
     """
-    Добавляет новую главу в глобальный bookmap.
-    Используется как для save_map, так и напрямую.
+    Добавляет новую главу в книгу по умолчанию.
+    Оставлено для совместимости — новый код использует BookBuilder.add_chapter.
     """
-    chapter = ET.SubElement(bookmap, 'chapter')
-    chapter.set('navtitle', navtitle)
-    chapter.set('href', href)
-    chapter.set('format', 'ditamap')
-    return chapter
+    return default_book().add_chapter(navtitle, href)
+
 
 def save_bookmap():
     """
-    Сохраняет глобальный bookmap, который содержит структуру всей книги.
+    Сохраняет bookmap книги по умолчанию; следующая книга начнётся с пустого bookmap.
+    Оставлено для совместимости — новый код использует BookBuilder.save.
     """
-    dir = f'{config.output_dir}' # папка вывода
-    os.makedirs(dir, exist_ok=True)
-    
-    # Заголовок BookMap файла (header)
-    header = b"""<?xml version="1.0" encoding="UTF-8"?>\n<!DOCTYPE bookmap PUBLIC "-//OASIS//DTD DITA BookMap//EN" "bookmap.dtd">\n"""
-    
-    ET.indent(bookmap) # форматирование XML
-    bookmap_txt = ET.tostring(bookmap, encoding='utf-8')
-    
-    # Сохраняем глобальный bookmap в файл (сохраняем BookMap с именем, соответствующим типу документа (config.document_type))
-    with open(f'{dir}/{config.document_type}.ditamap', 'xb') as f:
-        f.write(header)
-        f.write(bookmap_txt)
\ No newline at end of file
+    global _default_book
+    with _default_book_lock:
+        book, _default_book = _default_book, None
+    (book or BookBuilder()).save()
@@ -5,6 +5,7 @@ from dita.core.topic import validate_id, save_topic
 from dita.services.docx_tables import process_tables_docx
 from dita.models.table import TableKeyReference
 from dita.utils.id_generators import gen_tab_id
+from dita.utils.xml_writer import DOCTYPES
 
 def create_reference(table_title: str) -> str:
     """
@@ -19,9 +20,7 @@ def create_reference(table_title: str) -> str:
     table_id = gen_tab_id(table_title) # см. dita.utils.id_generators
 
     # Формируем XML-текст reference
-    reference_txt = f"""<?xml version="1.0" encoding="UTF-8"?>
-<!DOCTYPE reference PUBLIC "-//OASIS//DTD DITA Reference//EN" "reference.dtd">
-<reference id="{table_id}">
+    reference_txt = DOCTYPES['reference'].decode('utf-8') + f"""<reference id="{table_id}">
   <title>{table_title}</title>
   <refbody>
     <table id="{table_id}">
@@ -5,20 +5,81 @@
 Отвечает за создание структуры документа (оглавления) и CSV-файла,
 который связывает номера разделов, их уровни и транслитерированные идентификаторы.
 
+Оглавление строится в памяти: word.txt читается потоково один раз, а
+заголовки с уровнями (Heading) сразу передаются в запись CSV, создание
+топиков и построение карт. Текстовая структура doc_structure.txt пишется
+только для отладки (settings.ini: [toc] write_structure = true).
+
+Источник заголовков задаётся в settings.ini ([toc] source):
+    word — список разделов word.txt, выгруженный из Word вручную;
+    docx — стили заголовков самого .docx (dita.services.docx_toc);
+    auto — word.txt, если он есть, иначе .docx.
+
 Функции:
+    heading_source()
+        — определяет источник заголовков по настройкам.
+    read_headings(path)
+        — читает список разделов и выдаёт заголовки с уровнями.
     write_csv(csv_file, section_number, section_title)
         — записывает строку в CSV-файл с номерами разделов, уровнями и ID.
-    toc()
-        — создаёт текстовую структуру документа (doc_structure.txt)
-          и CSV-файл (Трансформация_названий_разделов.csv) на основе word.txt.
+    toc(headings, directory)
+        — выдаёт заголовки документа, попутно записывая CSV-файл
+          (Трансформация_названий_разделов.csv) и, при необходимости, doc_structure.txt.
 """
 
 import re
+import os
+from contextlib import ExitStack
+from typing import Iterable, Iterator, NamedTuple, TextIO
+
 from dita.utils.translit import get_proper_id
 import dita.config.config as config
-import os
 
-def write_csv(csv_file, section_number: str, section_title: str):
+# Номер раздела в начале строки (например "1.2.3 " или "А.1 ")
+_NUMBER_RE = re.compile(r"^[A-Я]?[\d\.]+\s")
+
+
+class Heading(NamedTuple):
+    """Заголовок раздела: уровень (1 — верхний), номер ("1.2.3" или "") и текст."""
+    level: int
+    number: str
+    title: str
+
+
+def read_headings(path: str = 'word.txt') -> Iterator[Heading]:
+    """
+    Потоково читает список разделов Word и выдаёт заголовки с уровнями.
+
+    Уровень нумерованной строки определяется по числу точек в номере
+    (1 → 1, 1.2 → 2, 1.2.3 → 3), ненумерованной — по отступу (4 пробела на уровень).
+    Пустые строки пропускаются.
+    """
+    with open(path, "r", encoding='utf-8') as f:
+        for line in f:
+            title = line.strip()
+            if not title:
+                continue
+            match = _NUMBER_RE.search(line)
+            if match is not None:
+                number = match[0].strip()
+                yield Heading(number.count('.') + 1, number, line[match.end():].strip())
+            else:
+                line = line.rstrip('\n')
+                indent_length = len(line) - len(line.lstrip())
+                yield Heading(indent_length // 4 + 1, "", title)
+
+
+def heading_source() -> str | None:
+    """
+    Определяет источник заголовков: 'word', 'docx' или None, если
+    оглавление строить не из чего.
+    """
+    if config.toc_source == 'word' or (config.toc_source == 'auto' and os.path.exists('word.txt')):
+        return 'word' if os.path.exists('word.txt') else None
+    return 'docx' if config.docx is not None else None
+
+
+def write_csv(csv_file: TextIO, section_number: str, section_title: str):
     """
     Записывает строку в CSV-файл с информацией о разделе.
 
@@ -36,49 +97,49 @@ def write_csv(csv_file, section_number: str, section_title: str):
     indents = {f'r{i}': '' for i in range(7)}
     indents[f'r{indent}'] = section_number
     # Записываем строку в CSV, разделяя уровни точкой с запятой
-    csv.write(f"""{indents['r0']};{indents['r1']};{indents['r2']};{indents['r3']};{indents['r4']};{indents['r5']};{indents['r6']};{title};{topic_id}\n""")
+    csv_file.write(f"""{indents['r0']};{indents['r1']};{indents['r2']};{indents['r3']};{indents['r4']};{indents['r5']};{indents['r6']};{section_title};{topic_id}\n""")
+
 
-def toc():
+def toc(headings: Iterable[Heading] | None = None, directory: str | None = None) -> Iterator[Heading]:
     """
-    Основная функция.
-    Создаёт:
-        - doc_structure.txt — текстовую структуру документа с отступами;
-        - Трансформация_названий_разделов.csv — таблицу соответствий разделов и их ID.
-
-    Алгоритм:
-        1. Создаёт выходную папку (если не существует).
-        2. Открывает файл word.txt (исходный список разделов с нумерацией).
-        3. Для каждой строки:
-            - определяет уровень по нумерации (1., 1.1., 1.1.1 и т.п.);
-            - добавляет соответствующий отступ (4 пробела на уровень);
-            - записывает в doc_structure.txt;
-            - записывает в CSV с ID и номером.
+    Основная функция: выдаёт заголовки документа по порядку.
+
+    headings — заголовки, уже собранные в общем проходе по .docx
+    (TocExtractor в main.process_docx). Если они не переданы, заголовки
+    читаются из источника heading_source(): word.txt или отдельным проходом по .docx.
+
+    directory — папка для CSV и doc_structure.txt (пакетный режим пишет их в папку
+    своего типа документа). По умолчанию CSV пишется в output_dir, структура — в текущую папку.
+
+    Попутно создаёт:
+        - Трансформация_названий_разделов.csv — таблицу соответствий разделов и их ID;
+        - doc_structure.txt — текстовую структуру с отступами (4 пробела на уровень),
+          только если включено [toc] write_structure.
+
+    Файлы закрываются, когда перебор заголовков завершён.
     """
+    if headings is None:
+        if heading_source() == 'docx':
+            # Импорт внутри функции: модуль docx_toc сам использует Heading из этого модуля
+            from dita.services.docx_toc import read_headings as read_docx_headings
+            headings = read_docx_headings(config.docx)
+        else:
+            headings = read_headings()
+
+    csv_dir = directory if directory is not None else config.output_dir
+    structure_path = f"{directory}/doc_structure.txt" if directory is not None else 'doc_structure.txt'
+
     # Гарантируем наличие выходной директории
-    os.makedirs(config.output_dir, exist_ok=True)
-
-    # Файлы для записи результатов
-    csv_file = open(f"{config.output_dir}/Трансформация_названий_разделов.csv", "w")
-    structure_file = open('doc_structure.txt', 'w', encoding='utf-8')
-    
-    # Читаем исходный файл word.txt (список разделов Word)
-    with open('word.txt', "r", encoding='utf-8') as f:
-        for line in f.readlines():
-            # Проверяем, начинается ли строка с номера раздела (например "1.2.3 ")    
-            match = re.search(r"^[A-Я]?[\d\.]+\s", line)
-            if match is not None:
-                # Считаем уровень (по количеству точек в номере)
-                level_indent = m[0].count('.')
-                # Заменяем нумерацию на соответствующий отступ (4 пробела на уровень)
-                indented_line = re.sub(r"^[A-Я]?[\d\.]+\s", "    " * level_indent, line)
-                # Записываем в структуру и CSV
-                structure_file.write(indented_line)
-                write_csv(csv_file, match[0].strip(), indented_line.strip())
-            else:
-                # Строка без нумерации (например, просто текст)
-                structure_file.write(line)
-                write_csv(csv_file, "", line.strip())
+    os.makedirs(csv_dir, exist_ok=True)
+
+    with ExitStack() as stack:
+        csv_file = stack.enter_context(open(f"{csv_dir}/Трансформация_названий_разделов.csv", "w"))
+        structure_file = None
+        if config.toc_write_structure:
+            structure_file = stack.enter_context(open(structure_path, 'w', encoding='utf-8'))
 
-    # Закрываем оба выходных файла
-    structure_file.close()
-    csv_file.close()
\ No newline at end of file
+        for heading in headings:
+            write_csv(csv_file, heading.number, heading.title)
+            if structure_file is not None:
+                structure_file.write(f"{'    ' * (heading.level - 1)}{heading.title}\n")
+            yield heading
@@ -11,16 +11,17 @@
 Функции:
     - save_topic(output_dir, topic_id, topic_txt)
     - validate_id(output_dir, candidate_id)
-    - create_topic(title)
+    - create_topic(title, topic_id=None)
 """
 
-import os
-import re
 import logging
 
 import dita.config.config as config
 from dita.utils.translit import get_proper_id
 from dita.utils.id_generators import gen_id
+from dita.utils.id_registry import claim_id
+from dita.storage.manifest import write_artifact
+from dita.utils.xml_writer import DOCTYPES
 
 logger = logging.getLogger(__name__)
 
@@ -28,71 +29,48 @@ def save_topic(output_dir: str, topic_id: str, topic_txt: str) -> None:
     """
     Сохраняет топик в файл <output_dir>/<topic_id>.dita.
 
-    Структура блока такая же, как и в исходном коде: попытка открыть файл в режиме 'x'
-    (создать новый), при исключении — печать ошибки, иначе — запись и закрытие файла.
+    Запись отложенная: файл ставится в очередь общего приёмника (dita.storage.sink)
+    в режиме 'x' (создать новый) с учётом манифеста сборки (dita.storage.manifest). Ошибки (например, файл существует или нет прав)
+    сообщаются в конце запуска при закрытии приёмника.
 
     Аргументы:
         output_dir (str): директория для сохранения (будет использована как есть).
         topic_id (str): идентификатор топика (используется как имя файла без расширения).
         topic_txt (str): контент DITA-топика (строка с XML).
     """
-    try:
-        # Формируем путь и пытаемся создать новый файл
-        path = f"{output_dir}/{topic_id}.dita" # абсолютный путь к файлу топика
-        # Пытаемся создать новый файл (режим 'x' — ошибка, если уже существует)
-        f = open(path, "x", encoding='utf-8')
-    except Exception as e:
-        # Если ошибка (например, файл существует или нет прав) — выводим исключение
-        print(e)
-    else:
-        # Записываем текст топика и закрываем файл
-        f.write(topic_txt) # записываем XML контент в файл
-        f.close() # закрываем файловый объект
+    # Формируем путь к файлу топика
+    path = f"{output_dir}/{topic_id}.dita" # абсолютный путь к файлу топика
+    # Ставим запись в очередь (режим 'x' — ошибка, если уже существует;
+    # при инкрементальной сборке неизменённый топик не перезаписывается)
+    write_artifact(path, topic_txt, 'topics', exclusive=True)
 
 def validate_id(output_dir: str, unique_id: str) -> str:
     """
     Проверяет уникальность идентификатора в указанной директории.
-    Если файл с таким именем уже существует — добавляет или увеличивает числовой суффикс (_1, _2, ...).
+    Если ID уже занят — добавляет или увеличивает числовой суффикс (_1, _2, ...).
+
+    Проверка выполняется в памяти по реестру dita.utils.id_registry, который
+    один раз читает содержимое директории; выданный ID резервируется.
 
     Аргументы:
         output_dir (str): путь до папки, где будут храниться DITA-топики.
-        candidate_id (str): исходное имя идентификатора (например, 'intro' или 'chapter1').
+        unique_id (str): исходное имя идентификатора (например, 'intro' или 'chapter1').
 
     Возвращает:
         str: уникальный идентификатор (возможно с добавленным суффиксом).
     """
-    
-    try:
-        # Пытаемся создать папку для хранения топиков, если её нет
-        os.makedirs(output_dir) # создаёт папку, если не существует
-    except FileExistsError:
-        # Если уже существует — ничего страшного
-        pass
-
-    while os.path.exists(f"{output_dir}/{unique_id}.dita"):
-        logger.debug(f"Файл с именем {unique_id} уже существует. Appending '_N'...")
-        # m — результат поиска числового суффикса _N в конце имени
-        m = re.search(r'\_(\d+)$', unique_id)
-        if m is not None:
-            inc = int(m.group(1)) # число в конце id (например 2 из '_2')
-            full_inc = m.group(0) # строка суффикса (например "_2")
-            inc = inc + 1 # увеличиваем номер
-            id_base = unique_id.rstrip(full_inc) # базовая часть id без суффикса
-            unique_id = f"{id_base}_{inc}" # формируем новый id, например "chapter_3"
-        else:
-            unique_id = f"{unique_id}_1" # если суффикса нет, добавляем "_1"
-    return unique_id # возвращаем уникальный идентификатор
-
-def create_topic(title: str):
-    topic_id = gen_id(title) # см. dita.utils.id_generators
+    return claim_id(output_dir, unique_id)
+
+def create_topic(title: str, topic_id: str | None = None):
+    # ID можно выдать заранее (например, при обработке глав — в порядке документа)
+    if topic_id is None:
+        topic_id = gen_id(title) # см. dita.utils.id_generators
 
     # Формируем путь до директории, где хранятся топики
     output_dir = f"{config.output_dir}/{config.document_type}/topic"  # абсолютный путь к папке topic
 
     # Формируем XML-содержимое топика в формате DITA
-    topic_txt = F"""<?xml version="1.0" encoding="UTF-8"?>
-<!DOCTYPE concept PUBLIC "-//OASIS//DTD DITA Concept//EN" "concept.dtd">
-<concept id="{topic_id}" xml:lang="ru">
+    topic_txt = DOCTYPES['concept'].decode('utf-8') + F"""<concept id="{topic_id}" xml:lang="ru">
   <title>{title}</title>
   <conbody>
     <p></p>
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""
+Модуль body.py
+--------------
+Компактное промежуточное представление (IR) тела документа Word.
+
+document.xml разбирается один раз (dita.services.docx_body.build_block):
+каждый абзац и каждая таблица верхнего уровня превращаются в небольшие
+объекты со __slots__, в которых уже собрано всё, что нужно конвертерам:
+
+    • Paragraph — стиль, уровень структуры, нумерация, уровень списка, текст,
+      ссылки на сноски (FootnoteRef), relId рисунков и вложенные абзацы
+      (например, в надписях);
+    • WordTable — сетка таблицы: число колонок, строки ячеек (WordCell)
+      и все абзацы таблицы в порядке документа.
+
+Конвертеры (таблицы, рисунки, иконки, оглавление) работают с этими объектами,
+а не с деревом xml.etree, поэтому повторные поиски по потомкам (.//w:t,
+.//a:blip, .//w:numPr) не нужны, а дерево не хранится в памяти.
+
+Фрагменты <w:r> отдельно не хранятся: конвертерам нужен только текст абзаца
+с позициями сносок и признак того, что в абзаце есть фрагменты.
+
+Объекты сериализуются (pickle) кортежами значений слотов — компактно для
+передачи между процессами. Для кэша разбора (dita.storage.doc_cache) блоки
+переводятся в данные JSON (blocks_to_data / blocks_from_data): списки
+значений слотов, ячейки таблиц ссылаются на абзацы таблицы по индексу.
+"""
+
+import hashlib
+
+
+class _Slotted:
+    """Базовый класс IR: сериализация кортежем значений слотов."""
+    __slots__ = ()
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
+
+class FootnoteRef(_Slotted):
+    """
+    Ссылка на сноску внутри абзаца.
+
+    Атрибуты:
+        attrib (dict[str, str]): атрибуты <w:footnoteReference> (w:id и др.)
+        tail (str): текст абзаца после ссылки (до следующей ссылки)
+    """
+    __slots__ = ('attrib', 'tail')
+
+    def __init__(self, attrib: dict[str, str], tail: str = ""):
+        self.attrib = attrib
+        self.tail = tail
+
+
+class Paragraph(_Slotted):
+    """
+    Абзац <w:p>.
+
+    Атрибуты:
+        style (str | None): стиль абзаца (w:pStyle)
+        outline (int | None): собственный уровень структуры w:outlineLvl (0..9)
+        num_id (str | None): w:numId нумерации абзаца ('0' — нумерация снята)
+        list_level (int | None): уровень списка (w:ilvl) или None, если абзац не в списке
+        lead (str): текст абзаца до первой ссылки на сноску
+        footnotes (tuple[FootnoteRef, ...] | None): ссылки на сноски с текстом после них
+        has_runs (bool): есть ли в абзаце фрагменты <w:r>
+        image (str | None): relId рисунка (<pic:pic>) в абзаце
+        inlines (tuple[str | None, ...] | None): relId inline-объектов (<wp:inline>)
+                 блока — только у абзаца верхнего уровня тела
+        nested (tuple[Paragraph, ...] | None): вложенные абзацы (надписи и т.п.)
+                 в порядке документа — только у абзаца верхнего уровня тела
+    """
+    __slots__ = ('style', 'outline', 'num_id', 'list_level', 'lead', 'footnotes',
+                 'has_runs', 'image', 'inlines', 'nested')
+    kind = 'p'
+
+    def __init__(self):
+        self.style: str | None = None
+        self.outline: int | None = None
+        self.num_id: str | None = None
+        self.list_level: int | None = None
+        self.lead = ""
+        self.footnotes: tuple[FootnoteRef, ...] | None = None
+        self.has_runs = False
+        self.image: str | None = None
+        self.inlines: tuple[str | None, ...] | None = None
+        self.nested: tuple[Paragraph, ...] | None = None
+
+    @property
+    def text(self) -> str:
+        """Весь текст абзаца (<w:t>), включая текст после сносок."""
+        if not self.footnotes:
+            return self.lead
+        return self.lead + "".join(ref.tail for ref in self.footnotes)
+
+    @property
+    def paragraphs(self) -> tuple["Paragraph", ...]:
+        """
+        Абзацы блока в порядке документа (для единообразия с WordTable):
+        сам абзац и его вложенные абзацы.
+        """
+        if not self.nested:
+            return (self,)
+        return (self,) + self.nested
+
+    def to_data(self) -> list:
+        """Значения слотов в виде данных JSON."""
+        footnotes = None if self.footnotes is None else [[ref.attrib, ref.tail] for ref in self.footnotes]
+        inlines = None if self.inlines is None else list(self.inlines)
+        nested = None if self.nested is None else [p.to_data() for p in self.nested]
+        return [self.style, self.outline, self.num_id, self.list_level, self.lead,
+                footnotes, self.has_runs, self.image, inlines, nested]
+
+    @classmethod
+    def from_data(cls, data: list) -> "Paragraph":
+        """Восстанавливает абзац из данных to_data()."""
+        (style, outline, num_id, list_level, lead, footnotes, has_runs, image, inlines, nested) = data
+        paragraph = cls()
+        paragraph.style = style
+        paragraph.outline = outline
+        paragraph.num_id = num_id
+        paragraph.list_level = list_level
+        paragraph.lead = lead
+        if footnotes is not None:
+            paragraph.footnotes = tuple(FootnoteRef(attrib, tail) for attrib, tail in footnotes)
+        paragraph.has_runs = has_runs
+        paragraph.image = image
+        if inlines is not None:
+            paragraph.inlines = tuple(inlines)
+        if nested is not None:
+            paragraph.nested = tuple(cls.from_data(p) for p in nested)
+        return paragraph
+
+
+class WordCell(_Slotted):
+    """
+    Ячейка таблицы <w:tc>.
+
+    Атрибуты:
+        span (str | None): w:gridSpan (как в документе) или None
+        vmerged (bool): продолжение вертикального объединения (w:vMerge без "restart")
+        paragraphs (list[Paragraph]): абзацы ячейки (прямые потомки <w:tc>)
+    """
+    __slots__ = ('span', 'vmerged', 'paragraphs')
+
+    def __init__(self):
+        self.span: str | None = None
+        self.vmerged = False
+        self.paragraphs: list[Paragraph] = []
+
+
+class WordTable(_Slotted):
+    """
+    Таблица <w:tbl>.
+
+    Атрибуты:
+        col_count (int): число колонок (<w:gridCol>)
+        rows (list[list[WordCell]]): строки <w:tr> в порядке документа
+        paragraphs (list[Paragraph]): все абзацы таблицы в порядке документа
+                                      (включая вложенные таблицы)
+        inlines (tuple[str | None, ...] | None): relId inline-объектов таблицы
+    """
+    __slots__ = ('col_count', 'rows', 'paragraphs', 'inlines')
+    kind = 'tbl'
+
+    def __init__(self):
+        self.col_count = 0
+        self.rows: list[list[WordCell]] = []
+        self.paragraphs: list[Paragraph] = []
+        self.inlines: tuple[str | None, ...] | None = None
+
+    def to_data(self) -> list:
+        """
+        Значения слотов в виде данных JSON. Абзацы ячеек входят в paragraphs,
+        поэтому ячейки хранят их индексы — каждый абзац записывается один раз.
+        """
+        index = {id(paragraph): idx for idx, paragraph in enumerate(self.paragraphs)}
+        rows = [[[cell.span, cell.vmerged, [index[id(p)] for p in cell.paragraphs]] for cell in row]
+                for row in self.rows]
+        inlines = None if self.inlines is None else list(self.inlines)
+        return [self.col_count, [p.to_data() for p in self.paragraphs], rows, inlines]
+
+    @classmethod
+    def from_data(cls, data: list) -> "WordTable":
+        """Восстанавливает таблицу из данных to_data()."""
+        col_count, paragraphs, rows, inlines = data
+        table = cls()
+        table.col_count = col_count
+        table.paragraphs = [Paragraph.from_data(p) for p in paragraphs]
+        for row in rows:
+            cells = []
+            for span, vmerged, indexes in row:
+                cell = WordCell()
+                cell.span = span
+                cell.vmerged = vmerged
+                cell.paragraphs = [table.paragraphs[idx] for idx in indexes]
+                cells.append(cell)
+            table.rows.append(cells)
+        if inlines is not None:
+            table.inlines = tuple(inlines)
+        return table
+
+    def digest(self) -> str:
+        """
+        SHA-1 содержимого таблицы, влияющего на её топик (сетка, объединения,
+        списки, текст и сноски ячеек) — для манифеста сборки.
+        """
+        content = (self.col_count, [
+            [(cell.span, cell.vmerged, [
+                (p.list_level, p.has_runs, p.lead,
+                 [(sorted(ref.attrib.items()), ref.tail) for ref in p.footnotes or ()])
+                for p in cell.paragraphs])
+             for cell in row]
+            for row in self.rows])
+        return hashlib.sha1(repr(content).encode('utf-8')).hexdigest()
+
+
+# Классы блоков тела по виду (kind)
+_BLOCK_TYPES = {cls.kind: cls for cls in (Paragraph, WordTable)}
+
+
+def blocks_to_data(blocks: list[Paragraph | WordTable]) -> list:
+    """Блоки тела в виде данных JSON: [вид, данные to_data()] для каждого блока."""
+    return [[block.kind, block.to_data()] for block in blocks]
+
+
+def blocks_from_data(data: list) -> list[Paragraph | WordTable]:
+    """Восстанавливает блоки тела из данных blocks_to_data()."""
+    return [_BLOCK_TYPES[kind].from_data(block) for kind, block in data]
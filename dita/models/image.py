@@ -18,15 +18,14 @@ dita.utils.id_generators
 
 import xml.etree.ElementTree as ET
 import dita.config.config as config
-import os
-import imghdr
-import struct
 from dita.utils.translit import get_proper_id
 import logging
-import shutil
 import re
 from abc import ABC, abstractmethod
 from dita.utils.id_generators import gen_img_id
+from dita.storage.sink import get_sink
+from dita.storage.manifest import write_artifact
+from dita.utils.xml_writer import write_tree
 
 logger = logging.getLogger(__name__)
 
@@ -47,7 +46,11 @@ class ImageTopic(ABC):
         self.topic: ET.Element — корневой XML элемент topic.
         self.body: ET.Element — элемент body внутри topic.
         self.logger: logging.Logger — локальный логгер.
+
+    Атрибут класса stage — этап сборки справочника (для манифеста сборки).
     """
+    stage = 'images'
+
     def __init__(self, props: dict):
         self.props = props
         self.ids: list[str] = []  # Список уже используемых id изображений в этом топике
@@ -64,46 +67,6 @@ class ImageTopic(ABC):
         # Локальный логгер
         self.logger = logging.getLogger(__name__)
 
-    def _get_image_size(self, fname: str):
-        """
-        Вспомогательная функция, которая пытается получить размеры изображения.
-        Поддерживает PNG, GIF, JPEG.
-        Возвращает: (width, height) или None при ошибке / неизвестном формате.
-        """
-        with open(fname, 'rb') as fhandle:
-            head = fhandle.read(24)
-            if len(head) != 24:
-                return
-            if imghdr.what(fname) == 'png':
-                # PNG: байты 16:24 содержат width,height
-                check = struct.unpack('>i', head[4:8])[0]
-                if check != 0x0d0a1a0a:
-                    return
-                width, height = struct.unpack('>ii', head[16:24])
-            elif imghdr.what(fname) == 'gif':
-                width, height = struct.unpack('<HH', head[6:10])
-            elif imghdr.what(fname) == 'jpeg':
-                try:
-                    fhandle.seek(0)
-                    size = 2
-                    ftype = 0
-                    while True:
-                        fhandle.seek(size, 1)
-                        byte = fhandle.read(1)
-                        while byte == b'\xFF':
-                            byte = fhandle.read(1)
-                        ftype = ord(byte)
-                        if 0xC0 <= ftype <= 0xCF:
-                            break
-                        size = struct.unpack('>H', fhandle.read(2))[0] - 2
-                    fhandle.read(3)
-                    height, width = struct.unpack('>HH', fhandle.read(4))
-                except Exception:
-                    return
-            else:
-                return
-            return width, height
-
     def save(self):
         """
         Сохраняет self.topic в файл в папке {output_dir}/{document_type}/sp
@@ -112,25 +75,13 @@ class ImageTopic(ABC):
         output_dir = f"{config.output_dir}/{config.document_type}/sp"
         out_file = f'{self.props["file"]}'
 
-        try:
-            os.makedirs(output_dir, exist_ok=True)
-        except Exception:
-            pass
-
-        header = b"""<?xml version="1.0" encoding="UTF-8"?>\n<!DOCTYPE topic PUBLIC "-//OASIS//DTD DITA Topic//EN" "topic.dtd">\n"""
-        ET.indent(self.topic)
-        topic_bytes = ET.tostring(self.topic, encoding='utf-8')
-
-        with open(f"{output_dir}/{out_file}", "wb") as f:
-            f.write(header)
-            f.write(topic_bytes)
+        # Отложенная запись через общий приёмник (папки создаются автоматически):
+        # XML с заголовком DTD выводится прямо в файл
+        write_artifact(f"{output_dir}/{out_file}", lambda stream: write_tree(stream, self.topic, 'topic'),
+                       self.stage)
 
         # Копируем placeholder-изображение (null.png) в папку images
-        try:
-            os.makedirs(f"{config.output_dir}/{config.document_type}/images")
-        except FileExistsError:
-            pass
-        shutil.copy("null.png", f"{config.output_dir}/{config.document_type}/images/_null.png")
+        get_sink().copy("null.png", f"{config.output_dir}/{config.document_type}/images/_null.png")
 
         @abstractmethod
         def add_image():
@@ -143,9 +94,11 @@ class ImageKeyTopic(ImageTopic):
 
     Использование:
         key_topic = ImageKeyTopic()
-        key_topic.add_image("Заголовок рисунка", "../images/image1.png")
+        key_topic.add_image("Заголовок рисунка", "../../images/3f2a...c1.png", (800, 600))
         key_topic.save()
     """
+    stage = 'images'
+
     def __init__(self):
         # props — свойства топика: title, id топика и имя файла
         self.props = {
@@ -155,13 +108,14 @@ class ImageKeyTopic(ImageTopic):
         }
         super().__init__(self.props)
 
-    def add_image(self, image_title: str, href: str):
+    def add_image(self, image_title: str, href: str, size: tuple[int, int] | None):
         """
         Добавляет новую запись рисунка в справочник.
 
         Параметры:
             image_title: str — подпись/название рисунка (будет в <title>)
-            href: str — относительный путь к файлу изображения (например "../images/image1.png")
+            href: str — относительный путь к файлу изображения (например "../../images/3f2a...c1.png")
+            size: tuple[int, int] | None — размеры изображения (Docx.image_size) или None
         """
         # Генерация уникального image_id: предпочтительно используем gen_img_id (центральный генератор)
         image_id = gen_img_id(image_title) # см. dita.utils.id_generators
@@ -180,14 +134,9 @@ class ImageKeyTopic(ImageTopic):
         image_el = ET.SubElement(fig, 'image')
         image_el.set('href', href)
 
-        # Попытаться получить ширину изображения и записать её (ограничение 640)
-        try:
-            w, h = self._get_image_size(f"{config.output_dir}/{config.document_type}/images/{href.split('/')[-1]}")
-            if w > 640:
-                w = 640
-            image.set('width', str(w))
-        except Exception as e:
-            pass
+        # Ширина изображения, если размеры известны (ограничение 640)
+        if size is not None:
+            image_el.set('width', str(min(size[0], 640)))
 
     def validate_id(self, candidate_id: str) -> str:
         """
@@ -213,6 +162,8 @@ class IconKeyTopic(ImageTopic):
     Справочник иконок — маленьких изображений (например, 16x16/32x32).
     Иконки добавляются в блок <bodydiv> как <p><image .../></p>, только если их реальные размеры меньше порога.
     """
+    stage = 'icons'
+
     def __init__(self):
         # props для справочника иконок
         self.props = {
@@ -221,32 +172,31 @@ class IconKeyTopic(ImageTopic):
             "file": f"{config.document_type.lower()}-icon_list.dita"
         }
         # Передаём self.props в базовый конструктор
-        super().__init__(props)
+        super().__init__(self.props)
         # Для иконок используем дополнительный контейнер bodydiv
         self.bodydiv = ET.SubElement(self.body, 'bodydiv')
 
-    def add_image(self, image_rel_id: str, href: str):
+    def add_image(self, image_rel_id: str, href: str, size: tuple[int, int] | None):
         """
         Добавляет иконку в справочник, если её реальные размеры меньше порога (100x100).
 
         Параметры:
             image_rel_id: str — идентификатор (обычно rId или сгенерированный id)
-            href: str — относительный путь к файлу изображения (../images/...)
+            href: str — относительный путь к файлу изображения (../../images/...)
+            size: tuple[int, int] | None — размеры изображения (Docx.image_size);
+                  None — размеры неизвестны, иконка не добавляется
         """
         # Если уже есть такой id — не добавляем дубликат
-        if image_rel_id in self.ids:
+        if image_rel_id in self.ids or size is None:
             return
 
-        try:
-            w, h = self._get_image_size(f'{config.output_dir}/{config.document_type}/images/{href.split("/")[-1]}')
-            # Добавляем иконку только если обе стороны меньше 100 px
-            if w < 100 and h < 100:
-                para = ET.SubElement(self.bodydiv, 'p')
-                image = ET.SubElement(para, 'image')
-                image.set("id", image_rel_id)
-                image.set("href", href)
-                image.set("width", "32")
-                image.set("height", "32")
-                self.ids.append(image_rel_id)
-        except Exception:
-            return
\ No newline at end of file
+        w, h = size
+        # Добавляем иконку только если обе стороны меньше 100 px
+        if w < 100 and h < 100:
+            para = ET.SubElement(self.bodydiv, 'p')
+            image = ET.SubElement(para, 'image')
+            image.set("id", image_rel_id)
+            image.set("href", href)
+            image.set("width", "32")
+            image.set("height", "32")
+            self.ids.append(image_rel_id)
\ No newline at end of file
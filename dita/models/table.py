@@ -4,6 +4,7 @@
 ---------------
 Содержит классы для работы с таблицами в DITA:
     • Table — модель таблицы с методами добавления строк, ячеек, заголовков и объединений.
+    • TableCell — ячейка сетки таблицы (объединения и содержимое).
     • TableKeyReference — генератор карты ключей (keydef) для всех таблиц документа.
 
 Основные изменения:
@@ -13,80 +14,90 @@
 """
 
 import xml.etree.ElementTree as ET
+from typing import BinaryIO
 from dita.utils.translit import get_proper_id
 import dita.config.config as config
-import os
+from dita.storage.manifest import write_artifact
+from dita.utils.xml_writer import XmlWriter, tostring
+
+class TableCell:
+    """
+    Ячейка сетки таблицы.
+
+    Атрибуты:
+        span (int): ширина горизонтального объединения (0 — без объединения).
+        vmerged (bool): ячейка объединена по вертикали с ячейкой выше (в XML не выводится).
+        morerows (int): сколько строк ниже присоединено к ячейке (0 — нет объединения).
+        entry (ET.Element | None): содержимое ячейки — готовый элемент <entry>.
+    """
+    __slots__ = ('span', 'vmerged', 'morerows', 'entry')
+
+    def __init__(self, span: int = 0, vmerged: bool = False):
+        self.span = span
+        self.vmerged = vmerged
+        self.morerows = 0
+        self.entry: ET.Element | None = None
+
 
 class Table:
     """
     Класс для представления таблицы DITA (<table>).
     Позволяет создавать структуру таблицы, добавлять строки и объединять ячейки.
+
+    Строки хранятся в компактной сетке ячеек (TableCell); XML таблицы
+    (<tgroup>/<tbody>) строится один раз при экспорте — свойство table
+    или str(table), — без ячеек-заглушек и без поиска по дереву.
     """
     def __init__(self, title="Тестовая таблица"):
-        self.previous_row = None
-        # Корневой элемент таблицы <table>
-        self.table = ET.Element("table")
+        # Заголовок таблицы (<title>)
+        self.title = title
 
-        # Элемент заголовка таблицы <title>
-        self.title = ET.SubElement(self.table, "title")
-        self.title.text = title
+        # Идентификатор таблицы (<table id="...">)
+        self.table_id = None
 
-        # Элемент <tgroup> — контейнер для колонок и тела таблицы
-        self.tgroup = ET.SubElement(self.table, "tgroup")
-        
         # Количество колонок (устанавливается позже)
-        self.colnum = None
+        self.col_count = None
 
-        # Элемент <tbody> — тело таблицы (все строки)
-        self.tbody = ET.SubElement(self.tgroup, "tbody")
+        # Строки таблицы: списки ячеек
+        self.rows: list[list[TableCell]] = []
 
         # Последняя строка, добавленная в таблицу (для объединения)
         self.previous_row = None
 
+        # Трекер колонок: для каждой позиции ячейки — ячейка, к которой
+        # присоединяется следующая вертикально объединённая (начало объединения
+        # с morerows), или None, если объединять не с чем. До первой строки — None.
+        self._anchors: list[TableCell | None] | None = None
+
     def add_entries(self, entries: list[ET.Element]):
         """
         Обновляет последнюю строку таблицы, вставляя готовые элементы <entry> в ячейки.
+        Атрибуты ячеек (объединения) задаются при экспорте.
 
         Аргументы:
             entries (list[ET.Element]): список элементов <entry> для текущей строки.
         """
-        last_row = self.tbody.findall("row")[-1]  # последняя добавленная строка
+        last_row = self.previous_row  # последняя добавленная строка
         for idx, new_entry in enumerate(entries):
             if new_entry is not None:
-                # Находим старую ячейку, сохраняем её атрибуты (например colspan)
-                old_entry = last_row.findall("entry")[idx]
-                entry_attrs = old_entry.attrib
-                last_row.remove(old_entry)
-
-                # Переносим атрибуты в новый элемент
-                new_entry.attrib = entry_attrs
-                last_row.insert(idx, new_entry)
+                last_row[idx].entry = new_entry
 
     def set_title(self, title_text: str):
         """Задаёт заголовок таблицы."""
-        self.title.text = title_text
+        self.title = title_text
 
     def set_id(self, table_id: str):
         """Назначает идентификатор таблицы (<table id="...">)."""
-        self.table.set("id", table_id)
+        self.table_id = table_id
 
     def set_colnum(self, col_number: int):
         """
-        Устанавливает количество колонок таблицы и создаёт соответствующие <colspec>.
+        Устанавливает количество колонок таблицы (по ним при экспорте создаются <colspec>).
 
         Аргументы:
             col_number (int): число колонок в таблице.
         """
         self.col_count = col_number
-        self.tgroup.set("cols", str(col_number))
-
-        # Для каждой колонки создаём <colspec>        
-        for i in range(self.col_count):
-            colspec = ET.Element("colspec")
-            colspec.set("colnum", str(i + 1))
-            colspec.set("colwidth", "1*")  # пропорциональная ширина
-            colspec.set("colname", f"col{i + 1}")
-            self.tgroup.insert(i, colspec)
 
     def add_row(self, row_cells: list[str]):
         """
@@ -99,69 +110,101 @@ class Table:
                                      'vmerged' — ячейка объединена по вертикали;
                                      число — ширина горизонтального объединения.
         """
-        row = ET.SubElement(self.tbody, "row")
+        row: list[TableCell] = []
+        # Трекер колонок для следующей строки: по одной позиции на ячейку этой строки
+        anchors: list[TableCell | None] = []
         for idx, cell_value in enumerate(row_cells):
             if cell_value == "vmerged":
-                # Добавляем объединённую по вертикали ячейку
-                self._mark_first_merged_cell(idx)
-                cell_el = ET.SubElement(row, "entry")
-                cell_el.set("vmerged", "")
+                # Объединённая по вертикали ячейка
+                anchors.append(self._mark_first_merged_cell(idx))
+                row.append(TableCell(vmerged=True))
             elif cell_value != "":
                 # Горизонтальное объединение (span)
-                span_value = cell_value
-                cell_el = ET.SubElement(row, "entry")
-                cell_el.set("namest", f"col{idx + 1}")
-                cell_el.set("nameend", f"col{idx + int(span_value)}")
+                cell = TableCell(span=int(cell_value))
+                row.append(cell)
+                anchors.append(cell)
             else:
                 # Пустая ячейка
-                ET.SubElement(row, "entry")
+                cell = TableCell()
+                row.append(cell)
+                anchors.append(cell)
+
+        self.rows.append(row)
+        self.previous_row = row
+        self._anchors = anchors
 
-    def _mark_first_merged_cell(self, col_index: int):
+    def _mark_first_merged_cell(self, col_index: int) -> TableCell | None:
         """
-        Ищет первую ячейку выше по колонке и отмечает её как начало объединения (morerows=N).
+        Отмечает первую ячейку выше по колонке как начало объединения (morerows=N).
+
+        Ячейка берётся из трекера колонок за O(1) — строки выше не просматриваются.
+        Трекер хранит позиции только для ячеек последней строки, поэтому если
+        в строке выше нет ячейки с таким индексом, выбрасывается IndexError.
 
         Аргументы:
             col_index (int): индекс колонки (начиная с 0), в которой идёт объединение.
+
+        Возвращает:
+            TableCell | None: начало объединения или None, если объединять не с чем
         """
-        # Берём все строки, кроме текущей (последней)
-        previous_rows = self.tbody.findall("row")[:-1 or None]
+        # В первой строке объединять не с чем
+        if self._anchors is None:
+            return None
 
-        # Идём снизу вверх, чтобы найти первую подходящую ячейку
-        for prev_row in reversed(previous_rows):
-            cells = prev_row.findall("entry")
-            target_cell = cells[col_index]
+        target_cell = self._anchors[col_index]
+        if target_cell is not None:
+            target_cell.morerows += 1
+        return target_cell
 
-            # Если ячейка уже объединена — продолжаем поиск выше
-            if "vmerged" in target_cell.attrib:
-                continue
-            else:
-                # Если ячейка уже имеет morerows — увеличиваем значение
-                if "morerows" in target_cell.attrib:
-                    merged_count = target_cell.attrib["morerows"]
-                    target_cell.set("morerows", str(int(merged_count) + 1))
-                else:
-                    # Первое объединение — ставим morerows="1"
-                    target_cell.set("morerows", "1")
-                break
+    @property
+    def table(self) -> ET.Element:
+        """
+        Элемент <table>, построенный по сетке ячеек.
+        Каждое обращение строит новый элемент — используйте его один раз при экспорте.
+        """
+        table = ET.Element("table")
+        if self.table_id is not None:
+            table.set("id", self.table_id)
+        ET.SubElement(table, "title").text = self.title
+
+        # <tgroup> — контейнер для колонок и тела таблицы
+        tgroup = ET.SubElement(table, "tgroup")
+        if self.col_count is not None:
+            tgroup.set("cols", str(self.col_count))
+            # Для каждой колонки — <colspec> с пропорциональной шириной
+            for i in range(self.col_count):
+                ET.SubElement(tgroup, "colspec", {"colnum": str(i + 1), "colwidth": "1*", "colname": f"col{i + 1}"})
+
+        # <tbody> — все строки; ячейки, объединённые по вертикали, не выводятся
+        tbody = ET.SubElement(tgroup, "tbody")
+        for row in self.rows:
+            row_el = ET.SubElement(tbody, "row")
+            for idx, cell in enumerate(row):
+                if cell.vmerged:
+                    continue
+                entry = cell.entry if cell.entry is not None else ET.Element("entry")
+                attrib = {}
+                if cell.span:
+                    attrib["namest"] = f"col{idx + 1}"
+                    attrib["nameend"] = f"col{idx + cell.span}"
+                if cell.morerows:
+                    attrib["morerows"] = str(cell.morerows)
+                entry.attrib = attrib
+                row_el.append(entry)
+        return table
 
     def __str__(self):
         """
         Возвращает красиво отформатированное XML-представление таблицы.
         """
-        ET.indent(self.table)
-        self.clear()  # очищаем виртуальные ячейки перед выводом
-        return ET.tostring(self.table, encoding="utf-8").decode("utf-8")
+        return tostring(self.table).decode("utf-8")
 
 
     def clear(self):
         """
-        Удаляет все "виртуальные" ячейки <entry vmerged=""/> из таблицы.
-        Используется перед экспортом, чтобы избежать дублирования.
+        Оставлено для совместимости: "виртуальные" ячейки <entry vmerged=""/>
+        больше не создаются — объединённые ячейки пропускаются при экспорте.
         """
-        for parent_row in self.table.findall(".//row"):
-            for merged_entry in parent_row.findall(".//entry"):
-                if "vmerged" in merged_entry.attrib:
-                    parent_row.remove(merged_entry)
 
 class TableKeyReference:
     """
@@ -176,17 +219,13 @@ class TableKeyReference:
         </map>
     """
     def __init__(self):
-        # Корневой элемент карты <map>
-        self.map = ET.Element("map")
-        self.map.set("id", f"{config.document_type}-KEYLIST-TABLES")
-        self.map.set("xml:lang", "ru")
-        
-        # Заголовок карты
-        title_el = ET.SubElement(self.map, "title")
-        title_el.text = "Список ключей таблиц"
+        # ID карты и заголовок
+        self.map_id = f"{config.document_type}-KEYLIST-TABLES"
+        self.title = "Список ключей таблиц"
 
-        # Контейнер для всех ключей таблиц
-        self.topic_group = ET.SubElement(self.map, "topicgroup")
+        # Ключи таблиц в порядке добавления: (заголовок таблицы, ID таблицы).
+        # XML не строится заранее — карта выводится потоково при сохранении
+        self.keys: list[tuple[str, str]] = []
 
 
     def add_keydef(self, table_title: str, table_id: str):
@@ -197,14 +236,7 @@ class TableKeyReference:
             table_title (str): заголовок таблицы (используется как комментарий)
             table_id (str): уникальный идентификатор таблицы
         """
-        # Комментарий с названием таблицы для читаемости XML
-        comment = ET.Comment(f"{table_title}")
-        self.topic_group.append(comment)
-
-        # Определение ключа <keydef>
-        keydef = ET.SubElement(self.topic_group, "keydef")
-        keydef.set("keys", table_id)
-        keydef.set("href", f"table/{table_id}.dita") # путь к DITA-файлу
+        self.keys.append((table_title, table_id))
 
     def save(self):
         """
@@ -214,17 +246,21 @@ class TableKeyReference:
         output_dir = f"{config.output_dir}/{config.document_type}"
         output_file = f"{config.document_type}-KeyList-Tables.ditamap"
 
-        # Создаём выходную папку при необходимости
-        os.makedirs(output_dir, exist_ok=True)
+        # Записываем на диск (отложенная запись через общий приёмник):
+        # карта выводится потоково прямо в файл
+        write_artifact(f"{output_dir}/{output_file}", self.write, 'tables')
 
-        # Заголовок XML (DTD)
-        header = b"""<?xml version="1.0" encoding="UTF-8"?>\n<!DOCTYPE bookmap PUBLIC "-//OASIS//DTD DITA BookMap//EN" "bookmap.dtd">\n"""
-        
-        # Форматируем и сериализуем XML
-        ET.indent(self.map)
-        map_bytes = ET.tostring(self.map, encoding="utf-8")
+    def write(self, stream: BinaryIO):
+        """Выводит карту таблиц с заголовком (DTD) в двоичный поток stream."""
+        writer = XmlWriter(stream, doctype='bookmap')
+        writer.start("map", {"id": self.map_id, "xml:lang": "ru"})
+        writer.element("title", self.title)
 
-        # Записываем на диск
-        with open(f"{output_dir}/{output_file}", "wb") as f:
-            f.write(header)
-            f.write(map_bytes)
\ No newline at end of file
+        # Контейнер для всех ключей таблиц
+        writer.start("topicgroup")
+        for table_title, table_id in self.keys:
+            # Комментарий с названием таблицы для читаемости XML
+            writer.comment(table_title)
+            # Определение ключа <keydef> со ссылкой на DITA-файл
+            writer.element("keydef", attrib={"keys": table_id, "href": f"table/{table_id}.dita"})
+        writer.close()
\ No newline at end of file
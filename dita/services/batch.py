@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+Модуль batch.py
+---------------
+Пакетная конвертация набора .docx файлов в пуле процессов.
+
+Каждый документ обрабатывается в отдельном процессе-исполнителе: перед
+конвертацией исполнитель переключает dita.config.config на свой файл,
+тип документа и папку вывода (config.configure). Исполнитель обрабатывает
+ровно один документ и завершается (max_tasks_per_child=1), поэтому
+состояние модулей (реестры ID, индекс хранилища изображений, приёмник,
+книга, манифест) не переходит от документа к документу и результат
+не зависит от того, какой исполнитель взял файл.
+
+Для каждого документа выполняются этапы обычного запуска: топики, карты глав
+и BookMap (оглавление всегда берётся из стилей заголовков .docx — word.txt
+в пакетном режиме не используется), таблицы, рисунки и иконки. Все этапы
+работают в одном проходе по телу документа.
+
+Тип документа задаёт папку вывода {output_dir}/{тип}, поэтому типы в пакете
+должны быть разными: run_batch отклоняет пакет с повторяющимися типами
+(без учёта регистра) до запуска исполнителей.
+
+Функции:
+    collect_inputs(specs, default_type)
+        — разворачивает список файлов/папок в пары (путь, тип документа).
+    convert_document(path, document_type, output_dir)
+        — конвертирует один документ и возвращает сводку по нему.
+    check_unique_types(inputs)
+        — проверяет, что у документов пакета разные типы.
+    run_batch(inputs, jobs, output_dir)
+        — конвертирует документы параллельно и возвращает сводки.
+"""
+
+import os
+import re
+import glob
+import time
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import dita.config.config as config
+
+logger = logging.getLogger(__name__)
+
+# Допустимый тип документа в спецификации "путь=ТИП" (без разделителей пути и точек)
+_DOC_TYPE_PATTERN = re.compile(r'[\w-]+')
+
+
+def collect_inputs(specs: list[str], default_type: str | None = None) -> list[tuple[str, str]]:
+    """
+    Разворачивает входные данные пакетного режима.
+
+    Аргументы:
+        specs (list[str]): пути к .docx файлам или папкам; тип документа для файла
+                           можно указать через "=", например "specs/ro.docx=RO".
+                           Часть после последнего "=" считается типом, только если
+                           это допустимый тип (буквы, цифры, "_" и "-"), а вся строка
+                           не является существующим путём — иначе это часть пути.
+        default_type (str | None): тип документа по умолчанию; если не задан,
+                                   используется имя файла без расширения.
+
+    Возвращает:
+        list[tuple[str, str]]: пары (путь к .docx, тип документа)
+    """
+    inputs: list[tuple[str, str]] = []
+    for spec in specs:
+        path, sep, doc_type = spec.rpartition('=')
+        if not sep or os.path.exists(spec) or not _DOC_TYPE_PATTERN.fullmatch(doc_type):
+            path, doc_type = spec, default_type
+
+        if os.path.isdir(path):
+            paths = sorted(glob.glob(os.path.join(path, '*.docx')))
+        else:
+            paths = [path]
+
+        for docx_path in paths:
+            # Временные файлы Word (~$file.docx) пропускаем
+            if os.path.basename(docx_path).startswith('~$'):
+                continue
+            stem = os.path.splitext(os.path.basename(docx_path))[0]
+            inputs.append((docx_path, doc_type or stem))
+    return inputs
+
+
+def convert_document(path: str, document_type: str, output_dir: str | None = None) -> dict:
+    """
+    Конвертирует топики (по оглавлению из .docx), таблицы, рисунки и иконки
+    одного документа за один проход по его телу. CSV оглавления пишется в папку
+    типа документа, чтобы документы пакета не перезаписывали его друг у друга.
+
+    Возвращает:
+        dict: сводка — file, document_type, topics, tables, images, icons, seconds, error
+    """
+    # Импорт внутри функции: исполнитель импортирует конвертеры уже после configure
+    from dita.core.book import process_topics
+    from dita.services.docx_body import BodyDispatcher
+    from dita.services.docx_toc import TocExtractor
+    from dita.services.docx_tables import TableConverter
+    from dita.services.docx_images import ImageConverter, IconConverter
+    from dita.utils.id_registry import save_registries, claimed_ids
+    from dita.storage.manifest import save_manifest
+    from dita.storage.sink import close_sink
+
+    started = time.perf_counter()
+    summary = {
+        'file': path,
+        'document_type': document_type,
+        'topics': 0,
+        'tables': 0,
+        'images': 0,
+        'icons': 0,
+        'seconds': 0.0,
+        'error': None,
+    }
+
+    try:
+        config.configure(path, document_type, output_dir)
+        if config.docx is None:
+            raise FileNotFoundError(f"Could not read the docx file {path}")
+
+        # Документы уже конвертируются параллельно — тело разбирается в том же процессе
+        dispatcher = BodyDispatcher(config.docx, workers=1)
+        # Оглавление собирается в том же проходе, топики строятся после него
+        toc_extractor = TocExtractor(config.docx)
+        toc_extractor.register(dispatcher)
+        tables = images = icons = None
+        if config.process_tables_in_docx:
+            # Документы уже конвертируются параллельно — таблицы в том же процессе
+            tables = TableConverter(workers=1)
+            tables.register(dispatcher)
+        if config.process_images_in_docx:
+            images = ImageConverter(config.docx)
+            images.register(dispatcher)
+        if config.process_icons_in_docx:
+            icons = IconConverter(config.docx)
+            icons.register(dispatcher)
+        dispatcher.run()
+        summary['topics'] = process_topics(toc_extractor.headings,
+                                           f"{config.output_dir}/{config.document_type}")
+
+        write_errors = close_sink()
+        save_manifest(claimed_ids())
+        save_registries()
+        if write_errors:
+            raise OSError(f"{len(write_errors)} files could not be written, first: {write_errors[0]}")
+
+        summary['tables'] = tables.count if tables else 0
+        summary['images'] = len(images.image_key_topic.ids) if images else 0
+        summary['icons'] = len(icons.icon_key_topic.ids) if icons else 0
+    except Exception as e:
+        logger.error(f"Failed to convert {path}: {e}")
+        summary['error'] = str(e)
+        # Дописываем то, что успело попасть в очередь, и сохраняем реестры ID
+        close_sink()
+        save_registries()
+
+    summary['seconds'] = time.perf_counter() - started
+    return summary
+
+
+def check_unique_types(inputs: list[tuple[str, str]]):
+    """
+    Проверяет, что у документов пакета разные типы (без учёта регистра).
+    Документы одного типа пишут в одну папку {output_dir}/{тип} со своими
+    реестрами ID и манифестами и затирают результаты друг друга.
+
+    Исключения:
+        ValueError: если тип повторяется; в сообщении — тип и его файлы
+    """
+    paths_by_type: dict[str, list[str]] = {}
+    for path, doc_type in inputs:
+        paths_by_type.setdefault(doc_type.casefold(), []).append(path)
+    duplicates = [paths for paths in paths_by_type.values() if len(paths) > 1]
+    if duplicates:
+        details = "; ".join(", ".join(paths) for paths in duplicates)
+        raise ValueError(f"Several documents share a document type, give each its own type "
+                         f"with PATH=TYPE: {details}")
+
+
+def run_batch(inputs: list[tuple[str, str]], jobs: int | None = None,
+              output_dir: str | None = None) -> list[dict]:
+    """
+    Конвертирует документы параллельно в пуле процессов.
+
+    Аргументы:
+        inputs (list[tuple[str, str]]): пары (путь к .docx, тип документа)
+        jobs (int | None): число процессов (по умолчанию — число ядер)
+        output_dir (str | None): папка вывода (по умолчанию — из settings.ini)
+
+    Возвращает:
+        list[dict]: сводки по документам в порядке входного списка
+
+    Исключения:
+        ValueError: если у документов повторяются типы (см. check_unique_types)
+    """
+    check_unique_types(inputs)
+    summaries: list[dict | None] = [None] * len(inputs)
+
+    # spawn и один документ на исполнитель: каждый документ начинается
+    # с чистым состоянием модулей
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=context, max_tasks_per_child=1) as pool:
+        futures = {
+            pool.submit(convert_document, path, doc_type, output_dir): idx
+            for idx, (path, doc_type) in enumerate(inputs)
+        }
+        for future in as_completed(futures):
+            summary = future.result()
+            summaries[futures[future]] = summary
+            logger.info(f"{summary['file']}: done in {summary['seconds']:.2f} s")
+    return summaries
+
+
+def format_summary(summaries: list[dict], elapsed: float) -> str:
+    """
+    Формирует текстовую сводку по каждому документу и по пакету в целом.
+    """
+    lines = []
+    for s in summaries:
+        status = f"ERROR: {s['error']}" if s['error'] else "ok"
+        lines.append(f"{s['file']} [{s['document_type']}]: topics={s['topics']} tables={s['tables']} "
+                     f"images={s['images']} icons={s['icons']} {s['seconds']:.2f} s {status}")
+
+    failed = sum(1 for s in summaries if s['error'])
+    lines.append(f"Total: {len(summaries)} files ({failed} failed), "
+                 f"topics={sum(s['topics'] for s in summaries)} "
+                 f"tables={sum(s['tables'] for s in summaries)} "
+                 f"images={sum(s['images'] for s in summaries)} "
+                 f"icons={sum(s['icons'] for s in summaries)}, {elapsed:.2f} s")
+    return "\n".join(lines)
@@ -1,44 +1,42 @@
-import os
 import glob
+import time
 import zipfile
 import logging
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property
 import xml.etree.ElementTree as ET
 import dita.config.config as config
-
+from dita.storage.doc_cache import DocumentCache
+from dita.storage.images import ImageStore, PackageImageStore
+from dita.storage.sink import ZipSink, get_sink
+from dita.utils.image_size import image_size
 
 class Docx:
     """
     Класс для работы с Word-документом (.docx).
-    Загружает архив DOCX, извлекает XML-структуру документа, сноски, изображения и связи.
+    Открывает архив DOCX; XML-структура документа, сноски, связи и изображения
+    извлекаются лениво — при первом обращении этапа обработки к нужной части.
+    Связи, стили и сноски при включённом [docx] cache берутся из кэша разбора.
     """
 
-    def __init__(self):
+    def __init__(self, path: str | None = None, streaming: bool = False):
         # Логгер для вывода ошибок и отладки
         self.logger = logging.getLogger(__name__)
-        try:
-            # Находим путь к первому .docx файлу в текущей папке
-            docx_path = self._locate_docx()
-        except FileNotFoundError:
-            self.logger.error("Could not find the .docx file")
-            raise FileNotFoundError
+        if path is not None:
+            docx_path = path
+        else:
+            try:
+                # Находим путь к первому .docx файлу в текущей папке
+                docx_path = self._locate_docx()
+            except FileNotFoundError:
+                self.logger.error("Could not find the .docx file")
+                raise FileNotFoundError
 
-        # Открываем DOCX как zip-архив
+        # Открываем DOCX как zip-архив (читается только оглавление архива)
         self.archive: zipfile.ZipFile = zipfile.ZipFile(docx_path)
 
-        # Читаем содержимое нужных XML-файлов из архива
-        document_xml: bytes = self.archive.read('word/document.xml')     # основной текст
-        footnotes_xml: bytes = self.archive.read('word/footnotes.xml')   # сноски
-        self.rels_xml: bytes = self.archive.read('word/_rels/document.xml.rels')  # связи (картинки, объекты)
-
-        # Список всех файлов в архиве (для поиска медиа) внутри docx
-        self.files: list[zipfile.ZipInfo] = self.archive.infolist()
-
-        # Словарь для хранения соответствий ID → путь к файлу (media/image5.png)
-        self.id_to_path: dict[str, str] = {}
-
-        # Обрабатываем связи (rels), чтобы заполнить словарь id_to_path
-        self._process_rels()
-
         # Словарь пространств имён XML, используется при поиске элементов через XPath
         self.ns: dict[str, str] = {
             'w': "http://schemas.openxmlformats.org/wordprocessingml/2006/main",      # основной текст Word
@@ -47,15 +45,147 @@ class Docx:
             'r': "http://schemas.openxmlformats.org/officeDocument/2006/relationships" # связи
         }
 
-        # XML-дерево основного документа Word
-        self.document: ET.Element = ET.fromstring(document_xml)
-        
-        # Словарь сносок: footnote_id → XML-элемент сноски
-        self.footnotes: dict[str, ET.Element] = {}
-        self._process_footnotes(footnotes_xml)
-        
-        # Сохраняем все изображения из архива в локальную папку проекта
-        self._save_images()
+        # Потоковый режим: document.xml не загружается целиком, а читается
+        # по одному элементу тела через iter_body()
+        self.streaming: bool = streaming
+
+        # Флаг: изображения уже извлечены в папку проекта
+        self._images_saved: bool = False
+        # Статистика извлечения медиа: (записано байт, секунд)
+        self.media_stats: tuple[int, float] = (0, 0.0)
+        # Элемент архива (word/media/image5.png) → путь к файлу в хранилище изображений
+        self.media: dict[str, str] = {}
+        # Путь к файлу изображения → размеры (ширина, высота) или None
+        self.image_sizes: dict[str, tuple[int, int] | None] = {}
+
+    @cached_property
+    def files(self) -> list[zipfile.ZipInfo]:
+        """Список всех файлов в архиве (для поиска медиа) внутри docx."""
+        return self.archive.infolist()
+
+    @cached_property
+    def rels_xml(self) -> bytes:
+        """Содержимое файла связей document.xml.rels (картинки, объекты)."""
+        return self.archive.read('word/_rels/document.xml.rels')
+
+    @cached_property
+    def cache(self) -> DocumentCache | None:
+        """Кэш разбора документа (None — [docx] cache выключен или недоступен)."""
+        if not config.docx_cache:
+            return None
+        try:
+            return DocumentCache(config.docx_cache_dir, self.archive.filename)
+        except OSError as e:
+            self.logger.warning(f"Could not use the docx cache: {e}")
+            return None
+
+    @cached_property
+    def rels(self) -> dict[str, str]:
+        """Связи с изображениями из document.xml.rels: rId → путь внутри docx."""
+        return self._cached('rels', self._process_rels)
+
+    @cached_property
+    def id_to_path(self) -> dict[str, str]:
+        """
+        Словарь соответствий ID → путь к файлу изображения.
+        Изображения из архива указывают на файл в хранилище изображений
+        ({image_store}/<хэш>.png); остальные цели связей остаются как в .rels.
+        """
+        self.save_images()
+        return {
+            rel_id: self.media.get(posixpath.normpath(f"word/{target_path}"), target_path)
+            for rel_id, target_path in self.rels.items()
+        }
+
+    @cached_property
+    def document(self) -> ET.Element | None:
+        """XML-дерево основного документа Word (None в потоковом режиме)."""
+        if self.streaming:
+            return None
+        return ET.fromstring(self.archive.read('word/document.xml'))
+
+    @cached_property
+    def footnotes(self) -> dict[str, ET.Element]:
+        """Словарь сносок: footnote_id → XML-элемент сноски."""
+        footnotes: dict[str, ET.Element] = {}
+        for footnote_id, texts in self._cached('footnotes', self._read_footnotes).items():
+            fn_el = ET.Element('fn')  # создаём свой элемент <fn> для хранения
+            for footnote_text in texts:
+                ET.SubElement(fn_el, 'p').text = footnote_text  # абзац внутри сноски
+            footnotes[footnote_id] = fn_el
+        return footnotes
+
+    @cached_property
+    def styles(self) -> dict[str, tuple[int | None, bool]]:
+        """
+        Стили абзацев из styles.xml: styleId → (уровень заголовка 1..9 или None,
+        есть ли у стиля автонумерация). Значения учитывают цепочку basedOn.
+        """
+        return self._cached('styles', self._read_styles,
+                            lambda data: {style_id: tuple(value) for style_id, value in data.items()})
+
+    def save_images(self):
+        """
+        Сохраняет все изображения из архива в хранилище изображений.
+        Повторные вызовы ничего не делают — извлечение выполняется один раз.
+
+        Возвращает:
+            tuple[int, float]: число записанных байт и затраченное время в секундах
+        """
+        if not self._images_saved:
+            self.media_stats = self._save_images()
+            self._images_saved = True
+        return self.media_stats
+
+    def image_size(self, rel_id: str) -> tuple[int, int] | None:
+        """
+        Размеры изображения связи rel_id в пикселях: (ширина, высота) или None,
+        если формат не распознан. Читается только заголовок элемента архива
+        (dita.utils.image_size); результат запоминается по пути файла изображения,
+        поэтому справочники рисунков и иконок не читают один файл дважды.
+        """
+        path = self.id_to_path[rel_id]
+        if path in self.image_sizes:
+            return self.image_sizes[path]
+        size = None
+        try:
+            with self.archive.open(posixpath.normpath(f"word/{self.rels[rel_id]}")) as src:
+                size = image_size(src)
+        except (KeyError, OSError, zipfile.BadZipFile) as e:
+            self.logger.debug(f"Could not read the image {rel_id}: {e}")
+        self.image_sizes[path] = size
+        return size
+
+    def _cached(self, part: str, build, load=None):
+        """
+        Возвращает часть разбора из кэша или строит её функцией build и кэширует.
+        load восстанавливает значение из данных JSON (например, кортежи из списков).
+        """
+        cache = self.cache
+        value = cache.get(part, load) if cache is not None else None
+        if value is None:
+            value = build()
+            if cache is not None:
+                cache.put(part, value)
+        return value
+
+    def _read_styles(self) -> dict[str, tuple[int | None, bool]]:
+        """Читает и разбирает styles.xml (пустой словарь, если файла нет)."""
+        try:
+            styles_xml: bytes = self.archive.read('word/styles.xml')
+        except KeyError:
+            # В документе нет таблицы стилей
+            return {}
+        return self._process_styles(styles_xml)
+
+    def _read_footnotes(self) -> dict[str, list[str]]:
+        """Читает и разбирает footnotes.xml (пустой словарь, если файла нет)."""
+        try:
+            footnotes_xml: bytes = self.archive.read('word/footnotes.xml')
+        except KeyError:
+            # В документе нет сносок
+            return {}
+        return self._process_footnotes(footnotes_xml)
 
     def _locate_docx(self) -> str:
         """
@@ -70,68 +200,208 @@ class Docx:
             raise FileNotFoundError
         return docx_path
 
-    def _save_images(self):
+    def iter_body(self):
+        """
+        Перебирает элементы верхнего уровня тела документа (<w:p>, <w:tbl>, <w:sectPr>)
+        в порядке следования.
+
+        В потоковом режиме document.xml читается через iterparse прямо из архива,
+        а каждый элемент очищается после того, как обработчики закончили с ним работу.
+        Пиковая память определяется самым большим блоком, а не всем документом,
+        поэтому ссылки на выданный элемент нельзя хранить после перехода к следующему.
+
+        Возвращает:
+            Iterator[ET.Element]: элементы верхнего уровня <w:body>
+        """
+        body_tag = f"{{{self.ns['w']}}}body"
+
+        if self.document is not None:
+            # Документ уже загружен целиком — просто обходим тело
+            body = self.document.find(body_tag)
+            if body is not None:
+                yield from body
+            return
+
+        with self.archive.open('word/document.xml') as document_file:
+            depth = 0      # глубина текущего элемента (w:document = 1, w:body = 2)
+            body = None    # элемент <w:body>, из которого удаляются обработанные блоки
+            for event, el in ET.iterparse(document_file, events=('start', 'end')):
+                if event == 'start':
+                    depth += 1
+                    if depth == 2 and el.tag == body_tag:
+                        body = el
+                    continue
+
+                depth -= 1
+                if depth == 2 and body is not None:
+                    # Закрылся элемент верхнего уровня тела — отдаём его обработчикам
+                    yield el
+                    el.clear()
+                    body.remove(el)
+
+    def _save_images(self) -> tuple[int, float]:
         """
-        Извлекает изображения из DOCX и сохраняет их в папку:
-        {output_dir}/{document_type}/images
+        Извлекает изображения из DOCX в контентно-адресуемое хранилище
+        {image_store} (по умолчанию {output_dir}/images) и заполняет self.media.
+
+        Файлы копируются потоково в пуле потоков, у каждого потока — собственный
+        дескриптор архива. Изображения, уже известные хранилищу (кандидат по
+        размеру и CRC подтверждается SHA-256), не записываются повторно;
+        одинаковое содержимое записывается один раз.
+        При выводе в zip-архив изображения пишутся в папку images пакета.
+
+        Возвращает:
+            tuple[int, float]: число записанных байт и затраченное время в секундах
         """
-        for arc_file in self.files:
-            # Ищем файлы, в имени которых есть "word/media/image"
-            if 'word/media/image' in arc_file.filename:
-                file_name: str = arc_file.filename.replace("word/media/", "")
-                
-                # Директория для сохранения
-                output_dir: str = f"{config.output_dir}/{config.document_type}/images"
-                os.makedirs(output_dir, exist_ok=True)
-                
-                # Записываем картинку на диск
-                with open(f"{output_dir}/{file_name}", "wb") as img_file:
-                    img_file.write(self.archive.read(arc_file.filename))
+        started = time.perf_counter()
+        sink = get_sink()
+        if isinstance(sink, ZipSink):
+            # Вывод в архив: изображения пишутся в папку images пакета
+            store = PackageImageStore(f"{config.output_dir}/images", sink, self.archive.filename)
+        else:
+            store = ImageStore(config.image_store)
+
+        # Ищем файлы, в имени которых есть "word/media/image"
+        members = [arc_file for arc_file in self.files if 'word/media/image' in arc_file.filename]
+
+        local = threading.local()              # ZipFile каждого потока
+        handles: list[zipfile.ZipFile] = []    # все открытые дескрипторы (закрываются в конце)
+        handles_lock = threading.Lock()
 
-    def _process_rels(self):
+        def extract(arc_file: zipfile.ZipInfo) -> tuple[str, int]:
+            archive = getattr(local, 'archive', None)
+            if archive is None:
+                archive = local.archive = zipfile.ZipFile(self.archive.filename)
+                with handles_lock:
+                    handles.append(archive)
+
+            # Известное хранилищу изображение (подтверждается хэшем) не записывается
+            name = store.lookup(arc_file, lambda: archive.open(arc_file))
+            if name is not None:
+                return name, 0
+
+            # Записываем картинку в хранилище, не держа её целиком в памяти
+            with archive.open(arc_file) as src:
+                return store.add(arc_file, src)
+
+        try:
+            if config.media_workers <= 1:
+                # 0 или 1 — изображения извлекаются в текущем потоке
+                results = [extract(arc_file) for arc_file in members]
+            else:
+                with ThreadPoolExecutor(max_workers=config.media_workers) as pool:
+                    results = list(pool.map(extract, members))
+        finally:
+            for archive in handles:
+                archive.close()
+        store.save_index()
+
+        written = 0
+        for arc_file, (name, size) in zip(members, results):
+            self.media[arc_file.filename] = store.path(name)
+            written += size
+
+        elapsed = time.perf_counter() - started
+        self.logger.info(f"Stored {len(members)} images ({len({name for name, _ in results})} unique): "
+                         f"{written} bytes written in {elapsed:.2f} s")
+        return written, elapsed
+
+    def _process_rels(self) -> dict[str, str]:
         """
         Парсит файл связей document.xml.rels и формирует словарь:
         rId → путь к файлу.
         """
+        id_to_path: dict[str, str] = {}
         root = ET.fromstring(self.rels_xml)
 
-        for rel in root.iter("{http://schemas.openxmlformats.org/officeDocument/2006/relationships}Relationship"):
+        for rel in root.iter("{http://schemas.openxmlformats.org/package/2006/relationships}Relationship"):
             rel_id: str = rel.attrib['Id']      # уникальный ID связи, например "rId23"
             target_path: str = rel.attrib['Target']  # путь к файлу внутри docx
             rel_type: str = rel.attrib['Type']  # тип связи (например, image, hyperlink и т.д.)
             
             # Если это изображение → добавляем в словарь
             if "image" in rel_type:
-                self.id_to_path[rel_id] = target_path
+                id_to_path[rel_id] = target_path
+        return id_to_path
+
+    def _process_styles(self, styles_xml: bytes) -> dict[str, tuple[int | None, bool]]:
+        """
+        Парсит файл styles.xml и разрешает уровни заголовков и нумерацию стилей.
 
-    def _process_footnotes(self, footnotes_xml: bytes):
+        Уровень берётся из w:outlineLvl (0 → 1, ..., 8 → 9; 9 — обычный текст),
+        а если он не задан — из имени встроенного стиля "heading N". Незаданные
+        свойства наследуются от базового стиля (w:basedOn).
         """
-        Парсит файл footnotes.xml, добавляет сноски в self.footnotes.
+        w = f"{{{self.ns['w']}}}"
+        # styleId → (уровень или None — не задан, нумерация или None — не задана, basedOn)
+        own: dict[str, tuple[int | None, bool | None, str | None]] = {}
+        root = ET.fromstring(styles_xml)
+
+        for style in root.iter(f'{w}style'):
+            style_id = style.get(f'{w}styleId')
+            if style_id is None:
+                continue
+            level = None
+            outline = style.find(f'{w}pPr/{w}outlineLvl')
+            if outline is not None:
+                level = int(outline.get(f'{w}val', '9')) + 1
+            else:
+                name = style.find(f'{w}name')
+                name = name.get(f'{w}val', '').lower() if name is not None else ''
+                if name.startswith('heading ') and name[8:].isdigit():
+                    level = int(name[8:])
+
+            numbered = None
+            num_id = style.find(f'{w}pPr/{w}numPr/{w}numId')
+            if num_id is not None:
+                numbered = num_id.get(f'{w}val', '0') != '0'
+
+            based_on = style.find(f'{w}basedOn')
+            own[style_id] = (level, numbered, based_on.get(f'{w}val') if based_on is not None else None)
+
+        styles: dict[str, tuple[int | None, bool]] = {}
+        for style_id in own:
+            level, numbered, parent = own[style_id]
+            seen = {style_id}
+            # Поднимаемся по цепочке basedOn, пока свойства не определены
+            while parent in own and parent not in seen and (level is None or numbered is None):
+                seen.add(parent)
+                parent_level, parent_numbered, next_parent = own[parent]
+                level = parent_level if level is None else level
+                numbered = parent_numbered if numbered is None else numbered
+                parent = next_parent
+            if level is not None and level > 9:
+                level = None  # w:outlineLvl = 9 — обычный текст
+            styles[style_id] = (level, bool(numbered))
+        return styles
+
+    def _process_footnotes(self, footnotes_xml: bytes) -> dict[str, list[str]]:
+        """
+        Парсит файл footnotes.xml и возвращает тексты абзацев каждой сноски.
         
         Формат:
-            self.footnotes = {
-                "1": <fn>...</fn>,
-                "2": <fn>...</fn>
+            {
+                "1": ["текст абзаца", ...],
+                "2": [...]
             }
         """
+        footnotes: dict[str, list[str]] = {}
         root = ET.fromstring(footnotes_xml)
 
         for footnote in root.iter('{http://schemas.openxmlformats.org/wordprocessingml/2006/main}footnote'):
-            fn_el = ET.Element('fn')  # создаём свой элемент <fn> для хранения
-
             # ID сноски (обычно число в строке)
             footnote_id: str = footnote.attrib['{http://schemas.openxmlformats.org/wordprocessingml/2006/main}id']
 
             # Каждая сноска может содержать несколько абзацев
+            texts: list[str] = []
             for p in footnote.findall('{http://schemas.openxmlformats.org/wordprocessingml/2006/main}p'):
-                p_el = ET.Element('p')  # абзац внутри сноски
                 footnote_text: str = ""
 
                 for t_el in p.findall('.//{http://schemas.openxmlformats.org/wordprocessingml/2006/main}t'):
                     footnote_text = f"""{footnote_text}{t_el.text}"""
-                
-                p_el.text = footnote_text
-                fn_el.append(p_el)
+
+                texts.append(footnote_text)
 
             # Сохраняем в словарь
-            self.footnotes[footnote_id] = fn_el
\ No newline at end of file
+            footnotes[footnote_id] = texts
+        return footnotes
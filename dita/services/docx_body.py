@@ -0,0 +1,390 @@
+# -*- coding: utf-8 -*-
+"""
+Модуль docx_body.py
+-------------------
+Единый проход по телу Word-документа.
+
+Каждый абзац и каждая таблица верхнего уровня <w:body> один раз превращаются
+в компактное промежуточное представление (dita.models.body: Paragraph,
+WordTable) — build_block(). Конвертеры (таблицы, рисунки, иконки, оглавление)
+регистрируют обработчики для нужных им видов блоков ('p', 'tbl'), после чего
+документ обходится ровно один раз за запуск, сколько бы этапов ни было включено.
+
+Если [docx] workers > 1, document.xml делится на чанки
+(dita.services.docx_partition): чанки разбираются и превращаются в блоки
+в пуле процессов, а блоки передаются обработчикам в порядке документа.
+
+При включённом кэше разбора ([docx] cache) блоки сохраняются в кэше
+(dita.storage.doc_cache), и повторный запуск на том же .docx не читает
+document.xml вовсе.
+
+Пример:
+    dispatcher = BodyDispatcher(config.docx)
+    TableConverter().register(dispatcher)
+    ImageConverter(config.docx).register(dispatcher)
+    dispatcher.run()
+"""
+
+import logging
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterator
+import xml.etree.ElementTree as ET
+
+import dita.config.config as config
+from dita.models.body import FootnoteRef, Paragraph, WordCell, WordTable, blocks_from_data, blocks_to_data
+from dita.services.docx_partition import BodyLayout, parse_chunk
+
+logger = logging.getLogger(__name__)
+
+# Теги, из которых собирается промежуточное представление
+_W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+_P = f'{_W}p'
+_R = f'{_W}r'
+_T = f'{_W}t'
+_TR = f'{_W}tr'
+_TC = f'{_W}tc'
+_TCPR = f'{_W}tcPr'
+_PPR = f'{_W}pPr'
+_GRID_COL = f'{_W}gridCol'
+_FOOTNOTE_REFERENCE = f'{_W}footnoteReference'
+_PIC = '{http://schemas.openxmlformats.org/drawingml/2006/picture}pic'
+_BLIP = '{http://schemas.openxmlformats.org/drawingml/2006/main}blip'
+_INLINE = '{http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing}inline'
+_EMBED = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}embed'
+
+# Блок тела документа
+Block = Paragraph | WordTable
+
+# Признак "ещё не найдено" (None — найдено, но без значения)
+_UNSET = object()
+
+
+def element_kind(el: ET.Element) -> str:
+    """
+    Возвращает вид элемента тела — локальное имя тега без пространства имён
+    (например 'p', 'tbl', 'sectPr').
+    """
+    return el.tag.rsplit('}', 1)[-1]
+
+
+class BodyDispatcher:
+    """
+    Диспетчер обработчиков блоков тела документа.
+
+    Обработчики вызываются в порядке регистрации для каждого блока своего вида.
+    После обхода вызываются завершающие функции (например, сохранение keydef-карт).
+
+    Аргументы конструктора:
+        docx: документ (dita.services.docx.Docx)
+        workers (int | None): число процессов для разбора по чанкам
+                              (по умолчанию — [docx] workers; 0 или 1 — последовательно)
+    """
+
+    def __init__(self, docx, workers: int | None = None):
+        # Документ, тело которого будет обходиться (dita.services.docx.Docx)
+        self.docx = docx
+        # Вид блока → список обработчиков
+        self.handlers: dict[str, list[Callable[[Block], None]]] = {}
+        # Функции, вызываемые после завершения обхода
+        self.finishers: list[Callable[[], None]] = []
+        self.workers = config.docx_workers if workers is None else workers
+
+    def register(self, kind: str, handler: Callable[[Block], None]):
+        """
+        Регистрирует обработчик для блоков указанного вида.
+
+        Аргументы:
+            kind (str): вид блока ('p' — Paragraph, 'tbl' — WordTable)
+            handler (Callable): функция, принимающая блок
+        """
+        self.handlers.setdefault(kind, []).append(handler)
+
+    def on_finish(self, finisher: Callable[[], None]):
+        """Регистрирует функцию, которая будет вызвана после обхода документа."""
+        self.finishers.append(finisher)
+
+    def run(self):
+        """
+        Обходит тело документа один раз и передаёт каждый блок его обработчикам,
+        затем вызывает завершающие функции.
+        """
+        if self.handlers:
+            for block in iter_blocks(self.docx, self.workers):
+                for handler in self.handlers.get(block.kind, ()):
+                    handler(block)
+
+        for finisher in self.finishers:
+            finisher()
+
+
+def iter_blocks(docx, workers: int | None = None) -> Iterator[Block]:
+    """
+    Перебирает блоки тела документа (абзацы и таблицы верхнего уровня) в порядке
+    следования: из кэша разбора, если он есть, иначе разбирая document.xml
+    (по чанкам в пуле процессов или последовательно через Docx.iter_body).
+    Собранные блоки сохраняются в кэше, когда перебор доходит до конца.
+    """
+    if workers is None:
+        workers = config.docx_workers
+
+    cache = docx.cache
+    if cache is not None:
+        blocks = cache.get('body', load=blocks_from_data)
+        if blocks is not None:
+            logger.debug(f"Using {len(blocks)} cached body blocks")
+            yield from blocks
+            return
+
+    collected: list[Block] | None = [] if cache is not None else None
+    layout = _layout(docx, workers)
+    source = _partitioned_blocks(layout, workers) if layout is not None else _sequential_blocks(docx)
+    for block in source:
+        if collected is not None:
+            collected.append(block)
+        yield block
+    if collected is not None:
+        cache.put('body', collected, dump=blocks_to_data)
+
+
+def _layout(docx, workers: int) -> BodyLayout | None:
+    """
+    Размечает document.xml для разбора по чанкам или возвращает None, если
+    документ нужно обходить последовательно.
+    """
+    if workers <= 1:
+        return None
+    if docx.__dict__.get('document') is not None:
+        return None  # документ уже разобран целиком
+    try:
+        layout = BodyLayout.scan(docx.archive.read('word/document.xml'))
+    except ValueError as e:
+        logger.info(f"Could not partition document.xml, parsing it sequentially: {e}")
+        return None
+    return layout
+
+
+def _sequential_blocks(docx) -> Iterator[Block]:
+    """Последовательный обход тела документа (Docx.iter_body)."""
+    for el in docx.iter_body():
+        block = build_block(el)
+        if block is not None:
+            yield block
+
+
+def _partitioned_blocks(layout: BodyLayout, workers: int) -> Iterator[Block]:
+    """
+    Разбор по чанкам в пуле процессов. Одновременно в работе не более
+    2 × workers чанков; блоки выдаются в порядке документа.
+    """
+    ranges = layout.chunks()
+    workers = min(workers, len(ranges))
+    logger.debug(f"Parsing document.xml in {len(ranges)} chunks with {workers} workers")
+
+    # spawn: исполнители не наследуют потоки приёмника и состояние модулей
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        pending = deque()
+        for first, last in ranges:
+            pending.append(pool.submit(build_chunk, layout.chunk_bytes(first, last)))
+            while len(pending) > 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def build_chunk(chunk: bytes) -> list[Block]:
+    """
+    Разбирает чанк document.xml и собирает блоки его тела
+    (выполняется в процессе-исполнителе).
+    """
+    blocks: list[Block] = []
+    for el in parse_chunk(chunk):
+        block = build_block(el)
+        if block is not None:
+            blocks.append(block)
+    return blocks
+
+
+def build_block(el: ET.Element) -> Block | None:
+    """
+    Собирает блок промежуточного представления из элемента тела за один обход
+    его потомков: <w:p> → Paragraph, <w:tbl> → WordTable, остальное → None.
+    """
+    kind = element_kind(el)
+    if kind == 'p':
+        builder = _BlockBuilder(None)
+        builder.walk(el, None)
+        block = builder.paragraphs[0]
+        if len(builder.paragraphs) > 1:
+            # Вложенные абзацы (надписи): рисунки и подписи в них обрабатываются как в таблицах
+            block.nested = tuple(builder.paragraphs[1:])
+    elif kind == 'tbl':
+        block = WordTable()
+        builder = _BlockBuilder(block)
+        for child in el:
+            builder.walk(child, None)
+        block.paragraphs = builder.paragraphs
+    else:
+        return None
+    if builder.inlines:
+        block.inlines = tuple(None if rel_id is _UNSET else rel_id for rel_id in builder.inlines)
+    return block
+
+
+class _OpenParagraph:
+    """Абзац, который собирается сейчас (его потомки ещё обходятся)."""
+    __slots__ = ('paragraph', 'parts', 'refs', 'pic', 'blip')
+
+    def __init__(self, paragraph: Paragraph):
+        self.paragraph = paragraph
+        self.parts: list[list[str]] = [[]]   # текст до первой сноски и после каждой сноски
+        self.refs: list[FootnoteRef] = []
+        self.pic = _UNSET                    # есть ли содержимое у первого <pic:pic>
+        self.blip = _UNSET                   # relId первого <a:blip>
+
+    def close(self):
+        """Переносит собранный текст, сноски и рисунок в абзац."""
+        paragraph = self.paragraph
+        paragraph.lead = "".join(self.parts[0])
+        if self.refs:
+            for ref, parts in zip(self.refs, self.parts[1:]):
+                ref.tail = "".join(parts)
+            paragraph.footnotes = tuple(self.refs)
+        if self.pic is True and self.blip is not _UNSET:
+            paragraph.image = self.blip
+
+
+class _BlockBuilder:
+    """
+    Обход элемента тела с сохранением его содержимого в объекты IR.
+
+    Абзацы собираются так же, как их раньше обрабатывали поиски по потомкам:
+    текст и сноски вложенных абзацев (например, в надписях) входят и во
+    внешний абзац; строки и колонки вложенных таблиц — в таблицу блока.
+    """
+
+    def __init__(self, table: WordTable | None):
+        self.table = table
+        self.paragraphs: list[Paragraph] = []   # все абзацы блока в порядке документа
+        self.open: list[_OpenParagraph] = []    # абзацы, внутри которых идёт обход
+        self.inlines: list = []                 # relId inline-объектов блока (_UNSET — нет <a:blip>)
+        self.open_inlines: list[int] = []       # индексы inline-объектов, внутри которых идёт обход
+
+    def walk(self, el: ET.Element, parent: list[WordCell] | WordCell | None):
+        """
+        Обходит элемент и его потомков.
+
+        parent — объект IR родительского элемента, которому нужны прямые
+        потомки: строка таблицы (для <w:tc>) или ячейка (для <w:p>).
+        """
+        tag = el.tag
+        if tag == _P:
+            self._paragraph(el, parent)
+            return
+        if tag == _T:
+            if el.text:
+                for open_paragraph in self.open:
+                    open_paragraph.parts[-1].append(el.text)
+        elif tag == _R:
+            for open_paragraph in self.open:
+                open_paragraph.paragraph.has_runs = True
+        elif tag == _FOOTNOTE_REFERENCE:
+            for open_paragraph in self.open:
+                open_paragraph.refs.append(FootnoteRef(dict(el.attrib)))
+                open_paragraph.parts.append([])
+        elif tag == _PIC:
+            for open_paragraph in self.open:
+                if open_paragraph.pic is _UNSET:
+                    open_paragraph.pic = len(el) > 0
+        elif tag == _BLIP:
+            rel_id = el.get(_EMBED)
+            for open_paragraph in self.open:
+                if open_paragraph.blip is _UNSET:
+                    open_paragraph.blip = rel_id
+            for idx in self.open_inlines:
+                if self.inlines[idx] is _UNSET:
+                    self.inlines[idx] = rel_id
+        elif tag == _INLINE:
+            self.open_inlines.append(len(self.inlines))
+            self.inlines.append(_UNSET)
+            for child in el:
+                self.walk(child, None)
+            self.open_inlines.pop()
+            return
+        elif self.table is not None:
+            if tag == _TR:
+                row: list[WordCell] = []
+                self.table.rows.append(row)
+                for child in el:
+                    self.walk(child, row)
+                return
+            if tag == _TC and isinstance(parent, list):
+                self._cell(el, parent)
+                return
+            if tag == _GRID_COL:
+                self.table.col_count += 1
+
+        for child in el:
+            self.walk(child, None)
+
+    def _paragraph(self, el: ET.Element, parent):
+        """Абзац: свойства из <w:pPr>, затем обход содержимого."""
+        paragraph = Paragraph()
+        self.paragraphs.append(paragraph)
+        if isinstance(parent, WordCell):
+            parent.paragraphs.append(paragraph)
+
+        ppr = el.find(_PPR)
+        if ppr is not None:
+            _paragraph_properties(paragraph, ppr)
+
+        open_paragraph = _OpenParagraph(paragraph)
+        self.open.append(open_paragraph)
+        for child in el:
+            self.walk(child, None)
+        self.open.pop()
+        open_paragraph.close()
+
+    def _cell(self, el: ET.Element, row: list[WordCell]):
+        """Ячейка: объединения из <w:tcPr>, абзацы — прямые потомки <w:tc>."""
+        cell = WordCell()
+        row.append(cell)
+        for child in el:
+            if child.tag == _TCPR:
+                grid_span = child.find(f'{_W}gridSpan')
+                if grid_span is not None:
+                    cell.span = grid_span.get(f'{_W}val')
+                v_merge = child.find(f'{_W}vMerge')
+                # vMerge без val (или val="continue") — продолжение объединения, "restart" — его начало
+                cell.vmerged = v_merge is not None and v_merge.get(f'{_W}val') != 'restart'
+            self.walk(child, cell)
+
+
+def _paragraph_properties(paragraph: Paragraph, ppr: ET.Element):
+    """Стиль, уровень структуры, нумерация и уровень списка из <w:pPr>."""
+    style = ppr.find(f'{_W}pStyle')
+    if style is not None:
+        paragraph.style = style.get(f'{_W}val')
+
+    outline = ppr.find(f'{_W}outlineLvl')
+    if outline is not None:
+        paragraph.outline = _to_int(outline.get(f'{_W}val', '9'), 9)
+
+    num_pr = ppr.find(f'{_W}numPr')
+    if num_pr is not None:
+        num_id = num_pr.find(f'{_W}numId')
+        if num_id is not None:
+            paragraph.num_id = num_id.get(f'{_W}val', '0')
+        # numId = 0 — нумерация снята, абзац не в списке
+        if num_id is None or num_id.get(f'{_W}val') != '0':
+            ilvl = num_pr.find(f'{_W}ilvl')
+            paragraph.list_level = _to_int(ilvl.get(f'{_W}val', '0'), 0) if ilvl is not None else 0
+
+
+def _to_int(value: str, default: int) -> int:
+    """Целое значение атрибута; default — если значение некорректно."""
+    try:
+        return int(value)
+    except ValueError:
+        return default
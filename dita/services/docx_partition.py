@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+Модуль docx_partition.py
+------------------------
+Разбиение word/document.xml на диапазоны байт для параллельного разбора.
+
+Лексический проход по байтам (без XML-парсера) находит границы элементов
+верхнего уровня <w:body> (абзацев, таблиц, sectPr...): для каждого элемента
+ищется парный закрывающий тег с учётом вложенных элементов с тем же именем.
+Поиск выполняется методами bytes/re на C, поэтому проход по документу в
+сотни мегабайт занимает доли времени его разбора.
+
+Соседние элементы объединяются в чанки примерно по CHUNK_SIZE байт. Каждый
+чанк оборачивается исходным началом документа (объявление XML, <w:document>
+со всеми объявлениями пространств имён и <w:body>) и его концом, то есть
+сам по себе является корректным document.xml и разбирается ET.fromstring
+в отдельном процессе.
+
+Граница чанка всегда проходит перед абзацем: таблица и заголовок
+над ней (абзац) обычно попадают в один чанк.
+
+Если документ не удаётся разметить (комментарии, CDATA, нестандартная
+разметка), BodyLayout.scan выбрасывает ValueError — тогда документ
+обрабатывается последовательно.
+
+Пример:
+    layout = BodyLayout.scan(data)
+    for first, last in layout.chunks():
+        chunk = layout.chunk_bytes(first, last)   # разбирается в исполнителе
+"""
+
+import re
+import logging
+import xml.etree.ElementTree as ET
+
+logger = logging.getLogger(__name__)
+
+# Примерный размер чанка (байт)
+CHUNK_SIZE = 4 * 1024 * 1024
+
+# Начальный тег: имя, атрибуты (значения в кавычках могут содержать '>') и признак '/>'
+_START_TAG_RE = re.compile(rb'<([^\s/>!?]+)(?:\s+[^\s=/>]+\s*=\s*(?:"[^"]*"|\'[^\']*\'))*\s*(/?)>')
+# Начальный тег <...:body> или <body>
+_BODY_RE = re.compile(rb'<((?:[^\s/>!?:]+:)?body)[\s/>]')
+# Конструкции, внутри которых лексический поиск тегов невозможен
+_UNSUPPORTED = (b'<!--', b'<![CDATA[')
+
+
+class BodyLayout:
+    """
+    Разметка document.xml: границы тела и его элементов верхнего уровня.
+
+    Атрибуты:
+        data (bytes): содержимое document.xml
+        body_start (int): смещение сразу после начального тега <w:body>
+        body_end (int): смещение закрывающего тега </w:body>
+        elements (list[tuple[str, int, int]]): вид элемента (локальное имя тега:
+            'p', 'tbl', 'sectPr', ...) и диапазон его байт [start, end)
+    """
+
+    def __init__(self, data: bytes, body_start: int, body_end: int,
+                 elements: list[tuple[str, int, int]]):
+        self.data = data
+        self.body_start = body_start
+        self.body_end = body_end
+        self.elements = elements
+
+    @classmethod
+    def scan(cls, data: bytes) -> "BodyLayout":
+        """
+        Размечает document.xml лексическим проходом.
+
+        Исключения:
+            ValueError: разметка невозможна (документ нужно разбирать целиком)
+        """
+        for marker in _UNSUPPORTED:
+            if marker in data:
+                raise ValueError(f"unsupported markup {marker!r} in document.xml")
+
+        body = _BODY_RE.search(data)
+        if body is None:
+            raise ValueError("document.xml has no <w:body>")
+        body_tag = _START_TAG_RE.match(data, body.start())
+        if body_tag is None or body_tag[2]:
+            raise ValueError("document.xml has an empty <w:body>")
+        body_end = data.rfind(b'</' + body[1] + b'>')
+        if body_end < body_tag.end():
+            raise ValueError("document.xml has no </w:body>")
+
+        elements: list[tuple[str, int, int]] = []
+        closers: dict[bytes, re.Pattern] = {}   # имя тега → шаблон его начальных/закрывающих тегов
+        pos = body_tag.end()
+        while True:
+            lt = data.find(b'<', pos, body_end)
+            if lt < 0:
+                break
+            tag = _START_TAG_RE.match(data, lt)
+            if tag is None:
+                if data.startswith(b'<?', lt):
+                    # Инструкция обработки между элементами — пропускаем
+                    pos = data.index(b'?>', lt) + 2
+                    continue
+                raise ValueError(f"unexpected markup at byte {lt} of document.xml")
+
+            name = tag[1]
+            if tag[2]:
+                end = tag.end()   # пустой элемент <w:p/>
+            else:
+                pattern = closers.get(name)
+                if pattern is None:
+                    pattern = closers[name] = re.compile(b'<(/?)' + re.escape(name) + rb'(?=[\s/>])')
+                end = _element_end(data, pattern, tag.end(), body_end)
+            elements.append((name.rsplit(b':', 1)[-1].decode('ascii'), lt, end))
+            pos = end
+        return cls(data, body_tag.end(), body_end, elements)
+
+    def chunks(self, size: int = CHUNK_SIZE) -> list[tuple[int, int]]:
+        """
+        Делит элементы на чанки примерно по size байт.
+        Граница чанка проходит только перед абзацем.
+
+        Возвращает:
+            list[tuple[int, int]]: диапазоны индексов элементов [first, last)
+        """
+        ranges: list[tuple[int, int]] = []
+        first = 0
+        chunk_start = self.elements[0][1] if self.elements else 0
+        for idx, (kind, start, _) in enumerate(self.elements):
+            if idx > first and kind == 'p' and start - chunk_start >= size:
+                ranges.append((first, idx))
+                first, chunk_start = idx, start
+        if first < len(self.elements):
+            ranges.append((first, len(self.elements)))
+        return ranges
+
+    def chunk_bytes(self, first: int, last: int) -> bytes:
+        """
+        Возвращает элементы [first, last) как самостоятельный document.xml:
+        исходное начало документа до <w:body> включительно, байты элементов
+        и исходный конец документа начиная с </w:body>.
+        """
+        start = self.elements[first][1]
+        end = self.elements[last - 1][2]
+        return b''.join((self.data[:self.body_start], self.data[start:end], self.data[self.body_end:]))
+
+
+def parse_chunk(chunk: bytes) -> list[ET.Element]:
+    """Разбирает чанк и возвращает элементы верхнего уровня его тела."""
+    root = ET.fromstring(chunk)
+    for child in root:
+        if child.tag.rsplit('}', 1)[-1] == 'body':
+            return list(child)
+    raise ValueError("chunk has no <w:body>")
+
+
+def _element_end(data: bytes, pattern: re.Pattern, pos: int, limit: int) -> int:
+    """
+    Ищет конец элемента, начальный тег которого закончился в pos:
+    считает вложенные начальные и закрывающие теги с тем же именем.
+    """
+    depth = 1
+    while True:
+        match = pattern.search(data, pos, limit)
+        if match is None:
+            raise ValueError(f"unclosed element at byte {pos} of document.xml")
+        if match[1]:
+            # Закрывающий тег </name>
+            close = data.index(b'>', match.end())
+            depth -= 1
+            if depth == 0:
+                return close + 1
+            pos = close + 1
+        else:
+            tag = _START_TAG_RE.match(data, match.start())
+            if tag is None:
+                raise ValueError(f"malformed tag at byte {match.start()} of document.xml")
+            if not tag[2]:
+                depth += 1
+            pos = tag.end()
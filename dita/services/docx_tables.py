@@ -1,115 +1,50 @@
 import logging
 import re
+import multiprocessing
+from collections import deque
+from typing import BinaryIO, Callable
+from concurrent.futures import Future, ProcessPoolExecutor
 import xml.etree.ElementTree as ET
 import dita.config.config as config
+from dita.models.body import Paragraph, WordCell, WordTable
 from dita.models.table import Table, TableKeyReference
 from dita.utils.translit import get_proper_id
 from dita.core.topic import validate_id
+from dita.services.docx_body import BodyDispatcher, build_block
+from dita.storage.manifest import get_manifest, write_artifact
+from dita.utils.xml_writer import tostring, write_tree
 
 logger = logging.getLogger(__name__)
 
+# Пространство имён WordprocessingML в виде префикса тега
+_W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
 
-def table_label(paragraph):
+# Шаблон заголовка таблицы: "Таблица N – Заголовок"
+_TAB_PATTERN = re.compile(r"""^Таблица[\s]*[А-Я]?[\d\.]+[\s]*[\—\-\–\—][\s]*""")
+
+
+def table_label(paragraph: Paragraph) -> str:
     """
     Извлекает чистый заголовок таблицы из абзаца Word.
     
     Аргументы:
-        paragraph (ET.Element): абзац (<w:p>) из XML Word-документа
+        paragraph (Paragraph): абзац документа (промежуточное представление)
     
     Если абзац не соответствует шаблону "Таблица N – ...", возвращает 'ПЕРЕИМЕНУЙ МЕНЯ'.
     """
-    # Извлекаем все текстовые элементы <w:t> из абзаца
-    text_elements = paragraph.findall('.//{http://schemas.openxmlformats.org/wordprocessingml/2006/main}t')
-    
-    # Собираем весь текст в один блок
-    label_text = ""
-    for t in text_elements:
-        label_text = f"{label_text}{t.text}"
-
-    # Регулярное выражение для "Таблица N – Заголовок"
-    tab_pattern = re.compile("""^Таблица[\s]*[А-Я]?[\d\.]+[\s]*[\—\-\–\—][\s]*""")
-    match = tab_pattern.match(label_text)
+    # Весь текст абзаца
+    label_text = paragraph.text
+
+    match = _TAB_PATTERN.match(label_text)
     if match is None:
         # Если заголовок не распознан, возвращаем заглушку
         label_text = "ПЕРЕИМЕНУЙ МЕНЯ"
     else:
         # Убираем префикс "Таблица N –" и лишние пробелы
-        label_text = tab_pattern.sub('', label_text).strip()
+        label_text = _TAB_PATTERN.sub('', label_text).strip()
     return label_text
 
 
-def _column_number(table):
-    """
-    Подсчитывает количество колонок в таблице Word.
-
-    Аргументы:
-        table (ET.Element): элемент <w:tbl>
-
-    Возвращает:
-        int: количество колонок
-    """
-    # Находим все элементы <w:gridCol>, которые определяют колонки
-    cols = table.findall('.//{http://schemas.openxmlformats.org/wordprocessingml/2006/main}gridCol')
-    return len(cols)
-
-
-def _row_number(table):
-    """
-    Подсчитывает количество рядов в таблице Word.
-
-    Аргументы:
-        table (ET.Element): элемент <w:tbl>
-
-    Возвращает:
-        int: количество рядов
-    """
-    # Находим все строки таблицы <w:tr>
-    rows = table.findall('.//{http://schemas.openxmlformats.org/wordprocessingml/2006/main}tr')
-    return len(rows)
-
-
-def vmerged(cell):
-    """
-    Проверяет, является ли ячейка таблицы частью вертикально объединённой области.
-
-    Аргументы:
-        cell (ET.Element): ячейка <w:tc>
-
-    Возвращает:
-        bool: True если ячейка объединена вертикально, False иначе
-    """
-    # Проверяем наличие тега <w:vMerge>
-    vMerge = cell.find('.//{http://schemas.openxmlformats.org/wordprocessingml/2006/main}vMerge')
-    if vMerge is not None:
-        # Если атрибут val равен "restart" – начало объединения
-        if '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}val' in vMerge.attrib.keys():
-            if vMerge.attrib['{http://schemas.openxmlformats.org/wordprocessingml/2006/main}val'] == "restart":
-                return False
-            else:
-                # Если val не указан, значит это продолжение объединения
-                return True
-        else:
-            return True
-    else:
-        return False
-
-
-def gridspan(cell):
-    """
-    Возвращает количество колонок, которые занимает ячейка (gridSpan).
-
-    Аргументы:
-        cell (ET.Element): ячейка <w:tc>
-
-    Возвращает:
-        str | None: количество колонок или None
-    """
-    span = cell.find('.//{http://schemas.openxmlformats.org/wordprocessingml/2006/main}gridSpan')
-    if span is not None:
-        return span.attrib['{http://schemas.openxmlformats.org/wordprocessingml/2006/main}val']
-    else:
-        return None
-
 def _empty_table(title):
     """
     Создаёт пустую таблицу с одной ячейкой и заголовком.
@@ -127,41 +62,58 @@ def _empty_table(title):
     tbl.add_row([''])
     return tbl
 
-def _is_ul(paragraph):
+def cell_entry(cell: WordCell) -> ET.Element:
     """
-    Проверяет, является ли абзац частью маркированного списка.
+    Собирает элемент <entry> DITA из ячейки: абзацы — <div>, элементы списков —
+    <li> во вложенных <ul> по уровням, ссылки на сноски — копии <w:footnoteReference>.
 
     Аргументы:
-        paragraph (ET.Element): абзац <w:p>
+        cell (WordCell): ячейка таблицы (промежуточное представление)
 
     Возвращает:
-        int | bool: уровень списка (0,1,2...) или False если не список
+        ET.Element: элемент <entry> с содержимым ячейки
     """
-    # Проверяем наличие тега <w:numPr>, который обозначает список
-    numPr = paragraph.find('.//{http://schemas.openxmlformats.org/wordprocessingml/2006/main}numPr')
-    if numPr is not None:
-        # Возвращаем уровень списка (ilvl)
-        return numPr.find('{http://schemas.openxmlformats.org/wordprocessingml/2006/main}ilvl').attrib('{http://schemas.openxmlformats.org/wordprocessingml/2006/main}val')
-    else:
-        return False
+    entry = ET.Element('entry')
+    lists: list[ET.Element] = []  # Стек вложенных списков <ul> (по уровням)
+
+    for paragraph in cell.paragraphs:
+        ul_level = paragraph.list_level
+        el = _paragraph_entry(paragraph, 'li' if ul_level is not None else 'div')
+        if el is None:
+            continue
+        if ul_level is None:
+            entry.append(el)
+            lists = []
+            continue
+
+        # Элемент списка: уровень может углубиться не более чем на один шаг
+        if not lists:
+            lists.append(ET.SubElement(entry, 'ul'))
+        else:
+            depth = min(ul_level, len(lists))
+            del lists[depth + 1:]
+            if len(lists) == depth:
+                # Вложенный список — внутри последнего <li> текущего списка
+                lists.append(ET.SubElement(lists[-1][-1], 'ul'))
+        lists[-1].append(el)
+    return entry
 
 
-def parse_footnote(run_el):
+def _paragraph_entry(paragraph: Paragraph, tag: str) -> ET.Element | None:
     """
-    Проверяет, есть ли сноска в элементе <w:r>.
-
-    Аргументы:
-        run_el (ET.Element): элемент <w:r> абзаца
+    Собирает абзац ячейки в элемент tag (<div> или <li>): текст и ссылки на
+    сноски в порядке следования. Текст после сноски становится её "хвостом".
 
     Возвращает:
-        ET.Element | None: элемент сноски <footnoteReference> или None
+        ET.Element | None: элемент абзаца или None, если в абзаце нет фрагментов <w:r>
     """
-    footnote = run_el.find('.//{http://schemas.openxmlformats.org/wordprocessingml/2006/main}footnoteReference')
-    if footnote is not None:
-        footnote_id = footnote.attrib['{http://schemas.openxmlformats.org/wordprocessingml/2006/main}id']
-        return footnote
-    else:
+    if not paragraph.has_runs:
         return None
+    el = ET.Element(tag)
+    el.text = paragraph.lead
+    for ref in paragraph.footnotes or ():
+        ET.SubElement(el, f'{_W}footnoteReference', dict(ref.attrib)).tail = ref.tail
+    return el
 
 
 def parse_cell(cell):
@@ -174,141 +126,120 @@ def parse_cell(cell):
     Возвращает:
         ET.Element: элемент <entry> с содержимым ячейки
     """
-    entry = ET.Element('entry') # Создаём контейнер entry для DITA
-    elements_stack = []   # Стек для вложенных списков <ul>
-    last_li_element = None # Последний <li>, чтобы вложенные списки корректно добавлялись
-
-    # Проходим по каждому абзацу в ячейке
-    for paragraph in cell.findall('{http://schemas.openxmlformats.org/wordprocessingml/2006/main}p'):
-        ul_level = _is_ul(paragraph) # Проверяем, маркирован ли абзац
-        
-        # Создаём элемент <li> для списка или <div> для обычного текста
-        if ul_level:
-            el = ET.Element('li')
-        else:
-            el = ET.Element('div')
-        text_buffer = "" # Буфер для текста абзаца
-        has_footnote = False
-
-        # Обрабатываем каждый элемент <w:r> (run)
-        for run in paragraph.findall('.//{http://schemas.openxmlformats.org/wordprocessingml/2006/main}r'):
-
-            footnote = parse_footnote(run)
-            if footnote is not None:
-                has_footnote = True
-                el.text = text_buffer
-                text_buffer = ""
-                el.append(footnote)  # Добавляем сноску внутрь элемента
-            else:
-                # Собираем текст из <w:t>
-                for t_el in run.findall('.//{http://schemas.openxmlformats.org/wordprocessingml/2006/main}t'):
-                    text_buffer = f"""{text_buffer}{t_el.text}"""
-                
-                # Присваиваем текст элементу
-                if ul_level:
-                    el.text = text_buffer
-                
-                    if len(elements_stack) == 0:
-                        ul_el = ET.SubElement(entry, 'ul')  # Создаём новый список <ul>
-                        ul_el.append(el)
-                        elements_stack.append(ul_el)
-                    elif len(elements_stack) <= int(ul_level) + 1:
-                        ul = ET.SubElement(last_li_element, 'ul')
-                        ul.append(el)
-                        elements_stack.append(ul_el)
-                    elif len(elements_stack) <= int(ul_level) + 1:
-                        elements_stack.pop()
-                        ul = elements_stack[int(ul_level)]
-                        ul.append(el)
-                    else:
-                        ul = elements_stack[int(ul_level)]
-                        ul.append(el)
-                  
-                    last_li_element = el
-
-                else:
-                    if has_footnote:
-                        footnote.tail = text_buffer
-                    else:
-                        el.text = text_buffer
-                        entry.append(el)
-
-                    elements_stack = []
-                    last_li_element = None
-    return entry
+    # Ячейка разбирается как таблица из одной ячейки (исходное дерево не изменяется)
+    wrapper = ET.Element(f'{_W}tbl')
+    ET.SubElement(wrapper, f'{_W}tr').append(cell)
+    return cell_entry(build_block(wrapper).rows[0][0])
+
 
-def parse_table(table_element):
+def parse_table(table_element, with_content: bool | None = None):
     """
     Преобразует элемент Word <w:tbl> в объект Table DITA.
 
     Аргументы:
         table_element (ET.Element): элемент таблицы <w:tbl>
+        with_content (bool | None): переносить ли текст ячеек
+                                    (по умолчанию — [tables] process_text)
     
+    Возвращает:
+        Table: объект таблицы с заполненными строками и колонками
+    """
+    return table_from_block(build_block(table_element), with_content)
+
+
+def table_from_block(word_table: WordTable, with_content: bool | None = None) -> Table:
+    """
+    Преобразует таблицу Word (промежуточное представление) в объект Table DITA.
+
+    Аргументы:
+        word_table (WordTable): таблица документа
+        with_content (bool | None): переносить ли текст ячеек
+                                    (по умолчанию — [tables] process_text)
+
     Возвращает:
         Table: объект таблицы с заполненными строками и колонками
     """
     table_obj = Table() # Создаём пустой объект таблицы
-    col_count = _column_number(table_element) # Определяем количество колонок
-    table_obj.set_colnum(col_count)
+    table_obj.set_colnum(word_table.col_count)
+    if with_content is None:
+        with_content = config.process_text_in_tables
 
-    # Проходим по каждой строке <w:tr>
-    for row_el in table_element.iter("{http://schemas.openxmlformats.org/wordprocessingml/2006/main}tr"):
+    # Проходим по каждой строке
+    for row in word_table.rows:
         row_list = []      # Список для gridspan/vmerged
-        if config.process_text_in_tables:
-            row_entries = []  # Список для элементов <entry> внутри строк
-         for idx, cell_el in enumerate(row_el.findall("{http://schemas.openxmlformats.org/wordprocessingml/2006/main}tc")):
-            span = gridspan(cell_el)  # Проверяем, сколько колонок занимает ячейка
-            if config.process_text_in_tables:
-                entry_el = parse_cell(cell_el)  # Преобразуем ячейку в <entry>
-            
-            # Проверяем объединённые ячейки
-            if vmerged(cell_el):
+        row_entries = []   # Список для элементов <entry> внутри строк
+        for cell in row:
+            if cell.vmerged:
+                # Содержимое объединённой ячейки не выводится
                 row_list.append("vmerged")
-                if config.process_text_in_tables:
-                    row_entries.append(None)
-            elif span:
-                row_list.append(span)
-                if config.process_text_in_tables:
-                    row_entries.append(entry_el)
-            else:
-                row_list.append('')
-                if config.process_text_in_tables:
-                    row_entries.append(entry_el)
+                row_entries.append(None)
+                continue
+            row_list.append(cell.span if cell.span else '')
+            row_entries.append(cell_entry(cell) if with_content else None)
 
         table_obj.add_row(row_list)  # Добавляем строку с информацией о colspan/rowspan
-        if config.process_text_in_tables:
+        if with_content:
             table_obj.add_entries(row_entries)  # Добавляем текстовое содержимое ячеек
 
     return table_obj
 
 
-def create_reference_table(table_obj: Table):
+def _table_dir():
+    """Директория для сохранения таблиц."""
+    return f"{config.output_dir}/{config.document_type}/table"
+
+
+def new_table_id(table_title: str) -> str:
+    """
+    Выдаёт уникальный ID таблицы в формате "table_<id>" по её заголовку.
+    """
+    # Создаём корректный идентификатор из заголовка
+    base_id = get_proper_id(table_title)
+
+    # Добавляем префикс "table_" и проверяем уникальность ID
+    return "table_" + validate_id(_table_dir(), base_id)
+
+
+def create_reference_table(table_obj: Table, table_id: str | None = None, fingerprint: str | None = None):
     """
     Создаёт DITA reference-топик для таблицы и сохраняет его в файл.
 
     Аргументы:
         table_obj (Table): объект таблицы, который нужно экспортировать
+        table_id (str | None): заранее выданный ID (по умолчанию выдаётся по заголовку)
+        fingerprint (str | None): отпечаток входных данных для манифеста сборки
     
     Возвращает:
         str: ID таблицы в формате "table_<id>"
     """
-    # Директория для сохранения таблиц
-    table_dir = f"{config.output_dir}/{config.document_type}/table"
-    
+    if table_id is None:
+        table_id = new_table_id(table_obj.title)
+
+    # Сохраняем файл DITA (отложенная запись, режим 'x'; XML выводится прямо в файл)
+    ref_topic = reference_topic(table_obj, table_id)
+    write_artifact(f"{_table_dir()}/{table_id}.dita", lambda stream: write_tree(stream, ref_topic, 'reference'),
+                   'tables', exclusive=True, fingerprint=fingerprint)
+
+    # Возвращаем ID таблицы для ключевых ссылок
+    return table_id
+
+
+def reference_topic(table_obj: Table, table_id: str) -> ET.Element:
+    """
+    Строит DITA reference-топик с таблицей.
+
+    Аргументы:
+        table_obj (Table): объект таблицы
+        table_id (str): ID таблицы в формате "table_<id>"
+
+    Возвращает:
+        ET.Element: корневой элемент <reference>
+    """
     # Заголовок таблицы
-    table_title = table_obj.title.text
-    
-    # Создаём корректный идентификатор из заголовка
-    base_id = get_proper_id(table_title)
-    
-    # Добавляем префикс "table_" и проверяем уникальность ID
-    table_id = "table_" + validate_id(table_dir, base_id)
+    table_title = table_obj.title
 
     # Присваиваем объекту таблицы уникальный ID
     table_obj.set_id(table_id)
-    
-    # Очищаем объект таблицы перед вставкой в reference-топик (убираем лишние данные)
-    table_obj.clear()
 
     # Создаём XML-элемент <reference> для DITA
     ref_topic = ET.Element('reference')
@@ -317,74 +248,178 @@ def create_reference_table(table_obj: Table):
     # Добавляем заголовок таблицы в топик
     ET.SubElement(ref_topic, 'title').text = table_title
     
-    # Добавляем тело топика <refbody> и помещаем туда саму таблицу
+    # Добавляем тело топика <refbody> и помещаем туда саму таблицу (XML строится из сетки ячеек)
     ref_body = ET.SubElement(ref_topic, 'refbody')
     ref_body.append(table_obj.table)
+    return ref_topic
 
-    # Заголовок XML файла с DTD
-    header = b"""<?xml version="1.0" encoding="UTF-8"?>\n<!DOCTYPE reference PUBLIC "-//OASIS//DTD DITA Reference//EN" "reference.dtd">\n"""
-    
-    # Красиво форматируем XML с отступами
-    ET.indent(ref_topic)
-    
-    # Преобразуем XML-дерево в байты
-    topic_txt = ET.tostring(ref_topic, encoding='utf-8')
 
-    # Сохраняем файл DITA
-    with open(f"{table_dir}/{table_id}.dita", 'xb') as f:
-        f.write(header) # Записываем XML заголовок
-        f.write(topic_txt) # Записываем сам контент
+def table_topic(word_table: WordTable, table_title: str, table_id: str,
+                with_content: bool) -> tuple[ET.Element, str | None]:
+    """
+    Конвертирует таблицу Word в дерево reference-топика.
 
-    # Возвращаем ID таблицы для ключевых ссылок
-    return table_id
+    Аргументы:
+        word_table (WordTable): таблица документа (промежуточное представление)
+        table_title (str): заголовок таблицы
+        table_id (str): выданный ID таблицы
+        with_content (bool): переносить ли текст ячеек
+
+    Возвращает:
+        tuple[ET.Element, str | None]: топик и текст ошибки разбора
+                                       (при ошибке топик содержит пустую таблицу)
+    """
+    error = None
+    try:
+        # Собираем объект Table из сетки таблицы Word
+        table = table_from_block(word_table, with_content)
+        table.set_title(table_title)  # Присваиваем заголовок
+    except Exception as e:
+        # Если разбор не удался — создаём пустую таблицу
+        error = str(e)
+        table = _empty_table(table_title)
+    return reference_topic(table, table_id), error
+
+
+def convert_table(word_table: WordTable, table_title: str, table_id: str,
+                  with_content: bool) -> tuple[bytes, str | None]:
+    """
+    Конвертирует таблицу Word в XML reference-топика (см. table_topic).
+    Выполняется в процессе-исполнителе пула, поэтому настройки получает аргументами,
+    а топик возвращает сериализованным — байты передаются в основной процесс.
+
+    Аргументы:
+        word_table (WordTable): таблица документа (промежуточное представление)
+        table_title (str): заголовок таблицы
+        table_id (str): выданный ID таблицы
+        with_content (bool): переносить ли текст ячеек
+
+    Возвращает:
+        tuple[bytes, str | None]: XML топика и текст ошибки разбора
+                                  (при ошибке топик содержит пустую таблицу)
+    """
+    ref_topic, error = table_topic(word_table, table_title, table_id, with_content)
+    return tostring(ref_topic, doctype='reference'), error
+
+
+class TableConverter:
+    """
+    Конвертер таблиц: для каждой таблицы, перед которой найден абзац-заголовок,
+    создаёт reference-топик и добавляет ключ в карту таблиц (keydef).
+
+    При workers > 1 таблицы конвертируются в пуле процессов: исполнителю
+    передаются таблица (WordTable) и её заголовок. ID, порядок ключей в карте
+    и порядок записи файлов определяет основной процесс, поэтому результат
+    не зависит от числа исполнителей.
+
+    Аргументы конструктора:
+        workers (int | None): число процессов (по умолчанию — [tables] workers;
+                              0 или 1 — конвертация в текущем процессе).
+    """
+
+    def __init__(self, workers: int | None = None):
+        self.table_map = TableKeyReference()  # Объект для хранения ключевых ссылок (keydef)
+        self.previous_label = None            # Заголовок, найденный перед таблицей
+        self.count = 0                        # Число сконвертированных таблиц
+
+        self.workers = config.table_workers if workers is None else workers
+        self.pool: ProcessPoolExecutor | None = None
+        # Таблицы в работе (в порядке документа): заголовок, путь, отпечаток и результат
+        self.pending: deque[tuple[str, str, str | None, Future]] = deque()
+
+    def register(self, dispatcher: BodyDispatcher):
+        """Подписывает конвертер на абзацы и таблицы верхнего уровня."""
+        dispatcher.register('p', self.handle_paragraph)
+        dispatcher.register('tbl', self.handle_table)
+        dispatcher.on_finish(self.finish)
+
+    def handle_paragraph(self, paragraph: Paragraph):
+        """Абзац — пытаемся извлечь заголовок таблицы."""
+        self.previous_label = table_label(paragraph)
+
+    def handle_table(self, word_table: WordTable):
+        """Таблица — конвертируем, если перед ней был заголовок."""
+        if self.previous_label is None:
+            return
+        table_title = self.previous_label
+        self.previous_label = None  # Сбрасываем, чтобы не привязывалось к следующей таблице
+        logger.debug(f"Found a table {table_title}")
+
+        t_id = new_table_id(table_title)
+        path = f"{_table_dir()}/{t_id}.dita"
+
+        # Инкрементальная сборка: таблица с тем же содержимым и заголовком не пересобирается
+        fingerprint = None
+        manifest = get_manifest()
+        if manifest is not None:
+            fingerprint = manifest.fingerprint(word_table.digest(), table_title)
+            if manifest.is_fresh(path, fingerprint):
+                manifest.keep(path, fingerprint, 'tables')
+                self.table_map.add_keydef(table_title, t_id)
+                self.count += 1
+                return
+
+        # Добавляем запись в keydef (связываем заголовок и ID) — в порядке документа
+        self.table_map.add_keydef(table_title, t_id)
+        self.count += 1
+
+        if self.workers <= 1:
+            # В текущем процессе топик не сериализуется заранее — XML выводится прямо в файл
+            ref_topic, error = table_topic(word_table, table_title, t_id, config.process_text_in_tables)
+            self._save(table_title, path, fingerprint,
+                       (lambda stream: write_tree(stream, ref_topic, 'reference'), error))
+            return
+
+        if self.pool is None:
+            # spawn: исполнители не наследуют потоки приёмника и состояние модулей
+            self.pool = ProcessPoolExecutor(max_workers=self.workers,
+                                            mp_context=multiprocessing.get_context('spawn'))
+        future = self.pool.submit(convert_table, word_table, table_title, t_id,
+                                  config.process_text_in_tables)
+        self.pending.append((table_title, path, fingerprint, future))
+
+        # Ограничиваем число таблиц в работе: дописываем самые ранние
+        while len(self.pending) > 2 * self.workers:
+            self._save_next()
+
+    def finish(self):
+        """Дожидается конвертации всех таблиц и сохраняет ключевой словарь таблиц."""
+        try:
+            while self.pending:
+                self._save_next()
+        finally:
+            if self.pool is not None:
+                self.pool.shutdown(cancel_futures=True)
+                self.pool = None
+        self.table_map.save()
+
+    def _save_next(self):
+        """Дожидается самой ранней таблицы в работе и сохраняет её топик."""
+        table_title, path, fingerprint, future = self.pending.popleft()
+        self._save(table_title, path, fingerprint, future.result())
+
+    def _save(self, table_title: str, path: str, fingerprint: str | None,
+              result: tuple[bytes | Callable[[BinaryIO], None], str | None]):
+        """
+        Сохраняет топик таблицы (отложенная запись, режим 'x'): XML из пула
+        или функцию вывода XML прямо в файл, и текст ошибки разбора.
+        """
+        topic_txt, error = result
+        if error is not None:
+            logger.error(f'Failed to parse table {table_title} because of the following error: {error}')
+        write_artifact(path, topic_txt, 'tables', exclusive=True, fingerprint=fingerprint)
 
 
 def process_tables_docx():
     """
     Основная функция обработки всех таблиц из DOCX файла.
     Создаёт reference-топики для каждой таблицы и обновляет ключевой словарь.
+    Отдельный проход по документу; при нескольких этапах используйте BodyDispatcher.
     """
     # Проверяем, что DOCX файл загружен
     if config.docx is None:
         exit("Could not read the docx file.")
     else:
-        root = config.docx.document  # Корень XML документа Word
-        
-        table_map = TableKeyReference()  # Объект для хранения ключевых ссылок (keydef)
-        previous_label = None            # Хранит заголовок таблицы, если он найден перед таблицей
-
-
-        # Проходим по всем элементам тела документа
-        for el in root.iter('{http://schemas.openxmlformats.org/wordprocessingml/2006/main}body/*'):
-            # Если элемент — абзац, пытаемся извлечь заголовок таблицы
-            if el.tag == "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}p*":
-                label = table_label(el)
-                if label is not None:
-                    previous_label = label  # Сохраняем заголовок для следующей таблицы
-
-            # Если элемент — таблица и перед ней был заголовок        
-            elif (el.tag == "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}tbl") and (previous_label is not None):
-                table_title = previous_label
-                logger.debug(f"Found a table {table_title}")
-                previous_label = None  # Сбрасываем, чтобы не привязывалось к следующей таблице
-                
-                try:
-                    # Парсим таблицу из XML Word в объект Table
-                    table = parse_table(el)
-                    table.set_title(table_title)  # Присваиваем заголовок
-                except Exception as e:
-                    # Если парсинг не удался — создаём пустую таблицу
-                    logger.error(f'Failed to parse table {table_title} because of the following error: {e}')
-                    table = _empty_table(table_title)
-
-                # Создаём DITA reference-топик и получаем ID таблицы
-                t_id = create_reference_table(table)
-
-                # Добавляем запись в keydef (связываем заголовок и ID)
-                table_map.add_keydef(table_title, t_id)
-            else:
-                # Все остальные элементы пропускаем
-                pass
-        
-        # Сохраняем ключевой словарь таблиц
-        table_map.save()
\ No newline at end of file
+        dispatcher = BodyDispatcher(config.docx)
+        TableConverter().register(dispatcher)
+        dispatcher.run()
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+Модуль docx_toc.py
+------------------
+Оглавление документа, построенное прямо по стилям заголовков .docx.
+
+Абзац считается заголовком, если его стиль (w:pStyle) или собственные
+свойства абзаца задают уровень структуры (w:outlineLvl); стили разрешаются
+через styles.xml с учётом цепочки basedOn (Docx.styles). Номера разделов
+("1", "1.2", "1.2.3") вычисляются счётчиками по уровням для заголовков
+с автонумерацией; заголовки без нумерации получают пустой номер.
+
+Заголовки определяются по абзацам промежуточного представления
+(dita.models.body.Paragraph). TocExtractor регистрируется в общем проходе
+BodyDispatcher вместе с таблицами, рисунками и иконками (main.process_docx),
+поэтому document.xml разбирается один раз на весь запуск. Результат — те же
+Heading(level, number, title), что и при чтении word.txt (dita.core.toc),
+поэтому ручной экспорт списка разделов не нужен.
+
+Пример:
+    extractor = TocExtractor(config.docx)
+    dispatcher = BodyDispatcher(config.docx)
+    extractor.register(dispatcher)
+    dispatcher.run()
+    for heading in extractor.headings:
+        print(heading.level, heading.number, heading.title)
+"""
+
+import logging
+
+from dita.core.toc import Heading
+from dita.models.body import Paragraph
+from dita.services.docx_body import BodyDispatcher
+
+logger = logging.getLogger(__name__)
+
+
+class TocExtractor:
+    """
+    Выделяет заголовки из абзацев тела документа и нумерует их.
+
+    Можно использовать отдельно (heading) или зарегистрировать в общем
+    проходе по документу (register) — тогда заголовки накапливаются в self.headings.
+
+    Заголовками считаются только абзацы верхнего уровня тела: вложенные абзацы
+    (Paragraph.nested — надписи) в оглавление не входят, их текст — часть текста
+    внешнего абзаца, как и при поиске .//w:t по дереву.
+    """
+
+    def __init__(self, docx):
+        # Документ (dita.services.docx.Docx): нужны стили
+        self.docx = docx
+        # Счётчики номеров по уровням: [1, 2] → следующий заголовок уровня 2 — "1.3"
+        self.counters: list[int] = []
+        # Заголовки, собранные при работе через диспетчер
+        self.headings: list[Heading] = []
+
+    def register(self, dispatcher: BodyDispatcher):
+        """Регистрирует обработчик абзацев в общем проходе по документу."""
+        dispatcher.register('p', self.handle_paragraph)
+
+    def handle_paragraph(self, paragraph: Paragraph):
+        """Сохраняет заголовок, если абзац им является."""
+        heading = self.heading(paragraph)
+        if heading is not None:
+            self.headings.append(heading)
+
+    def heading(self, paragraph: Paragraph) -> Heading | None:
+        """
+        Возвращает заголовок для абзаца или None, если это не заголовок.
+        """
+        level, numbered = self._paragraph_style(paragraph)
+        if level is None:
+            return None
+
+        title = paragraph.text.strip()
+        if not title:
+            return None
+
+        number = ""
+        if numbered:
+            # Следующий номер на своём уровне, более глубокие уровни начинаются заново
+            del self.counters[level:]
+            self.counters.extend([0] * (level - len(self.counters)))
+            self.counters[level - 1] += 1
+            number = ".".join(str(counter) for counter in self.counters)
+        return Heading(level, number, title)
+
+    def _paragraph_style(self, paragraph: Paragraph) -> tuple[int | None, bool]:
+        """
+        Уровень заголовка и наличие нумерации абзаца: собственные свойства
+        абзаца (w:pPr) имеют приоритет над стилем.
+        """
+        level, numbered = None, False
+
+        if paragraph.style is not None:
+            level, numbered = self.docx.styles.get(paragraph.style, (None, False))
+
+        if paragraph.outline is not None:
+            level = paragraph.outline + 1
+            if level > 9:
+                level = None  # w:outlineLvl = 9 — обычный текст
+
+        if paragraph.num_id is not None:
+            numbered = paragraph.num_id != '0'
+        return level, numbered
+
+
+def read_headings(docx) -> list[Heading]:
+    """
+    Отдельный проход по телу документа только ради оглавления — для случаев,
+    когда общего прохода (main.process_docx) нет. Возвращает заголовки по порядку.
+    """
+    extractor = TocExtractor(docx)
+    dispatcher = BodyDispatcher(docx)
+    extractor.register(dispatcher)
+    dispatcher.run()
+    logger.info(f"Found {len(extractor.headings)} headings in the docx")
+    return extractor.headings
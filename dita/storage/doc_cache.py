@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+Модуль doc_cache.py
+-------------------
+Кэш разобранных документов Word (settings.ini: [docx] cache = true).
+
+Повторные запуски на том же .docx (с другими флагами [tables]/[images],
+другим типом документа) не разбирают XML заново: компактные результаты
+разбора сохраняются на диске и читаются при следующем запуске.
+
+Ключ кэша — SHA-256 файла .docx и версия разбора PARSER_VERSION. Каждая
+часть хранится в отдельном файле JSON:
+
+    {cache_dir}/{sha256}/v{PARSER_VERSION}/{part}.json
+
+Части: связи (rels), стили (styles), сноски (footnotes) и блоки тела
+документа (body) — промежуточное представление dita.models.body, переведённое
+в данные функцией blocks_to_data. В кэш попадают только данные, не зависящие
+от настроек, поэтому одна запись служит всем запускам.
+
+Файлы кэша содержат только данные (JSON, без pickle), поэтому чтение чужой
+или подменённой записи не может выполнить код. Но содержимое записи попадает
+в вывод как есть: кэш доверяет своей папке. По умолчанию кэш выключен и лежит
+в папке пользователя (~/.cache/dita-docx), а не в папке вывода; общую папку
+в cache_dir стоит указывать, только если все, кто может в неё писать, доверенные.
+Повреждённая или не подходящая по форме запись считается отсутствующей.
+
+PARSER_VERSION нужно увеличивать при любом изменении разбора или формы
+кэшируемых данных — старые записи тогда просто не читаются.
+
+Пример:
+    cache = DocumentCache("C:/Users/me/.cache/dita-docx", "doc.docx")
+    blocks = cache.get('body', load=blocks_from_data)
+    if blocks is None:
+        blocks = parse_body(...)
+        cache.put('body', blocks, dump=blocks_to_data)
+"""
+
+import os
+import json
+import uuid
+import hashlib
+import logging
+from typing import Any, Callable
+
+logger = logging.getLogger(__name__)
+
+# Версия разбора и формы кэшируемых данных
+PARSER_VERSION = 4
+
+# Размер блока при расчёте хэша .docx
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+class DocumentCache:
+    """
+    Кэш разбора одного документа .docx.
+
+    Аргументы конструктора:
+        root (str): папка кэша ([docx] cache_dir)
+        docx_path (str): путь к .docx (хэш содержимого считается при создании)
+    """
+
+    def __init__(self, root: str, docx_path: str):
+        self.sha256 = _file_sha256(docx_path)
+        self.dir = f"{root}/{self.sha256}/v{PARSER_VERSION}"
+
+    def get(self, part: str, load: Callable[[Any], Any] | None = None) -> Any:
+        """
+        Возвращает часть из кэша или None, если её нет (или файл повреждён).
+        load переводит прочитанные данные JSON в значение части; ошибка load
+        тоже означает, что части в кэше нет.
+        """
+        try:
+            with open(self._path(part), 'rb') as f:
+                data = json.load(f)
+            return load(data) if load is not None else data
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Could not read the cached {part} of the docx, parsing again: {e}")
+            return None
+
+    def put(self, part: str, value: Any, dump: Callable[[Any], Any] | None = None):
+        """
+        Сохраняет часть в кэш; dump переводит значение в данные JSON. Файл записывается во временный и переименовывается,
+        поэтому параллельные запуски на одном документе не видят недописанных частей.
+        Ошибка записи не прерывает конвертацию.
+        """
+        path = self._path(part)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            os.makedirs(self.dir, exist_ok=True)
+            data = dump(value) if dump is not None else value
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not cache the {part} of the docx: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def _path(self, part: str) -> str:
+        """Путь к файлу части."""
+        return f"{self.dir}/{part}.json"
+
+
+def _file_sha256(path: str) -> str:
+    """SHA-256 содержимого файла (читается блоками)."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+Модуль images.py
+----------------
+Контентно-адресуемое хранилище изображений.
+
+Каждое изображение сохраняется один раз под именем, полученным из SHA-256
+его содержимого (например 3f2a...c1.png), поэтому одинаковые логотипы,
+значки и скриншоты внутри одного .docx и во всех документах публикации
+занимают на диске один файл.
+
+Рядом с файлами хранится index.json: соответствие "CRC32-размер" элемента
+архива → имя файла в хранилище. Совпадение по индексу — только кандидат:
+содержимое элемента хэшируется и сверяется с адресом SHA-256 файла, поэтому
+разные изображения с одинаковыми CRC32 и размером не подменяют друг друга.
+Уже сохранённые изображения при этом читаются, но не записываются повторно.
+
+PackageImageStore — вариант для вывода в zip-архив: изображения с теми же
+именами пишутся потоково прямо в архив через ZipSink.
+"""
+
+import os
+import json
+import uuid
+import hashlib
+import logging
+import threading
+import zipfile
+from typing import BinaryIO, Callable
+
+from dita.storage.sink import ZipSink
+
+logger = logging.getLogger(__name__)
+
+# Размер буфера при потоковом копировании изображений
+BUFFER_SIZE = 256 * 1024
+
+
+class ImageStore:
+    """
+    Хранилище изображений с дедупликацией по содержимому.
+
+    Пример:
+        store = ImageStore("C:/output/images")
+        opener = lambda: archive.open(zip_info)
+        name = store.lookup(zip_info, opener) or store.add(zip_info, opener())[0]
+        store.save_index()
+    """
+    INDEX_FILE = "index.json"
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+
+        # "CRC32-размер" → имя файла в хранилище
+        self.index: dict[str, str] = self._load_index()
+        self._lock = threading.Lock()
+
+    def path(self, name: str) -> str:
+        """Возвращает путь к файлу хранилища по его имени."""
+        return f"{self.root}/{name}"
+
+    def lookup(self, arc_file: zipfile.ZipInfo, opener: Callable[[], BinaryIO]) -> str | None:
+        """
+        Ищет уже сохранённое изображение для элемента архива.
+
+        Файл из индекса (по CRC32 и размеру) — только кандидат: содержимое
+        элемента, открытое через opener(), хэшируется без записи на диск и
+        сверяется с именем файла (адресом SHA-256).
+
+        Возвращает:
+            str | None: имя файла в хранилище или None, если изображения ещё нет
+        """
+        name = self.index.get(_index_key(arc_file))
+        if name is None:
+            return None
+        try:
+            if os.path.getsize(self.path(name)) != arc_file.file_size:
+                return None
+        except OSError:
+            return None
+        with opener() as src:
+            if _content_name(arc_file, src)[0] == name:
+                return name
+        logger.debug(f"{arc_file.filename} matches {name} by CRC32 and size only, storing it separately")
+        return None
+
+    def add(self, arc_file: zipfile.ZipInfo, src: BinaryIO) -> tuple[str, int]:
+        """
+        Сохраняет изображение из потока src, если такого содержимого ещё нет.
+        Данные копируются потоково во временный файл с одновременным расчётом хэша.
+
+        Возвращает:
+            tuple[str, int]: имя файла в хранилище и число записанных байт (0 — дубликат)
+        """
+        tmp_path = self.path(f".{uuid.uuid4().hex}.tmp")
+        with open(tmp_path, "wb") as tmp_file:
+            name, written = _content_name(arc_file, src, tmp_file)
+        if os.path.exists(self.path(name)):
+            # Такое изображение уже есть (в этом или другом документе)
+            os.remove(tmp_path)
+            written = 0
+        else:
+            os.replace(tmp_path, self.path(name))
+
+        with self._lock:
+            self.index[_index_key(arc_file)] = name
+        return name, written
+
+    def save_index(self):
+        """
+        Сохраняет индекс на диск, объединяя его с текущим содержимым файла
+        (хранилище может пополняться несколькими процессами).
+        """
+        index = self._load_index()
+        index.update(self.index)
+        tmp_path = self.path(f".{uuid.uuid4().hex}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, ensure_ascii=False, indent=0, sort_keys=True)
+        os.replace(tmp_path, self.path(self.INDEX_FILE))
+        self.index = index
+
+    def _load_index(self) -> dict[str, str]:
+        """Читает index.json; при отсутствии или повреждении возвращает пустой индекс."""
+        try:
+            with open(self.path(self.INDEX_FILE), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read the image store index, rebuilding it: {e}")
+            return {}
+
+
+class PackageImageStore(ImageStore):
+    """
+    Хранилище изображений внутри zip-архива (settings.ini: [output] mode = zip).
+
+    Содержимое сначала хэшируется потоково, затем новое изображение ставится
+    на запись в архив: поток-писатель заново открывает элемент исходного .docx
+    и копирует его буфером, поэтому изображение целиком в памяти не держится.
+    Индекс на диске не ведётся — архив каждый раз создаётся заново.
+
+    Аргументы конструктора:
+        root (str): папка хранилища внутри папки вывода (путь элемента в архиве).
+        sink (ZipSink): приёмник, пишущий архив.
+        source (str): путь к .docx, из которого извлекаются изображения.
+    """
+
+    def __init__(self, root: str, sink: ZipSink, source: str):
+        self.root = root
+        self.sink = sink
+        self.source = source
+        self._lock = threading.Lock()
+
+    def lookup(self, arc_file: zipfile.ZipInfo, opener: Callable[[], BinaryIO]) -> str | None:
+        """
+        Кандидата по индексу пришлось бы всё равно хэшировать, а add() и так только
+        хэширует элемент — поэтому поиск по индексу не выполняется.
+        """
+        return None
+
+    def add(self, arc_file: zipfile.ZipInfo, src: BinaryIO) -> tuple[str, int]:
+        name, _ = _content_name(arc_file, src)
+
+        with self._lock:
+            if self.sink.exists(self.path(name)):
+                return name, 0
+            self.sink.write_stream(self.path(name), lambda: _open_member(self.source, arc_file.filename))
+        return name, arc_file.file_size
+
+    def save_index(self):
+        """Индекс пакета не сохраняется."""
+
+
+def _open_member(archive_path: str, name: str) -> BinaryIO:
+    """Открывает элемент архива в отдельном дескрипторе ZipFile (для потока-писателя)."""
+    # Файл архива закрывается, когда закрыт и ZipFile, и открытый элемент
+    return zipfile.ZipFile(archive_path).open(name)
+
+
+def _content_name(arc_file: zipfile.ZipInfo, src: BinaryIO, copy_to: BinaryIO | None = None) -> tuple[str, int]:
+    """
+    Читает поток src буфером BUFFER_SIZE (копируя данные в copy_to, если задан)
+    и возвращает имя файла в хранилище — первые 32 символа SHA-256 содержимого
+    с расширением элемента — и число прочитанных байт.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    while chunk := src.read(BUFFER_SIZE):
+        digest.update(chunk)
+        if copy_to is not None:
+            copy_to.write(chunk)
+        size += len(chunk)
+    ext = os.path.splitext(arc_file.filename)[1].lower()
+    return f"{digest.hexdigest()[:32]}{ext}", size
+
+
+def _index_key(arc_file: zipfile.ZipInfo) -> str:
+    """Ключ индекса для элемента архива: CRC32 и размер несжатых данных."""
+    return f"{arc_file.CRC:08x}-{arc_file.file_size}"
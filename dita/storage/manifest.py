@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""
+Модуль manifest.py
+------------------
+Манифест сборки для инкрементальной пересборки (settings.ini: [build] incremental = true).
+
+Для каждого созданного файла (топика, таблицы, карты, справочника) манифест
+хранит этап, который его создал, и отпечаток его входных данных: заголовка,
+XML таблицы, содержимого и настроек, влияющих на результат. При повторном
+запуске файл перезаписывается только если отпечаток изменился.
+
+Этапы: 'topics' (топики, карты глав, bookmap), 'tables' (топики таблиц и их
+ключевой словарь), 'images' и 'icons' (справочники). Файлы прошлого запуска,
+которые больше не создаются, удаляются только для этапов, выполненных в этом
+запуске: запуск без оглавления или с [tables] process_docx = false не трогает
+топики и таблицы прошлой сборки. Этап считается выполненным,
+если записал хотя бы один файл — каждый этап в конце сохраняет свою карту
+или справочник.
+
+Манифест также хранит ID, выданные в прошлом запуске (dita.utils.id_registry):
+реестр не считает их занятыми, поэтому повторный запуск получает те же ID
+и не плодит варианты "_1"/"_2".
+
+Файл манифеста: {output_dir}/.manifest-{document_type}.json
+
+При выводе в zip-архив ([output] mode = zip) архив каждый раз создаётся
+заново, поэтому инкрементальная сборка не применяется.
+"""
+
+import io
+import os
+import json
+import hashlib
+import logging
+import threading
+from typing import BinaryIO, Callable
+
+import dita.config.config as config
+from dita.storage.sink import get_sink
+
+logger = logging.getLogger(__name__)
+
+# Версия формата манифеста и правил генерации: при изменении всё пересобирается
+MANIFEST_VERSION = 2
+
+# Настройки dita.config.config, от которых зависит содержимое файлов. Число
+# потоков, кэши и флаги включения этапов на содержимое не влияют
+_OUTPUT_SETTINGS = ('output_dir', 'document_type', 'image_store', 'process_text_in_tables',
+                    'toc_source', 'ids_persist')
+
+
+class BuildManifest:
+    """
+    Манифест одного документа: путь артефакта (относительно output_dir) → (этап, отпечаток).
+    """
+
+    def __init__(self, output_dir: str, document_type: str):
+        self.output_dir = output_dir
+        self.path = f"{output_dir}/.manifest-{document_type}.json"
+        self.config_fingerprint = _config_fingerprint()
+
+        previous = self._load()
+        self.previous: dict[str, tuple[str | None, str | None]] = {}
+        for rel_path, entry in previous.get('artifacts', {}).items():
+            # Манифест первой версии хранил только отпечаток — этап неизвестен
+            stage, fingerprint = entry if isinstance(entry, list) else (None, entry)
+            self.previous[rel_path] = (stage, fingerprint)
+        if previous.get('config') != self.config_fingerprint:
+            # Изменились настройки или версия — прошлые отпечатки недействительны,
+            # но файлы и ID прошлого запуска по-прежнему принадлежат сборке
+            self.previous = {rel_path: (stage, None) for rel_path, (stage, _) in self.previous.items()}
+        self.previous_ids: dict[str, list[str]] = previous.get('ids', {})
+
+        self.current: dict[str, tuple[str, str]] = {}
+        self.skipped = 0      # число файлов, оставленных без изменений
+        self._lock = threading.Lock()
+
+    def fingerprint(self, *parts: bytes | str) -> str:
+        """Отпечаток входных данных артефакта с учётом настроек."""
+        digest = hashlib.sha1(self.config_fingerprint.encode('utf-8'))
+        for part in parts:
+            digest.update(b'\0')
+            digest.update(part.encode('utf-8') if isinstance(part, str) else part)
+        return digest.hexdigest()
+
+    def fingerprint_render(self, render: Callable[[BinaryIO], None]) -> str:
+        """
+        Отпечаток содержимого, которое выводит render(stream) (равен fingerprint(данные)).
+        Вывод хэшируется по мере записи, без буфера с текстом файла.
+        """
+        digest = hashlib.sha1(self.config_fingerprint.encode('utf-8'))
+        digest.update(b'\0')
+        render(_DigestStream(digest))
+        return digest.hexdigest()
+
+    def is_fresh(self, path: str, fingerprint: str) -> bool:
+        """Проверяет, что файл уже создан прошлым запуском из тех же входных данных."""
+        entry = self.previous.get(self._rel(path))
+        return entry is not None and entry[1] == fingerprint and os.path.exists(path)
+
+    def owns(self, path: str) -> bool:
+        """Проверяет, что файл создан прошлым запуском (его можно перезаписывать)."""
+        return self._rel(path) in self.previous
+
+    def record(self, path: str, fingerprint: str, stage: str):
+        """Отмечает артефакт этапа stage как созданный в текущем запуске."""
+        with self._lock:
+            self.current[self._rel(path)] = (stage, fingerprint)
+
+    def keep(self, path: str, fingerprint: str, stage: str):
+        """Отмечает артефакт, который не изменился и не перезаписывается."""
+        self.record(path, fingerprint, stage)
+        with self._lock:
+            self.skipped += 1
+
+    def ids_for(self, directory: str) -> list[str]:
+        """ID, выданные в папке directory прошлым запуском."""
+        return self.previous_ids.get(self._rel(directory), [])
+
+    def save(self, ids: dict[str, list[str]]):
+        """
+        Удаляет устаревшие файлы этапов, выполненных в текущем запуске, и сохраняет
+        манифест. Файлы и ID этапов, которые в этом запуске не выполнялись,
+        переносятся в новый манифест без изменений.
+        Вызывается после close_sink(), когда все файлы уже записаны.
+
+        Аргументы:
+            ids (dict[str, list[str]]): папка → ID, выданные в текущем запуске
+        """
+        artifacts = dict(self.current)
+        stages = {stage for stage, _ in self.current.values()}
+        for rel_path in self.previous.keys() - self.current.keys():
+            stage, fingerprint = self.previous[rel_path]
+            if stage not in stages:
+                # Этап не выполнялся — файл остаётся частью сборки
+                artifacts[rel_path] = (stage, fingerprint)
+                continue
+            try:
+                os.remove(os.path.join(self.output_dir, rel_path))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Could not remove stale artifact {rel_path}: {e}")
+
+        # ID папок, в которых в этом запуске ничего не выдавалось, сохраняются
+        all_ids = dict(self.previous_ids)
+        all_ids.update((self._rel(directory), dir_ids) for directory, dir_ids in ids.items())
+
+        data = {
+            'config': self.config_fingerprint,
+            'artifacts': {rel_path: list(entry) for rel_path, entry in sorted(artifacts.items())},
+            'ids': dict(sorted(all_ids.items())),
+        }
+        os.makedirs(self.output_dir, exist_ok=True)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+        logger.info(f"Build manifest: {len(self.current)} artifacts, {self.skipped} unchanged")
+
+    def _rel(self, path: str) -> str:
+        """Путь относительно output_dir в виде a/b/c."""
+        return os.path.relpath(path, self.output_dir).replace(os.sep, '/')
+
+    def _load(self) -> dict:
+        """Читает манифест прошлого запуска; при отсутствии или повреждении — пустой."""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read the build manifest, rebuilding everything: {e}")
+            return {}
+
+
+def _config_fingerprint() -> str:
+    """Отпечаток настроек, влияющих на результат (_OUTPUT_SETTINGS), и версии манифеста."""
+    settings = {name: getattr(config, name) for name in _OUTPUT_SETTINGS}
+    payload = json.dumps([MANIFEST_VERSION, settings], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+class _DigestStream(io.BufferedIOBase):
+    """Двоичный поток, который только обновляет хэш записанными данными."""
+
+    def __init__(self, digest):
+        self.digest = digest
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.digest.update(data)
+        return len(data)
+
+
+# Манифест текущего запуска (None — инкрементальная сборка выключена)
+_manifest: BuildManifest | None = None
+_manifest_lock = threading.Lock()
+
+
+def get_manifest() -> BuildManifest | None:
+    """
+    Возвращает манифест текущего документа или None, если [build] incremental
+    выключен или вывод идёт в zip-архив.
+    """
+    global _manifest
+    if not config.incremental_build or config.output_mode == 'zip':
+        return None
+    with _manifest_lock:
+        if _manifest is None or _manifest.path != f"{config.output_dir}/.manifest-{config.document_type}.json":
+            _manifest = BuildManifest(config.output_dir, config.document_type)
+        return _manifest
+
+
+def write_artifact(path: str, data: bytes | str | Callable[[BinaryIO], None], stage: str,
+                   exclusive: bool = False, fingerprint: str | None = None):
+    """
+    Записывает артефакт этапа stage ('topics', 'tables', 'images', 'icons')
+    через общий приёмник с учётом манифеста.
+
+    data — содержимое или функция вывода render(stream), которая пишет XML
+    прямо в файл (OutputSink.write_with).
+
+    Без инкрементальной сборки — обычная отложенная запись. Иначе файл
+    пропускается, если его отпечаток (по умолчанию — отпечаток содержимого)
+    не изменился; файлы прошлого запуска перезаписываются без режима 'x'.
+    """
+    manifest = get_manifest()
+    if manifest is not None:
+        if fingerprint is None:
+            fingerprint = manifest.fingerprint_render(data) if callable(data) else manifest.fingerprint(data)
+        if manifest.is_fresh(path, fingerprint):
+            manifest.keep(path, fingerprint, stage)
+            return
+        manifest.record(path, fingerprint, stage)
+        exclusive = exclusive and not manifest.owns(path)
+
+    if callable(data):
+        get_sink().write_with(path, data, exclusive=exclusive)
+    else:
+        get_sink().write(path, data, exclusive=exclusive)
+
+
+def save_manifest(ids: dict[str, list[str]]):
+    """Сохраняет манифест текущего документа (если инкрементальная сборка включена)."""
+    global _manifest
+    manifest = get_manifest()
+    if manifest is not None:
+        manifest.save(ids)
+    with _manifest_lock:
+        _manifest = None
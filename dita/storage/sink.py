@@ -0,0 +1,369 @@
+# -*- coding: utf-8 -*-
+"""
+Модуль sink.py
+--------------
+Общий выходной приёмник (write-behind) для топиков, карт и справочников.
+
+Конвертация ставит запись файла в ограниченную очередь и сразу продолжает
+работу, а пул потоков-писателей открывает, записывает и закрывает файлы.
+На сетевых папках вывода, где каждое открытие файла стоит миллисекунды,
+конвертация больше не ждёт файловую систему.
+
+Ошибки записи не теряются: они накапливаются и возвращаются из flush()/close()
+в порядке постановки операций в очередь, то есть детерминированно.
+
+Карты, таблицы и справочники не сериализуются в память заранее: write_with()
+ставит в очередь функцию вывода, которая в потоке-писателе пишет XML прямо
+в открытый файл (или элемент архива).
+
+В режиме [output] mode = zip вместо дерева папок используется ZipSink:
+все файлы пишутся потоково прямо в один архив для DITA-OT.
+
+Пример:
+    sink = get_sink()
+    sink.write("C:/output/RO/topic/intro.dita", topic_txt, exclusive=True)
+    sink.write_with("C:/output/RO.ditamap", lambda stream: write_tree(stream, bookmap, 'bookmap'))
+    ...
+    errors = close_sink()   # дожидается записи всех файлов
+"""
+
+import os
+import time
+import queue
+import shutil
+import logging
+import zipfile
+import tempfile
+import threading
+from dataclasses import dataclass
+from typing import BinaryIO, Callable
+
+import dita.config.config as config
+
+logger = logging.getLogger(__name__)
+
+# Размер буфера при потоковом копировании
+COPY_BUFFER_SIZE = 256 * 1024
+
+# Сколько вывода функции в режиме zip держится в памяти (больше — во временном файле)
+SPOOL_SIZE = 8 * 1024 * 1024
+
+
+@dataclass
+class OutputError:
+    """Ошибка отложенной записи: порядковый номер операции, путь и исключение."""
+    seq: int
+    path: str
+    error: Exception
+
+    def __str__(self):
+        return f"{self.path}: {self.error}"
+
+
+class OutputSink:
+    """
+    Приёмник с ограниченной очередью и пулом потоков-писателей.
+
+    У каждого потока своя очередь, а операция попадает в очередь по пути файла,
+    поэтому операции над одним файлом выполняются строго в порядке постановки.
+
+    Аргументы конструктора:
+        workers (int): число потоков-писателей; 0 — синхронная запись в вызывающем потоке.
+        queue_size (int): суммарная длина очередей; при заполнении write() ждёт.
+    """
+
+    def __init__(self, workers: int = 4, queue_size: int = 256):
+        self.workers = workers
+        self.queues: list[queue.Queue] = [
+            queue.Queue(maxsize=max(1, queue_size // max(1, workers))) for _ in range(max(0, workers))
+        ]
+        self.threads: list[threading.Thread] = []
+
+        self.errors: list[OutputError] = []
+        self._seq = 0                  # порядковый номер следующей операции
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()   # потоки запускаются один раз, даже при записи из нескольких потоков
+        self._dirs: set[str] = set()   # уже созданные папки
+
+    def write(self, path: str, data: bytes | str, exclusive: bool = False):
+        """
+        Ставит запись файла в очередь.
+
+        Аргументы:
+            path (str): путь к файлу (папки создаются автоматически).
+            data (bytes | str): содержимое; строка записывается в текстовом режиме UTF-8.
+            exclusive (bool): режим 'x' — ошибка, если файл уже существует.
+        """
+        self._submit(path, _write_file, path, data, exclusive)
+
+    def write_with(self, path: str, render: Callable[[BinaryIO], None], exclusive: bool = False):
+        """
+        Ставит в очередь запись файла, содержимое которого выводит render(stream)
+        прямо в открытый двоичный поток файла. Вызывается в потоке-писателе,
+        поэтому данные, из которых выводится файл, после вызова не должны меняться.
+        При ошибке вывода недописанный файл удаляется.
+        """
+        self._submit(path, _render_file, path, render, exclusive)
+
+    def copy(self, src: str, dst: str):
+        """Ставит в очередь копирование файла src → dst."""
+        self._submit(dst, shutil.copy, src, dst)
+
+    def write_stream(self, path: str, opener: Callable[[], BinaryIO]):
+        """
+        Ставит в очередь потоковую запись файла: opener() открывает источник
+        в потоке-писателе, данные копируются буфером без загрузки в память.
+        """
+        self._submit(path, _copy_stream, opener, path)
+
+    def flush(self) -> list[OutputError]:
+        """
+        Дожидается выполнения всех поставленных операций.
+
+        Возвращает:
+            list[OutputError]: накопленные ошибки в порядке постановки операций (список очищается)
+        """
+        if self.threads:
+            for q in self.queues:
+                q.join()
+        with self._lock:
+            errors = sorted(self.errors, key=lambda e: e.seq)
+            self.errors = []
+        return errors
+
+    def close(self) -> list[OutputError]:
+        """
+        Дожидается записи всех файлов, останавливает потоки и сообщает об ошибках.
+
+        Возвращает:
+            list[OutputError]: ошибки записи в порядке постановки операций
+        """
+        errors = self.flush()
+        for q in self.queues:
+            q.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+
+        for error in errors:
+            logger.error(f"Could not write {error}")
+        return errors
+
+    def _submit(self, path: str, func, *args):
+        """Назначает операции порядковый номер и ставит её в очередь (или выполняет сразу)."""
+        with self._lock:
+            seq = self._seq
+            self._seq += 1
+
+        self._ensure_dir(os.path.dirname(path))
+        if self.workers <= 0:
+            self._run(seq, path, func, args)
+            return
+
+        if not self.threads:
+            with self._start_lock:
+                if not self.threads:
+                    self._start()
+        self.queues[hash(path) % len(self.queues)].put((seq, path, func, args))
+
+    def _ensure_dir(self, directory: str):
+        """Создаёт папку один раз за время жизни приёмника."""
+        if directory and directory not in self._dirs:
+            os.makedirs(directory, exist_ok=True)
+            with self._lock:
+                self._dirs.add(directory)
+
+    def _start(self):
+        """Запускает потоки-писатели."""
+        threads = []
+        for idx, q in enumerate(self.queues):
+            thread = threading.Thread(target=self._worker, args=(q,), name=f"dita-sink-{idx}", daemon=True)
+            thread.start()
+            threads.append(thread)
+        self.threads = threads
+
+    def _worker(self, q: queue.Queue):
+        """Цикл потока-писателя: выполняет операции своей очереди, пока не получит None."""
+        while True:
+            item = q.get()
+            try:
+                if item is None:
+                    return
+                self._run(*item)
+            finally:
+                q.task_done()
+
+    def _run(self, seq: int, path: str, func, args: tuple):
+        """Выполняет операцию, сохраняя ошибку вместо выброса исключения."""
+        try:
+            func(*args)
+        except Exception as e:
+            with self._lock:
+                self.errors.append(OutputError(seq, path, e))
+
+
+class ZipSink(OutputSink):
+    """
+    Приёмник, который пишет все файлы в один zip-архив (пакет для DITA-OT).
+
+    Пути файлов берутся относительно папки вывода root. Медиафайлы хранятся
+    без сжатия (ZIP_STORED), XML и прочие файлы — со сжатием (ZIP_DEFLATED).
+    Запись выполняет один поток: zipfile не поддерживает параллельную запись,
+    но конвертация по-прежнему не ждёт файловую систему.
+    """
+    # Расширения файлов, которые хранятся без сжатия
+    STORED_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tif', '.tiff',
+                         '.emf', '.wmf', '.svg', '.webp'}
+
+    def __init__(self, zip_path: str, root: str, queue_size: int = 256):
+        super().__init__(workers=1, queue_size=queue_size)
+        self.zip_path = zip_path
+        self.root = root
+
+        os.makedirs(os.path.dirname(zip_path) or '.', exist_ok=True)
+        self.archive = zipfile.ZipFile(zip_path, 'w', allowZip64=True)
+        # Имена элементов, поставленных в очередь (для дедупликации) и уже записанных (для режима 'x')
+        self.names: set[str] = set()
+        self.written: set[str] = set()
+
+    def exists(self, path: str) -> bool:
+        """Проверяет, что файл уже поставлен на запись в архив."""
+        return self._arcname(path) in self.names
+
+    def write(self, path: str, data: bytes | str, exclusive: bool = False):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        self._submit(path, self._write_member, path, data, exclusive)
+
+    def write_with(self, path: str, render: Callable[[BinaryIO], None], exclusive: bool = False):
+        self._submit(path, self._render_member, path, render, exclusive)
+
+    def copy(self, src: str, dst: str):
+        # Повторное копирование того же файла (например, _null.png) в архив не дублируется
+        if self.exists(dst):
+            return
+        self._submit(dst, self._copy_member, src, dst)
+
+    def write_stream(self, path: str, opener: Callable[[], BinaryIO]):
+        self._submit(path, self._stream_member, path, opener)
+
+    def close(self) -> list[OutputError]:
+        errors = super().close()
+        self.archive.close()
+        return errors
+
+    def _submit(self, path: str, func, *args):
+        with self._lock:
+            self.names.add(self._arcname(path))
+        super()._submit(path, func, *args)
+
+    def _ensure_dir(self, directory: str):
+        """Папки в архиве создавать не нужно."""
+
+    def _arcname(self, path: str) -> str:
+        """Имя элемента архива: путь относительно папки вывода."""
+        return os.path.relpath(path, self.root).replace(os.sep, '/')
+
+    def _zip_info(self, path: str) -> zipfile.ZipInfo:
+        """Описание элемента архива с нужным методом сжатия."""
+        info = zipfile.ZipInfo(self._arcname(path), date_time=time.localtime()[:6])
+        if os.path.splitext(path)[1].lower() in self.STORED_EXTENSIONS:
+            info.compress_type = zipfile.ZIP_STORED
+        else:
+            info.compress_type = zipfile.ZIP_DEFLATED
+        return info
+
+    def _write_member(self, path: str, data: bytes, exclusive: bool):
+        info = self._zip_info(path)
+        if exclusive and info.filename in self.written:
+            raise FileExistsError(f"File exists in the archive: '{info.filename}'")
+        self.archive.writestr(info, data)
+        self.written.add(info.filename)
+
+    def _render_member(self, path: str, render: Callable[[BinaryIO], None], exclusive: bool):
+        """
+        Вывод функции сначала пишется в буфер (в памяти или во временном файле)
+        и попадает в архив, только если render завершилась без ошибки: элемент
+        архива нельзя удалить, а недописанный файл не должен попасть в пакет.
+        """
+        info = self._zip_info(path)
+        if exclusive and info.filename in self.written:
+            raise FileExistsError(f"File exists in the archive: '{info.filename}'")
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE) as buffer:
+            render(buffer)
+            buffer.seek(0)
+            with self.archive.open(info, 'w', force_zip64=True) as dst:
+                shutil.copyfileobj(buffer, dst, COPY_BUFFER_SIZE)
+        self.written.add(info.filename)
+
+    def _copy_member(self, src: str, dst: str):
+        with open(src, 'rb') as src_file:
+            self._stream_member(dst, lambda: src_file)
+
+    def _stream_member(self, path: str, opener: Callable[[], BinaryIO]):
+        info = self._zip_info(path)
+        with opener() as src, self.archive.open(info, 'w', force_zip64=True) as dst:
+            shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
+        self.written.add(info.filename)
+
+
+def _copy_stream(opener: Callable[[], BinaryIO], path: str):
+    """Копирует данные из источника opener() в файл path буфером COPY_BUFFER_SIZE."""
+    with opener() as src, open(path, 'wb') as dst:
+        shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
+
+
+def _render_file(path: str, render: Callable[[BinaryIO], None], exclusive: bool):
+    """Открывает файл path и передаёт поток функции вывода render."""
+    with open(path, "xb" if exclusive else "wb") as f:
+        try:
+            render(f)
+        except BaseException:
+            f.close()
+            os.remove(path)
+            raise
+
+
+def _write_file(path: str, data: bytes | str, exclusive: bool):
+    """Записывает bytes в двоичном режиме, str — в текстовом режиме UTF-8."""
+    mode = "x" if exclusive else "w"
+    if isinstance(data, str):
+        with open(path, mode, encoding="utf-8") as f:
+            f.write(data)
+    else:
+        with open(path, mode + "b") as f:
+            f.write(data)
+
+
+# Приёмник текущего запуска (создаётся при первом обращении)
+_sink: OutputSink | None = None
+_sink_lock = threading.Lock()
+
+
+def get_sink() -> OutputSink:
+    """Возвращает общий приёмник, создавая его по настройкам [output] из settings.ini."""
+    global _sink
+    with _sink_lock:
+        if _sink is None:
+            if config.output_mode == 'zip':
+                _sink = ZipSink(config.output_zip.format(document_type=config.document_type),
+                                config.output_dir, queue_size=config.output_queue_size)
+            else:
+                _sink = OutputSink(workers=config.output_writers, queue_size=config.output_queue_size)
+        return _sink
+
+
+def close_sink() -> list[OutputError]:
+    """
+    Дожидается записи всех файлов общего приёмника и закрывает его.
+    Следующий вызов get_sink() создаст новый приёмник.
+
+    Возвращает:
+        list[OutputError]: ошибки записи в порядке постановки операций
+    """
+    global _sink
+    with _sink_lock:
+        sink, _sink = _sink, None
+    if sink is None:
+        return []
+    return sink.close()
@@ -1,47 +1,64 @@
 # Модуль для генерации сокращенных идентификаторов из заголовков или текстовых фрагметов.
 # Используется для формирования ID элементы документации, названия файлов, ссылок и текстовых идентификаторов
+#
+# Правила из translit_map компилируются один раз при импорте: таблицы str.translate
+# и регулярные выражения заменяют десятки последовательных проходов str.replace по строке.
 import re
-from translit_map import abbrev_clean_words, glasnye_letters, repl_map, translit_dict
+from dita.utils.translit_map import abbrev_clean_words, glasnye_letters, repl_map, translit_dict
+
+# Скомпилированные шаблоны appendix
+_APPENDIX_RE = re.compile(r'Приложение\s[А-Я]')
+_REFERENCE_RE = re.compile(r'\s\(справочное\)\s')
+
+# Служебные слова clean: общий шаблон для быстрой проверки и пары для замены по порядку
+_CLEAN_RE = re.compile('|'.join(re.escape(key) for key in abbrev_clean_words))
+_CLEAN_PAIRS = tuple(abbrev_clean_words.items())
+
+# Замены repl: односимвольные ключи — одна таблица translate; ключи из одних '_' ('__', '___')
+# покрываются схлопыванием подчёркиваний; прочие многосимвольные ключи применяются по порядку
+_REPL_TABLE = str.maketrans({key: value for key, value in repl_map.items() if len(key) == 1})
+_REPL_MULTI = tuple((key, value) for key, value in repl_map.items() if len(key) > 1 and key.strip('_'))
+_UNDERSCORES_RE = re.compile(r'_+')
+
+# Транслитерация: одна таблица translate для всех букв
+_TRANSLIT_TABLE = str.maketrans(translit_dict)
 
 # Заменяет текст 'Приложение Х' на 'appendix', а слово '(справочное)' удаляет
 def appendix(txt):
-    txt = re.sub('Приложение\s[А-Я]', 'appendix', txt)
-    txt = re.sub('\s\(справочное\)\s', ' ', txt)
+    txt = _APPENDIX_RE.sub('appendix', txt)
+    txt = _REFERENCE_RE.sub(' ', txt)
     return txt
 
 # Удаляет из текста служебные слова по шаблону abbrev_clean_words из файла translit_map
 def clean(txt):
     txt = txt.lower()
-    for key in abbrev_clean_words:
-        txt = txt.replace(key, abbrev_clean_words[key])
+    # Замены выполняются в порядке словаря (результат зависит от порядка),
+    # но только если в тексте вообще есть служебные слова
+    if _CLEAN_RE.search(txt) is not None:
+        for key, value in _CLEAN_PAIRS:
+            txt = txt.replace(key, value)
     return txt.strip('_')
 
 # Сокращает слова в тексте до лимита содержания гласных букв по шаблону гласных glasnye_letters из файла translit_map
 def abbreviate(txt):
     gl_limit = 3 # задается лимит гласных для слова
-    finish = False
-    abbreviated = ""
     gl_count = 0
-    for bukva in txt:
-        abbreviated = abbreviated + bukva
-        if finish: break
+    for idx, bukva in enumerate(txt):
         if bukva in glasnye_letters:
             gl_count = gl_count + 1
             if gl_count == gl_limit:
-                finish = True
-    return abbreviated
+                # оставляем слово до лимитной гласной и ещё одну букву после неё
+                return txt[:idx + 2]
+    return txt
 
 # очищает текст от нежелательных символов или заменяет их на '_' по словарю translit_clean_map из файла translit_map
 def repl(txt: str) -> str:
     txt = txt.lower()
-    for key, value in repl_map.items():
+    for key, value in _REPL_MULTI:
         txt = txt.replace(key, value)
-        txt = re.sub(r'_+', '_', txt)
+    txt = _UNDERSCORES_RE.sub('_', txt.translate(_REPL_TABLE))
     return txt.strip('_')
 
 # Выполняет транслитерацию русского текста в латиницу по словарю translit_map из файла translit_map
 def transliterate(name: str) -> str:
-    name = name.lower()
-    for key in translit_dict:
-        name = name.replace(key, translit_dict[key])
-    return name.strip('_')
\ No newline at end of file
+    return name.lower().translate(_TRANSLIT_TABLE).strip('_')
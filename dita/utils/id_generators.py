@@ -5,9 +5,8 @@
 """
 
 from dita.utils.translit import get_proper_id
-from dita.core.topic import validate_id
+from dita.utils.id_registry import claim_id
 import dita.config.config as config
-import os
 
 
 def gen_id(title: str) -> str:
@@ -16,7 +15,7 @@ def gen_id(title: str) -> str:
     """
     base_id = get_proper_id(title)
     output_dir = f"{config.output_dir}/{config.document_type}/topic"
-    return validate_id(output_dir, base_id)
+    return claim_id(output_dir, base_id)
 
 
 def gen_tab_id(title: str) -> str:
@@ -25,7 +24,7 @@ def gen_tab_id(title: str) -> str:
     """
     base_id = get_proper_id(title)
     output_dir = f"{config.output_dir}/{config.document_type}/table"
-    unique_id = validate_id(output_dir, base_id)
+    unique_id = claim_id(output_dir, base_id)
     return f"table_{unique_id}"
 
 
@@ -35,5 +34,5 @@ def gen_img_id(title: str) -> str:
     """
     base_id = get_proper_id(title)
     output_dir = f"{config.output_dir}/{config.document_type}/sp"
-    unique_id = validate_id(output_dir, base_id)
+    unique_id = claim_id(output_dir, base_id)
     return f"img_{unique_id}"
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+Модуль id_registry.py
+---------------------
+Реестр занятых идентификаторов в памяти.
+
+Для каждого пространства имён (папки topic, table, sp внутри
+{output_dir}/{document_type}) реестр один раз читает имена уже существующих
+файлов, а затем проверяет уникальность ID без обращений к файловой системе.
+Для каждого базового ID хранится следующий свободный числовой суффикс, поэтому
+выдача "intro_1", "intro_2", ... не требует перебора.
+
+Опционально (settings.ini: [ids] persist = true) реестр сохраняет выданные
+ID в файл .ids.json внутри папки — это нужно для пространств имён, где ID
+не соответствуют файлам (например, ID рисунков в sp).
+
+Функции:
+    claim_id(output_dir, candidate_id) — выдаёт уникальный ID и резервирует его.
+    get_registry(output_dir)           — реестр пространства имён.
+    claimed_ids()                      — ID, выданные в текущем запуске.
+    save_registries()                  — сохраняет индексы всех реестров.
+"""
+
+import os
+import re
+import json
+import logging
+import threading
+
+import dita.config.config as config
+from dita.storage.manifest import get_manifest
+
+logger = logging.getLogger(__name__)
+
+# Суффикс "_N" в конце идентификатора
+_SUFFIX_RE = re.compile(r'_(\d+)$')
+
+
+class IdRegistry:
+    """
+    Реестр идентификаторов одного пространства имён (одной папки вывода).
+    """
+    INDEX_FILE = ".ids.json"
+
+    def __init__(self, directory: str, extension: str = ".dita", persist: bool = False,
+                 exclude: list[str] | tuple = ()):
+        self.directory = directory
+        self.persist = persist
+
+        # Множество занятых ID: файлы *.dita в папке + сохранённый индекс.
+        # Папку создаёт приёмник при записи (в режиме zip её нет вовсе)
+        self.used: set[str] = set()
+        try:
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(extension):
+                    self.used.add(entry.name[:-len(extension)])
+        except FileNotFoundError:
+            pass
+        if self.persist:
+            self.used.update(self._load_index())
+        # ID прошлого запуска той же сборки (из манифеста) свободны для повторной выдачи
+        self.used.difference_update(exclude)
+
+        # ID, выданные в текущем запуске (в порядке выдачи)
+        self.claimed: list[str] = []
+
+        # Базовый ID → N, такой что base_1 ... base_{N-1} уже заняты
+        self.next_suffix: dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def claim(self, unique_id: str) -> str:
+        """
+        Возвращает уникальный идентификатор и резервирует его.
+        Если ID уже занят — добавляет или увеличивает числовой суффикс (_1, _2, ...).
+        """
+        with self._lock:
+            if unique_id not in self.used:
+                self.used.add(unique_id)
+                self.claimed.append(unique_id)
+                return unique_id
+
+            logger.debug(f"Файл с именем {unique_id} уже существует. Appending '_N'...")
+            m = _SUFFIX_RE.search(unique_id)
+            if m is not None:
+                id_base = unique_id[:m.start()]  # базовая часть id без суффикса
+                start = int(m.group(1)) + 1      # следующий номер после текущего
+            else:
+                id_base = unique_id
+                start = 1
+
+            # Если все номера до next_suffix уже заняты — начинаем сразу с него
+            known = self.next_suffix.get(id_base, 1)
+            inc = max(start, known)
+            while f"{id_base}_{inc}" in self.used:
+                inc += 1
+            if start <= known:
+                self.next_suffix[id_base] = inc + 1
+
+            unique_id = f"{id_base}_{inc}"
+            self.used.add(unique_id)
+            self.claimed.append(unique_id)
+            return unique_id
+
+    def save(self):
+        """Сохраняет занятые ID в индексный файл (только при persist=True)."""
+        if not self.persist:
+            return
+        with self._lock:
+            ids = sorted(self.used)
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, self.INDEX_FILE), "w", encoding="utf-8") as f:
+            json.dump(ids, f, ensure_ascii=False, indent=0)
+
+    def _load_index(self) -> list[str]:
+        """Читает индексный файл; при отсутствии или повреждении возвращает пустой список."""
+        try:
+            with open(os.path.join(self.directory, self.INDEX_FILE), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return []
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read the ID index in {self.directory}: {e}")
+            return []
+
+
+# Папка вывода → реестр
+_registries: dict[str, IdRegistry] = {}
+_registries_lock = threading.Lock()
+
+
+def get_registry(output_dir: str) -> IdRegistry:
+    """
+    Возвращает реестр для папки вывода, создавая его при первом обращении.
+    """
+    with _registries_lock:
+        registry = _registries.get(output_dir)
+        if registry is None:
+            manifest = get_manifest()
+            exclude = manifest.ids_for(output_dir) if manifest is not None else ()
+            registry = _registries[output_dir] = IdRegistry(output_dir, persist=config.ids_persist,
+                                                            exclude=exclude)
+        return registry
+
+
+def claim_id(output_dir: str, candidate_id: str) -> str:
+    """
+    Выдаёт уникальный в папке output_dir идентификатор на основе candidate_id
+    и резервирует его до конца запуска.
+    """
+    return get_registry(output_dir).claim(candidate_id)
+
+
+def claimed_ids() -> dict[str, list[str]]:
+    """Папка → ID, выданные в текущем запуске (для манифеста сборки)."""
+    with _registries_lock:
+        return {directory: list(registry.claimed) for directory, registry in _registries.items()}
+
+
+def save_registries():
+    """
+    Сохраняет индексы всех реестров (если включено [ids] persist) и завершает
+    запуск: следующий документ получит новые реестры.
+    """
+    with _registries_lock:
+        registries = list(_registries.values())
+        _registries.clear()
+    for registry in registries:
+        registry.save()
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+Модуль image_size.py
+--------------------
+Определение размеров изображения (ширина, высота в пикселях) по заголовку
+файла, без декодирования и без записи на диск.
+
+Поддерживаемые форматы: PNG, JPEG, GIF, BMP, TIFF, EMF, WMF (с заголовком
+Aldus Placeable). Из потока читается только начало файла (HEAD_SIZE байт);
+дальше чтение идёт лишь тогда, когда нужные поля лежат за этой границей —
+например, кадр SOF в JPEG после большого блока EXIF или каталог IFD в TIFF.
+
+Поток может быть элементом zip-архива (ZipFile.open), поэтому размеры
+рисунков .docx определяются прямо из архива — в том числе при выводе
+в zip-архив, когда файлы изображений на диск не извлекаются.
+
+Пример:
+    with archive.open("word/media/image1.png") as src:
+        size = image_size(src)  # (640, 480) или None
+"""
+
+import struct
+from typing import BinaryIO
+
+# Сколько байт читается из начала файла сразу
+HEAD_SIZE = 4096
+
+# Маркеры JPEG без поля длины (RSTn, SOI, EOI, TEM)
+_JPEG_STANDALONE = frozenset(range(0xD0, 0xDA)) | {0x01}
+
+# Маркеры кадров SOF (C4 — DHT, C8 — JPG, CC — DAC к кадрам не относятся)
+_JPEG_SOF = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+# Разрешение, к которому приводятся размеры WMF (точек на дюйм)
+_WMF_DPI = 96
+
+
+class _Head:
+    """Начало файла, которое дочитывается из потока по мере необходимости."""
+    __slots__ = ('src', 'data')
+
+    def __init__(self, src: BinaryIO):
+        self.src = src
+        self.data = bytearray(src.read(HEAD_SIZE))
+
+    def get(self, offset: int, size: int) -> bytes | None:
+        """Байты [offset, offset + size) или None, если файл короче."""
+        end = offset + size
+        while len(self.data) < end:
+            chunk = self.src.read(max(end - len(self.data), len(self.data)))
+            if not chunk:
+                return None
+            self.data += chunk
+        return bytes(self.data[offset:end])
+
+
+def image_size(src: BinaryIO) -> tuple[int, int] | None:
+    """
+    Возвращает (ширина, высота) изображения из потока src
+    или None, если формат не распознан или заголовок повреждён.
+    """
+    head = _Head(src)
+    try:
+        for probe in _PROBES:
+            size = probe(head)
+            if size is not None:
+                width, height = size
+                return (width, height) if width > 0 and height > 0 else None
+    except struct.error:
+        pass
+    return None
+
+
+def _png_size(head: _Head) -> tuple[int, int] | None:
+    """PNG: ширина и высота — первые поля блока IHDR."""
+    data = head.get(0, 24)
+    if data is None or data[:8] != b'\x89PNG\r\n\x1a\n' or data[12:16] != b'IHDR':
+        return None
+    return struct.unpack('>II', data[16:24])
+
+
+def _gif_size(head: _Head) -> tuple[int, int] | None:
+    """GIF: размер логического экрана."""
+    data = head.get(0, 10)
+    if data is None or data[:6] not in (b'GIF87a', b'GIF89a'):
+        return None
+    return struct.unpack('<HH', data[6:10])
+
+
+def _jpeg_size(head: _Head) -> tuple[int, int] | None:
+    """JPEG: проход по сегментам до первого кадра SOF."""
+    if head.get(0, 2) != b'\xff\xd8':
+        return None
+    offset = 2
+    while True:
+        byte = head.get(offset, 1)
+        if byte != b'\xff':
+            return None
+        # Байты-заполнители 0xFF перед маркером
+        while byte == b'\xff':
+            offset += 1
+            byte = head.get(offset, 1)
+            if byte is None:
+                return None
+        marker = byte[0]
+        offset += 1
+        if marker in _JPEG_STANDALONE:
+            continue
+        segment = head.get(offset, 7)
+        if segment is None:
+            return None
+        if marker in _JPEG_SOF:
+            height, width = struct.unpack('>HH', segment[3:7])
+            return width, height
+        # Длина сегмента включает сами два байта длины
+        offset += struct.unpack('>H', segment[:2])[0]
+
+
+def _bmp_size(head: _Head) -> tuple[int, int] | None:
+    """BMP: BITMAPCOREHEADER (12 байт) или BITMAPINFOHEADER и новее."""
+    data = head.get(0, 26)
+    if data is None or data[:2] != b'BM':
+        return None
+    if struct.unpack('<I', data[14:18])[0] == 12:
+        return struct.unpack('<HH', data[18:22])
+    # Отрицательная высота — строки хранятся сверху вниз
+    width, height = struct.unpack('<ii', data[18:26])
+    return width, abs(height)
+
+
+def _tiff_size(head: _Head) -> tuple[int, int] | None:
+    """TIFF: теги ImageWidth (256) и ImageLength (257) первого каталога IFD."""
+    data = head.get(0, 8)
+    if data is None or data[:4] not in (b'II*\x00', b'MM\x00*'):
+        return None
+    order = '<' if data[:2] == b'II' else '>'
+    ifd = struct.unpack(f'{order}I', data[4:8])[0]
+    count = head.get(ifd, 2)
+    if count is None:
+        return None
+    entries = head.get(ifd + 2, 12 * struct.unpack(f'{order}H', count)[0])
+    if entries is None:
+        return None
+    tags: dict[int, int] = {}
+    for pos in range(0, len(entries), 12):
+        tag, kind = struct.unpack(f'{order}HH', entries[pos:pos + 4])
+        if tag in (256, 257):
+            # SHORT (3) или LONG (4); значение лежит в самой записи
+            fmt = f'{order}H' if kind == 3 else f'{order}I'
+            tags[tag] = struct.unpack(fmt, entries[pos + 8:pos + 8 + struct.calcsize(fmt)])[0]
+    if 256 not in tags or 257 not in tags:
+        return None
+    return tags[256], tags[257]
+
+
+def _emf_size(head: _Head) -> tuple[int, int] | None:
+    """EMF: границы рисунка rclBounds записи EMR_HEADER (в точках устройства)."""
+    data = head.get(0, 44)
+    if data is None or struct.unpack('<I', data[:4])[0] != 1 or data[40:44] != b' EMF':
+        return None
+    left, top, right, bottom = struct.unpack('<iiii', data[8:24])
+    return right - left + 1, bottom - top + 1
+
+
+def _wmf_size(head: _Head) -> tuple[int, int] | None:
+    """WMF: рамка заголовка Aldus Placeable, приведённая к _WMF_DPI."""
+    data = head.get(0, 16)
+    if data is None or data[:4] != b'\xd7\xcd\xc6\x9a':
+        return None
+    left, top, right, bottom, inch = struct.unpack('<hhhhH', data[6:16])
+    if not inch:
+        return None
+    return (round(abs(right - left) * _WMF_DPI / inch),
+            round(abs(bottom - top) * _WMF_DPI / inch))
+
+
+# Порядок проверки форматов (сигнатуры не пересекаются)
+_PROBES = (_png_size, _jpeg_size, _gif_size, _bmp_size, _tiff_size, _emf_size, _wmf_size)
@@ -1,4 +1,6 @@
+from functools import lru_cache
 from dita.utils.abbrev import appendix, clean, abbreviate, transliterate, repl
+import dita.config.config as config
 
 # Финальная генерация очищенных и сокращенных идентификаторов
 # использует фунции appendix, clean, abbreviate
@@ -19,13 +21,37 @@ def sokr(txt):
     title = " ".join(abbreved)
     return title
 
-# Преобразует текст в корректный идентификатор
-def get_proper_id(title: str) -> str:
+# Преобразует текст в корректный идентификатор (без кэша)
+def _proper_id(title: str) -> str:
     proper_id = sokr(title)
     proper_id = repl(proper_id)
     proper_id = transliterate(proper_id)
     return proper_id
 
+# Кэш идентификаторов: заголовки разделов, таблиц и рисунков часто повторяются
+# (например, "Общие сведения"), а toc и create_topic считают ID одного заголовка дважды.
+# Размер задаётся в settings.ini: [ids] cache_size (0 — без кэша, none — без ограничения)
+_cached_proper_id = lru_cache(maxsize=config.id_cache_size)(_proper_id)
+
+# Преобразует текст в корректный идентификатор
+def get_proper_id(title: str) -> str:
+    return _cached_proper_id(title)
+
+# Задаёт новый размер кэша идентификаторов (кэш и счётчики сбрасываются)
+def set_id_cache_size(maxsize: int | None):
+    global _cached_proper_id
+    _cached_proper_id = lru_cache(maxsize=maxsize)(_proper_id)
+
+# Преобразует список заголовков в идентификаторы за один вызов
+# (повторяющиеся заголовки внутри списка вычисляются один раз)
+def get_proper_ids(titles: list[str]) -> list[str]:
+    ids = {title: get_proper_id(title) for title in dict.fromkeys(titles)}
+    return [ids[title] for title in titles]
+
+# Статистика кэша: hits, misses, maxsize, currsize
+def id_cache_info():
+    return _cached_proper_id.cache_info()
+
 
 
 
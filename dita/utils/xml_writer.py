@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+"""
+Модуль xml_writer.py
+--------------------
+Потоковая запись XML с отступами для карт, таблиц и справочников.
+
+XmlWriter выводит элементы по мере их появления прямо в выходной поток,
+не строя дерево целиком и не выполняя ET.indent (который обходит
+и изменяет каждый узел). Результат побайтно совпадает с
+ET.indent(root) + ET.tostring(root, encoding='utf-8'):
+    - отступ — два пробела на уровень, после последнего дочернего
+      элемента — отступ родителя;
+    - текст и "хвосты" из одних пробельных символов заменяются отступами,
+      непустой текст сохраняется как есть;
+    - пустые элементы записываются как <tag />, комментарии — как <!--text-->;
+    - экранирование совпадает с ElementTree.
+
+Готовые поддеревья ElementTree выводятся методом tree() без изменения
+дерева. Документы с пространствами имён ({uri}tag, например сноски
+w:footnoteReference в ячейках таблиц) функция write_tree() целиком передаёт
+ElementTree: объявления xmlns ставятся на корневой элемент документа.
+
+write_tree() пишет документ прямо в поток — открытый приёмником файл или
+элемент zip-архива (OutputSink.write_with), без промежуточного буфера
+с текстом всего документа; tostring() — то же в байты.
+
+Заголовки XML с DOCTYPE для всех видов файлов DITA собраны в DOCTYPES.
+
+Пример:
+    buffer = io.BytesIO()
+    writer = XmlWriter(buffer, doctype='map')
+    writer.start('map', {'id': 'intro'})
+    writer.element('topicref', attrib={'keys': 'intro', 'href': 'topic/intro.dita'})
+    writer.end()
+    writer.close()
+"""
+
+import io
+from typing import BinaryIO
+import xml.etree.ElementTree as ET
+
+# Объявление XML и DOCTYPE для каждого вида файлов DITA
+DOCTYPES: dict[str, bytes] = {
+    'map': b"""<?xml version="1.0" encoding="UTF-8"?>\n<!DOCTYPE map PUBLIC "-//OASIS//DTD DITA Map//EN" "map.dtd">\n""",
+    'bookmap': b"""<?xml version="1.0" encoding="UTF-8"?>\n<!DOCTYPE bookmap PUBLIC "-//OASIS//DTD DITA BookMap//EN" "bookmap.dtd">\n""",
+    'topic': b"""<?xml version="1.0" encoding="UTF-8"?>\n<!DOCTYPE topic PUBLIC "-//OASIS//DTD DITA Topic//EN" "topic.dtd">\n""",
+    'concept': b"""<?xml version="1.0" encoding="UTF-8"?>\n<!DOCTYPE concept PUBLIC "-//OASIS//DTD DITA Concept//EN" "concept.dtd">\n""",
+    'reference': b"""<?xml version="1.0" encoding="UTF-8"?>\n<!DOCTYPE reference PUBLIC "-//OASIS//DTD DITA Reference//EN" "reference.dtd">\n""",
+}
+
+# Отступ одного уровня
+INDENT = "  "
+
+
+def escape_cdata(text: str) -> str:
+    """Экранирует текст элемента (как ElementTree)."""
+    if "&" in text:
+        text = text.replace("&", "&amp;")
+    if "<" in text:
+        text = text.replace("<", "&lt;")
+    if ">" in text:
+        text = text.replace(">", "&gt;")
+    return text
+
+
+def escape_attrib(text: str) -> str:
+    """Экранирует значение атрибута (как ElementTree)."""
+    if "&" in text:
+        text = text.replace("&", "&amp;")
+    if "<" in text:
+        text = text.replace("<", "&lt;")
+    if ">" in text:
+        text = text.replace(">", "&gt;")
+    if "\"" in text:
+        text = text.replace("\"", "&quot;")
+    if "\r" in text:
+        text = text.replace("\r", "&#13;")
+    if "\n" in text:
+        text = text.replace("\n", "&#10;")
+    if "\t" in text:
+        text = text.replace("\t", "&#09;")
+    return text
+
+
+class _Frame:
+    """Открытый элемент: тег, текст (выводится при первом дочернем элементе) и состояние."""
+    __slots__ = ('tag', 'text', 'has_children', 'tail')
+
+    def __init__(self, tag: str, text: str | None):
+        self.tag = tag
+        self.text = text
+        self.has_children = False
+        # Непробельный "хвост" последнего дочернего элемента (заменяет отступ)
+        self.tail: str | None = None
+
+
+class XmlWriter:
+    """
+    Потоковый писатель XML с отступами.
+
+    Аргументы конструктора:
+        stream (BinaryIO): двоичный поток вывода (файл или io.BytesIO).
+        doctype (str | None): ключ DOCTYPES — заголовок, записываемый первым.
+    """
+
+    def __init__(self, stream: BinaryIO, doctype: str | None = None):
+        if doctype is not None:
+            stream.write(DOCTYPES[doctype])
+        # Текстовая обёртка как в ElementTree: UTF-8, без преобразования переводов строк
+        self._text = io.TextIOWrapper(stream, encoding='utf-8', errors='xmlcharrefreplace', newline='\n')
+        self._write = self._text.write
+        self._stack: list[_Frame] = []
+        # Строки отступов по уровням: "\n", "\n  ", "\n    ", ...
+        self._indents: list[str] = ["\n"]
+
+    def start(self, tag: str, attrib: dict[str, str] | None = None, text: str | None = None):
+        """Открывает элемент; он закрывается вызовом end()."""
+        self._before_child()
+        self._write_start(tag, attrib)
+        self._stack.append(_Frame(tag, text))
+
+    def end(self):
+        """Закрывает последний открытый элемент."""
+        frame = self._stack.pop()
+        write = self._write
+        if frame.has_children:
+            write(frame.tail if frame.tail is not None else self._indent(len(self._stack)))
+            write(f"</{frame.tag}>")
+        elif frame.text:
+            write(f">{escape_cdata(frame.text)}</{frame.tag}>")
+        else:
+            write(" />")
+
+    def element(self, tag: str, text: str | None = None, attrib: dict[str, str] | None = None):
+        """Записывает элемент без дочерних элементов."""
+        self._before_child()
+        self._write_start(tag, attrib)
+        if text:
+            self._write(f">{escape_cdata(text)}</{tag}>")
+        else:
+            self._write(" />")
+
+    def comment(self, text: str):
+        """Записывает комментарий <!--text-->."""
+        self._before_child()
+        self._write(f"<!--{text}-->")
+
+    def tree(self, el: ET.Element):
+        """
+        Записывает готовое поддерево ElementTree на текущем уровне
+        (с отступами, как после ET.indent всего документа). Дерево не изменяется.
+        """
+        self._before_child()
+        level = len(self._stack)
+        if has_namespaces(el):
+            # Объявления xmlns окажутся на корне поддерева, а не документа
+            self._write(_tostring_indented(el, level))
+        else:
+            self._write_tree(el, level)
+        if self._stack and el.tail and el.tail.strip():
+            self._stack[-1].tail = escape_cdata(el.tail)
+        elif not self._stack and el.tail:
+            # Корневой элемент: ElementTree выводит его "хвост" как есть
+            self._write(escape_cdata(el.tail))
+
+    def close(self):
+        """Закрывает все открытые элементы и отсоединяет писатель от потока."""
+        while self._stack:
+            self.end()
+        self._text.flush()
+        self._text.detach()
+
+    def _indent(self, level: int) -> str:
+        """Строка отступа для уровня level."""
+        while len(self._indents) <= level:
+            self._indents.append(self._indents[-1] + INDENT)
+        return self._indents[level]
+
+    def _before_child(self):
+        """Дописывает то, что стоит перед очередным дочерним элементом: '>' и текст или отступ."""
+        if not self._stack:
+            return
+        frame = self._stack[-1]
+        if not frame.has_children:
+            frame.has_children = True
+            self._write(">")
+            if frame.text and frame.text.strip():
+                self._write(escape_cdata(frame.text))
+                return
+        elif frame.tail is not None:
+            self._write(frame.tail)
+            frame.tail = None
+            return
+        self._write(self._indent(len(self._stack)))
+
+    def _write_start(self, tag: str, attrib: dict[str, str] | None):
+        """Записывает начало открывающего тега с атрибутами (без '>')."""
+        if attrib:
+            self._write(f"<{tag}" + "".join(f' {key}="{escape_attrib(value)}"' for key, value in attrib.items()))
+        else:
+            self._write(f"<{tag}")
+
+    def _write_tree(self, el: ET.Element, level: int):
+        """Рекурсивно записывает элемент дерева без его "хвоста"."""
+        write = self._write
+        tag = el.tag
+        if tag is ET.Comment:
+            write(f"<!--{el.text}-->")
+            return
+        if tag is ET.ProcessingInstruction:
+            write(f"<?{el.text}?>")
+            return
+
+        self._write_start(tag, el.attrib)
+        text = el.text
+        if not len(el):
+            if text:
+                write(f">{escape_cdata(text)}</{tag}>")
+            else:
+                write(" />")
+            return
+
+        write(">")
+        child_indent = self._indent(level + 1)
+        write(escape_cdata(text) if text and text.strip() else child_indent)
+        last = len(el) - 1
+        for idx, child in enumerate(el):
+            self._write_tree(child, level + 1)
+            tail = child.tail
+            if tail and tail.strip():
+                write(escape_cdata(tail))
+            else:
+                write(child_indent if idx < last else self._indent(level))
+        write(f"</{tag}>")
+
+
+def write_tree(stream: BinaryIO, el: ET.Element, doctype: str | None = None):
+    """
+    Записывает дерево с отступами (как ET.indent + ET.tostring) и,
+    при необходимости, заголовком DOCTYPES[doctype] в двоичный поток stream.
+
+    Дерево не изменяется; исключение — деревья с пространствами имён,
+    которые форматируются самим ElementTree (ET.indent).
+    """
+    if has_namespaces(el):
+        ET.indent(el)
+        if doctype is not None:
+            stream.write(DOCTYPES[doctype])
+        ET.ElementTree(el).write(stream, encoding='utf-8')
+        return
+
+    writer = XmlWriter(stream, doctype)
+    writer.tree(el)
+    writer.close()
+
+
+def tostring(el: ET.Element, doctype: str | None = None) -> bytes:
+    """Сериализует дерево в байты (см. write_tree)."""
+    buffer = io.BytesIO()
+    write_tree(buffer, el, doctype)
+    return buffer.getvalue()
+
+
+def has_namespaces(el: ET.Element) -> bool:
+    """Проверяет, есть ли в дереве теги или атрибуты с пространствами имён ({uri}name)."""
+    for node in el.iter():
+        tag = node.tag
+        if not isinstance(tag, str):
+            if tag is ET.Comment or tag is ET.ProcessingInstruction:
+                continue
+            return True
+        if tag[:1] == "{" or any(key[:1] == "{" for key in node.attrib):
+            return True
+    return False
+
+
+def _tostring_indented(el: ET.Element, level: int) -> str:
+    """Сериализует поддерево самим ElementTree (для деревьев с пространствами имён)."""
+    copy = ET.fromstring(ET.tostring(el))
+    ET.indent(copy, level=level)
+    copy.tail = None
+    return ET.tostring(copy, encoding='unicode')
@@ -1,101 +1,118 @@
 import dita.config.config as config
-from dita.core.topic import create_topic
-from dita.core.toc import toc
-from dita.core.map import save_map, save_bookmap
-import xml.etree.ElementTree as ET
+from dita.core.toc import heading_source
+from dita.core.book import process_topics
 import os
+import time
+import argparse
+import logging
 from dita.core.tables import process_tables
-from dita.services.docx_tables import process_tables_docx
-from dita.services.docx_images import process_images_docx, process_icons
-from dita.services.docx import Docx
+from dita.services.docx_tables import TableConverter
+from dita.services.docx_images import ImageConverter, IconConverter
+from dita.services.docx_body import BodyDispatcher
+from dita.services.docx_toc import TocExtractor
+from dita.utils.id_registry import save_registries, claimed_ids
+from dita.storage.manifest import save_manifest
+from dita.utils.translit import id_cache_info
+from dita.storage.sink import close_sink
+from dita.services.batch import collect_inputs, check_unique_types, run_batch, format_summary
 
 
-def add_topic_to_map(parent_element: ET.Element, topic_id: str, topic_title: str) -> ET.Element:
+def process_docx(toc_extractor: TocExtractor | None = None):
     """
-    Добавляет ссылку на DITA-топик в карту (map) XML.
-    
-    Параметры:
-        parent_element: родительский XML-элемент (map или topicref)
-        topic_id: уникальный идентификатор топика
-        topic_title: заголовок топика (navtitle)
-    
-    Возвращает:
-        Элемент topicref, добавленный в map
+    Обрабатывает таблицы, рисунки и иконки из .docx за один проход по документу:
+    каждый включённый этап регистрирует свои обработчики в общем диспетчере.
+    toc_extractor, если передан, в том же проходе собирает заголовки оглавления.
     """
-    topicref_element = ET.SubElement(parent_element, 'topicref')
-    topicref_element.set('keys', topic_id)
-    topicref_element.set('href', f'topic/{topic_id}.dita')
-    topicref_element.set('navtitle', topic_title)
-    return topicref_element
+    if config.docx is None:
+        exit("Could not read the docx file.")
 
-def process_topics():
+    dispatcher = BodyDispatcher(config.docx)
+    if toc_extractor is not None:
+        toc_extractor.register(dispatcher)
+    if config.process_tables_in_docx:
+        TableConverter().register(dispatcher)
+    if config.process_images_in_docx:
+        ImageConverter(config.docx).register(dispatcher)
+    if config.process_icons_in_docx:
+        IconConverter(config.docx).register(dispatcher)
+    dispatcher.run()
+
+
+def positive_int(value: str) -> int:
+    """Тип аргумента: целое число не меньше 1."""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"expected a number >= 1, got {value}")
+    return number
+
+
+def parse_args():
     """
-    Основная функция обработки тем документа:
-    1. Создает оглавление из doc_structure.txt
-    2. Генерирует DITA-топики
-    3. Формирует карты (map) с уровневой структурой
+    Разбирает аргументы командной строки. Без аргументов обрабатывается
+    первый .docx (и word.txt) в текущей папке, как раньше.
     """
-    # Генерация файла структуры документа и CSV
-    toc()
-    
-    topic_levels = []  # стек для отслеживания текущих уровней заголовков
-    is_first_map = True  # флаг для создания первой карты
-
-    with open('doc_structure.txt', 'r', encoding='utf-8') as structure_file:
-        for line in structure_file.readlines():
-            line_clean = line.strip('\n')
-            heading = line_clean.strip()
-            
-            # Вычисление уровня заголовка по отступу (4 пробела = 1 уровень)
-            indent_length = len(line_clean) - len(heading)
-            heading_level = int(indent_length / 4) + 1  # определение уровня по отступу (4 пробела)
-
-            # Создание уникального DITA-топика
-            topic_id = create_topic(heading)
-
-            if heading_level == 1:
-                # Заголовки первого уровня создают новую карту
-                if not is_first_map:
-                    save_map(current_map_root)
-                    del current_map_root  # удаляем старую карту из памяти
-                is_first_map = False
-                current_map_root = ET.Element('map')  # корень новой карты
-                parent_element = current_map_root
-            else:
-                # Для второго и более глубокого уровней берем родителя из стека
-                parent_element = topic_levels[heading_level - 2]
-
-            if heading_level > len(topic_levels):
-                # Добавляется новый уровень
-                topicref_element = add_topic_to_map(parent_element, topic_id, heading)
-                topic_levels.append(topicref_element)
-            elif heading_level == len(topic_levels):
-                # Перезапись текущего уровня
-                topicref_element = add_topic_to_map(parent_element, topic_id, heading)
-                topic_levels[heading_level - 1] = topicref_element
-            else:
-                # Удаление лишних уровней
-                while len(topic_levels) > heading_level:
-                    removed = topic_levels.pop()
-                topicref_element = add_topic_to_map(parent_element, topic_id, heading)
-                topic_levels[heading_level - 1] = topicref_element
-
-    save_map(current_map_root) # вызов функции, которая сохраняет текущую DITA-карту (map) в файл
-    save_bookmap() # Сохранение глобальной BookMap с ссылками на все карты
+    parser = argparse.ArgumentParser(description="Конвертация Word-документов в DITA")
+    parser.add_argument('--batch', nargs='+', metavar='PATH[=TYPE]',
+                        help="пакетный режим: .docx файлы или папки с ними; "
+                             "тип документа можно указать через '=' (specs/ro.docx=RO)")
+    parser.add_argument('--jobs', type=positive_int, default=None,
+                        help="число процессов пакетного режима (по умолчанию — число ядер)")
+    parser.add_argument('--type', dest='document_type', default=None,
+                        help="тип документа по умолчанию в пакетном режиме (по умолчанию — имя файла)")
+    parser.add_argument('--output-dir', default=None,
+                        help="папка вывода пакетного режима (по умолчанию — из settings.ini)")
+    return parser.parse_args()
+
+
+def process_batch(args):
+    """
+    Пакетный режим: конвертирует набор .docx файлов в пуле процессов
+    и печатает сводку по каждому файлу и по пакету в целом.
+    """
+    inputs = collect_inputs(args.batch, args.document_type)
+    try:
+        check_unique_types(inputs)
+    except ValueError as e:
+        exit(str(e))
+    started = time.perf_counter()
+    summaries = run_batch(inputs, jobs=args.jobs, output_dir=args.output_dir)
+    print(format_summary(summaries, time.perf_counter() - started))
 
 
 if __name__ == "__main__":
-    if os.path.exists('word.txt'):
-        process_topics()
+    args = parse_args()
+    if args.batch:
+        process_batch(args)
+        raise SystemExit(0)
+
+    source = heading_source()
+    # Оглавление из .docx собирается в том же проходе по документу, что и таблицы с рисунками:
+    # document.xml разбирается один раз, а топики строятся после прохода
+    toc_extractor = TocExtractor(config.docx) if source == 'docx' else None
+
+    if (toc_extractor is not None or config.process_tables_in_docx or config.process_images_in_docx
+            or config.process_icons_in_docx):
+        process_docx(toc_extractor)
+
+    if source is not None:
+        process_topics(toc_extractor.headings if toc_extractor is not None else None)
 
     if os.path.exists('tables.txt') and not config.process_tables_in_docx:
         process_tables()
 
-    if config.process_tables_in_docx:
-        process_tables_docx()
+    # Дожидаемся записи всех файлов; ошибки выводятся в порядке операций
+    write_errors = close_sink()
 
-    if config.process_images_in_docx:
-        process_images_docx()
+    # Сохраняем манифест сборки (если включено [build] incremental)
+    save_manifest(claimed_ids())
 
-    if config.process_icons_in_docx:
-        process_icons()
\ No newline at end of file
+    # Сохраняем реестры выданных ID (если включено [ids] persist)
+    save_registries()
+
+    # Статистика кэша идентификаторов
+    cache = id_cache_info()
+    logging.getLogger(__name__).info(f"ID cache: {cache.hits} hits, {cache.misses} misses, "
+                                     f"{cache.currsize}/{cache.maxsize} entries")
+
+    if write_errors:
+        raise SystemExit(1)
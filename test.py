@@ -0,0 +1,427 @@
+# -*- coding: utf-8 -*-
+"""
+Модуль test.py
+--------------
+Регрессионные тесты конвертера (unittest; запуск: python -m unittest test
+или python -m pytest test.py).
+
+Тесты конвертера собирают небольшой синтетический .docx во временной папке,
+пишут рядом settings.ini и запускают main.py в отдельном процессе — как
+пользователь, поэтому глобальное состояние модулей (настройки, приёмник,
+реестры ID) между тестами не переносится. Модули без такого состояния
+(dita.utils.image_size) проверяются прямо в процессе тестов.
+"""
+
+import os
+import sys
+import json
+import zlib
+import struct
+import zipfile
+import importlib
+import tempfile
+import unittest
+from io import BytesIO
+import subprocess
+import configparser
+import xml.etree.ElementTree as ET
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def import_repo_module(name: str):
+    """
+    Импортирует модуль пакета dita для проверки в текущем процессе. Пакет при
+    импорте читает settings.ini из текущей папки, поэтому импорт — из корня репозитория.
+    """
+    cwd = os.getcwd()
+    sys.path.insert(0, REPO_DIR)
+    os.chdir(REPO_DIR)
+    try:
+        return importlib.import_module(name)
+    finally:
+        os.chdir(cwd)
+
+
+image_size_module = import_repo_module('dita.utils.image_size')
+HEAD_SIZE, image_size = image_size_module.HEAD_SIZE, image_size_module.image_size
+
+NS = ('xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main" '
+      'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships" '
+      'xmlns:wp="http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing" '
+      'xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main" '
+      'xmlns:pic="http://schemas.openxmlformats.org/drawingml/2006/picture" '
+      'xmlns:v="urn:schemas-microsoft-com:vml"')
+
+IMAGE_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/image"
+
+
+def png(width: int, height: int) -> bytes:
+    """Минимальный PNG заданного размера."""
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+    raw = b''.join(b'\x00' + b'\x00' * width * 3 for _ in range(height))
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(raw)) + chunk(b'IEND', b''))
+
+
+def para(text: str, style: str | None = None) -> str:
+    """Абзац <w:p> с одним фрагментом текста."""
+    ppr = f'<w:pPr><w:pStyle w:val="{style}"/></w:pPr>' if style else ''
+    return f'<w:p>{ppr}<w:r><w:t>{text}</w:t></w:r></w:p>'
+
+
+def heading(text: str, level: int = 1) -> str:
+    """Абзац-заголовок: уровень структуры задан в свойствах абзаца (w:outlineLvl)."""
+    return (f'<w:p><w:pPr><w:outlineLvl w:val="{level - 1}"/></w:pPr>'
+            f'<w:r><w:t>{text}</w:t></w:r></w:p>')
+
+
+def picture(rel_id: str) -> str:
+    """Абзац с inline-рисунком."""
+    return ('<w:p><w:r><w:drawing><wp:inline><a:graphic><a:graphicData><pic:pic><pic:nvPicPr/>'
+            f'<pic:blipFill><a:blip r:embed="{rel_id}"/></pic:blipFill></pic:pic>'
+            '</a:graphicData></a:graphic></wp:inline></w:drawing></w:r></w:p>')
+
+
+def textbox(*paragraphs: str) -> str:
+    """Абзац с надписью (VML), внутри которой лежат абзацы paragraphs."""
+    return ('<w:p><w:r><w:pict><v:shape><v:textbox><w:txbxContent>'
+            f'{"".join(paragraphs)}</w:txbxContent></v:textbox></v:shape></w:pict></w:r></w:p>')
+
+
+def table(*cells: str) -> str:
+    """Таблица из одной строки; cells — содержимое ячеек (абзацы)."""
+    columns = ''.join('<w:gridCol/>' for _ in cells)
+    row = ''.join(f'<w:tc>{cell}</w:tc>' for cell in cells)
+    return f'<w:tbl><w:tblGrid>{columns}</w:tblGrid><w:tr>{row}</w:tr></w:tbl>'
+
+
+def make_docx(path: str, body: list[str], media: dict[str, bytes]):
+    """
+    Записывает .docx с телом body; media — rId → содержимое PNG
+    (word/media/image<N>.png в порядке словаря).
+    """
+    document = (f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<w:document {NS}>'
+                f'<w:body>{"".join(body)}<w:sectPr/></w:body></w:document>')
+    rels = ''.join(f'<Relationship Id="{rel_id}" Type="{IMAGE_REL}" Target="media/image{n}.png"/>'
+                   for n, rel_id in enumerate(media, 1))
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('word/document.xml', document)
+        archive.writestr('word/_rels/document.xml.rels',
+                         '<?xml version="1.0"?><Relationships xmlns="http://schemas.openxmlformats.org/'
+                         f'package/2006/relationships">{rels}</Relationships>')
+        archive.writestr('word/styles.xml', '<w:styles xmlns:w="http://schemas.openxmlformats.org/'
+                                            'wordprocessingml/2006/main"/>')
+        for n, data in enumerate(media.values(), 1):
+            archive.writestr(f'word/media/image{n}.png', data)
+
+
+def convert(workdir: str, body: list[str], media: dict[str, bytes], **settings: dict[str, str]) -> str:
+    """
+    Конвертирует документ командой main.py в папке workdir и возвращает папку вывода.
+    settings — переопределения settings.ini по секциям, например output={'mode': 'zip'}.
+    """
+    os.makedirs(workdir)
+    make_docx(os.path.join(workdir, 'doc.docx'), body, media)
+    with open(os.path.join(workdir, 'null.png'), 'wb') as f:
+        f.write(png(1, 1))
+    output_dir = write_settings(workdir, **settings)
+    run_python(workdir, [os.path.join(REPO_DIR, 'main.py')])
+    return output_dir
+
+
+def write_settings(workdir: str, **settings: dict[str, str]) -> str:
+    """
+    Пишет settings.ini в папку workdir (на основе settings.ini репозитория,
+    вывод — в workdir/out, кэш разбора выключен) и возвращает папку вывода.
+    """
+    output_dir = os.path.join(workdir, 'out').replace(os.sep, '/')
+    ini = configparser.ConfigParser()
+    ini.read(os.path.join(REPO_DIR, 'settings.ini'))
+    ini['settings']['output_dir'] = output_dir
+    ini['docx']['cache'] = 'false'
+    for section, values in settings.items():
+        ini[section].update(values)
+    with open(os.path.join(workdir, 'settings.ini'), 'w', encoding='utf-8') as f:
+        ini.write(f)
+    return output_dir
+
+
+def run_python(workdir: str, args: list[str]) -> str:
+    """Запускает Python с аргументами args в папке workdir и возвращает его вывод."""
+    result = subprocess.run([sys.executable, *args], cwd=workdir, check=True, capture_output=True,
+                            env={**os.environ, 'PYTHONPATH': REPO_DIR})
+    return result.stdout.decode('utf-8')
+
+
+def read_output(output_dir: str, rel_path: str, mode: str = 'dir') -> str:
+    """Читает выходной файл из папки вывода или из архива-пакета (mode = zip)."""
+    if mode == 'zip':
+        with zipfile.ZipFile(f"{output_dir}/RO.zip") as archive:
+            return archive.read(rel_path).decode('utf-8')
+    with open(f"{output_dir}/{rel_path}", encoding='utf-8') as f:
+        return f.read()
+
+
+class IncrementalBuildTest(unittest.TestCase):
+    """Инкрементальная сборка ([build] incremental = true, dita.storage.manifest)."""
+
+    BODY = [heading('Общие сведения'), para('Текст'), heading('Состав', 2),
+            para('Таблица 1 – Перечень модулей'), table(para('Модуль'), para('Назначение')),
+            para('Таблица 2 – Параметры'), table(para('Параметр'), para('Значение'))]
+
+    def test_skipped_stage_keeps_its_files(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            workdir = f"{tmp}/doc"
+            out = convert(workdir, self.BODY, {}, build={'incremental': 'true'})
+            tables = sorted(os.listdir(f"{out}/RO/table"))
+            self.assertEqual(len(tables), 2)
+            topics = {name: os.stat(f"{out}/RO/topic/{name}") for name in os.listdir(f"{out}/RO/topic")}
+            self.assertEqual(len(topics), 2)
+
+            # Повторный запуск без этапа таблиц
+            write_settings(workdir, build={'incremental': 'true'}, tables={'process_docx': 'false'})
+            run_python(workdir, [os.path.join(REPO_DIR, 'main.py')])
+
+            # Файлы этапа, который не выполнялся, не удаляются
+            self.assertEqual(sorted(os.listdir(f"{out}/RO/table")), tables)
+            self.assertTrue(os.path.exists(f"{out}/RO/RO-KeyList-Tables.ditamap"))
+            # Неизменившиеся топики не перезаписываются
+            self.assertEqual(sorted(os.listdir(f"{out}/RO/topic")), sorted(topics))
+            for name, before in topics.items():
+                with self.subTest(topic=name):
+                    after = os.stat(f"{out}/RO/topic/{name}")
+                    self.assertEqual((after.st_ino, after.st_mtime_ns), (before.st_ino, before.st_mtime_ns))
+            # ID прошлого запуска выдаются повторно, без суффиксов "_1"
+            self.assertFalse([name for name in os.listdir(f"{out}/RO/topic") if name.endswith('_1.dita')])
+
+
+class ZipOutputTest(unittest.TestCase):
+    """Вывод в zip-архив ([output] mode = zip) совпадает с выводом в папки."""
+
+    BODY = [para('Текст'), picture('rId5'), para('Рисунок 1 – Схема системы'),
+            para('Иконка'), picture('rId6')]
+    MEDIA = {'rId5': png(800, 600), 'rId6': png(16, 16)}
+
+    def test_icons_and_widths_match_dir_mode(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            dir_out = convert(f"{tmp}/dir", self.BODY, self.MEDIA)
+            zip_out = convert(f"{tmp}/zip", self.BODY, self.MEDIA, output={'mode': 'zip'})
+            for rel_path in ('RO/sp/ro-img_list.dita', 'RO/sp/ro-icon_list.dita'):
+                with self.subTest(rel_path=rel_path):
+                    self.assertEqual(read_output(zip_out, rel_path, 'zip'), read_output(dir_out, rel_path))
+
+            icons = read_output(zip_out, 'RO/sp/ro-icon_list.dita', 'zip')
+            self.assertIn('id="rId6"', icons)
+            self.assertNotIn('id="rId5"', icons)
+            self.assertIn('width="640"', read_output(zip_out, 'RO/sp/ro-img_list.dita', 'zip'))
+
+
+def jpeg(width: int, height: int, exif_size: int = 0, sof: int = 0xC0) -> bytes:
+    """Заголовок JPEG: SOI, блок APP1 (EXIF) размером exif_size и кадр SOF."""
+    data = b'\xff\xd8'
+    if exif_size:
+        data += b'\xff\xe1' + struct.pack('>H', exif_size + 2) + b'E' * exif_size
+    # Байт-заполнитель 0xFF перед маркером кадра допустим
+    return data + b'\xff\xff' + bytes([sof]) + struct.pack('>HBHHB', 17, 8, height, width, 3) + b'\x00' * 9
+
+
+def tiff(width: int, height: int, order: str = '<', kind: int = 3, ifd: int = 8) -> bytes:
+    """Заголовок TIFF с каталогом IFD по смещению ifd (теги ширины и высоты типа kind)."""
+    fmt = 'H' if kind == 3 else 'I'
+
+    def entry(tag: int, value: int) -> bytes:
+        return struct.pack(f'{order}HHI', tag, kind, 1) + struct.pack(f'{order}{fmt}', value).ljust(4, b'\x00')
+    magic = b'II*\x00' if order == '<' else b'MM\x00*'
+    header = magic + struct.pack(f'{order}I', ifd)
+    return (header.ljust(ifd, b'\x00') + struct.pack(f'{order}H', 2)
+            + entry(256, width) + entry(257, height) + b'\x00' * 4)
+
+
+def bmp(width: int, height: int, core: bool = False) -> bytes:
+    """Заголовок BMP: BITMAPCOREHEADER или BITMAPINFOHEADER (строки сверху вниз)."""
+    if core:
+        return b'BM' + b'\x00' * 12 + struct.pack('<IHH', 12, width, height) + b'\x00' * 4
+    return b'BM' + b'\x00' * 12 + struct.pack('<Iii', 40, width, -height) + b'\x00' * 28
+
+
+def emf(width: int, height: int) -> bytes:
+    """Запись EMR_HEADER с границами рисунка rclBounds."""
+    return (struct.pack('<II', 1, 88) + struct.pack('<iiii', 10, 20, 10 + width - 1, 20 + height - 1)
+            + b'\x00' * 16 + b' EMF' + b'\x00' * 44)
+
+
+def wmf(right: int, bottom: int, inch: int) -> bytes:
+    """Заголовок WMF Aldus Placeable с рамкой (0, 0, right, bottom) в единицах inch на дюйм."""
+    return b'\xd7\xcd\xc6\x9a' + struct.pack('<HhhhhH', 0, 0, 0, right, bottom, inch) + b'\x00' * 6
+
+
+class ImageSizeTest(unittest.TestCase):
+    """Размеры изображения по заголовку файла (dita.utils.image_size)."""
+
+    CASES = [
+        ('png', png(800, 600), (800, 600)),
+        ('gif', b'GIF89a' + struct.pack('<HH', 32, 16) + b'\x00' * 3, (32, 16)),
+        ('gif87a', b'GIF87a' + struct.pack('<HH', 1, 2) + b'\x00' * 3, (1, 2)),
+        ('jpeg', jpeg(640, 480), (640, 480)),
+        ('jpeg progressive', jpeg(320, 200, sof=0xC2), (320, 200)),
+        ('jpeg sof after large exif', jpeg(1024, 768, exif_size=3 * HEAD_SIZE), (1024, 768)),
+        ('bmp info header', bmp(300, 200), (300, 200)),
+        ('bmp core header', bmp(30, 20, core=True), (30, 20)),
+        ('tiff little endian short', tiff(1200, 900), (1200, 900)),
+        ('tiff big endian long', tiff(70000, 50, order='>', kind=4), (70000, 50)),
+        ('tiff ifd past head', tiff(640, 480, ifd=HEAD_SIZE + 100), (640, 480)),
+        ('emf', emf(400, 300), (400, 300)),
+        ('wmf', wmf(1440, 720, 1440), (96, 48)),
+    ]
+
+    BROKEN = [
+        ('empty', b''),
+        ('unknown format', b'not an image at all' * 10),
+        ('png truncated', png(800, 600)[:20]),
+        ('gif truncated', b'GIF89a\x20'),
+        ('jpeg truncated in exif', jpeg(640, 480, exif_size=3 * HEAD_SIZE)[:2 * HEAD_SIZE]),
+        ('jpeg without sof', b'\xff\xd8\xff\xd9'),
+        ('tiff ifd beyond end', tiff(640, 480)[:8] + b'\x00' * 4),
+        ('tiff without size tags', b'II*\x00' + struct.pack('<IH', 8, 0)),
+        ('bmp truncated', bmp(300, 200)[:20]),
+        ('emf truncated', emf(400, 300)[:30]),
+        ('wmf zero inch', wmf(1440, 720, 0)),
+        ('zero width', png(0, 600)),
+    ]
+
+    def test_sizes(self):
+        for name, data, expected in self.CASES:
+            with self.subTest(name):
+                self.assertEqual(image_size(BytesIO(data)), expected)
+
+    def test_broken_headers(self):
+        for name, data in self.BROKEN:
+            with self.subTest(name):
+                self.assertIsNone(image_size(BytesIO(data)))
+
+    def test_reads_only_the_head(self):
+        src = BytesIO(png(16, 16) + b'\x00' * (10 * HEAD_SIZE))
+        self.assertEqual(image_size(src), (16, 16))
+        self.assertLessEqual(src.tell(), HEAD_SIZE)
+
+
+class ZipSinkTest(unittest.TestCase):
+    """Приёмник ZipSink: ошибка функции вывода не оставляет элемента в архиве."""
+
+    SCRIPT = """
+import sys, zipfile
+from dita.storage.sink import ZipSink
+def broken(stream):
+    stream.write(b'<map>')
+    raise ValueError('render failed')
+sink = ZipSink('out/RO.zip', 'out')
+sink.write_with('out/RO/broken.ditamap', broken)
+sink.write_with('out/RO/good.ditamap', lambda stream: stream.write(b'<map/>'))
+errors = sink.close()
+with zipfile.ZipFile('out/RO.zip') as archive:
+    print(len(errors), archive.testzip(), sorted(archive.namelist()), archive.read('RO/good.ditamap'))
+"""
+
+    def test_failed_render_leaves_no_member(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            write_settings(tmp)
+            output = run_python(tmp, ['-c', self.SCRIPT]).strip()
+        self.assertEqual(output, "1 None ['RO/good.ditamap'] b'<map/>'")
+
+
+class TextBoxTest(unittest.TestCase):
+    """Абзацы надписей (вложенные <w:p>) обрабатываются так же, как при обходе дерева."""
+
+    BODY = [para('Текст'), textbox(picture('rId5'), para('Рисунок 1 – В надписи')),
+            table(para('Ячейка'), textbox(para('Надпись в ячейке'))),
+            para('Заголовок', 'Heading1')]
+    MEDIA = {'rId5': png(800, 600)}
+
+    # Промежуточное представление блоков тела: текст и рисунок каждого абзаца блока
+    IR_SCRIPT = """
+import json, zipfile
+import xml.etree.ElementTree as ET
+from dita.services.docx_body import build_block
+with zipfile.ZipFile('doc.docx') as archive:
+    body = ET.fromstring(archive.read('word/document.xml'))[0]
+blocks = [build_block(el) for el in body]
+print(json.dumps([[[p.text, p.image] for p in block.paragraphs] if block else None for block in blocks]))
+"""
+
+    def test_figure_in_text_box_reaches_image_list(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            out = convert(f"{tmp}/doc", self.BODY, self.MEDIA)
+            self.assertIn('<fig id="img_v_nadpisi">', read_output(out, 'RO/sp/ro-img_list.dita'))
+
+    def test_blocks_match_etree_walk(self):
+        w = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+        with tempfile.TemporaryDirectory() as tmp:
+            make_docx(f"{tmp}/doc.docx", self.BODY, self.MEDIA)
+            write_settings(tmp)
+            ir = json.loads(run_python(tmp, ['-c', self.IR_SCRIPT]))
+            with zipfile.ZipFile(f"{tmp}/doc.docx") as archive:
+                body = ET.fromstring(archive.read('word/document.xml'))[0]
+
+        # Обход дерева: все абзацы блока, текст — все <w:t> абзаца, рисунок — первый <a:blip> абзаца с <pic:pic>
+        expected = []
+        for el in body:
+            if el.tag not in (f'{w}p', f'{w}tbl'):
+                expected.append(None)
+                continue
+            paragraphs = []
+            for p in el.iter(f'{w}p'):
+                pic = p.find('.//pic:pic', {'pic': 'http://schemas.openxmlformats.org/drawingml/2006/picture'})
+                blip = p.find('.//a:blip', {'a': 'http://schemas.openxmlformats.org/drawingml/2006/main'})
+                image = None
+                if pic is not None and len(pic) and blip is not None:
+                    image = blip.get('{http://schemas.openxmlformats.org/officeDocument/2006/relationships}embed')
+                paragraphs.append([''.join(t.text or '' for t in p.iter(f'{w}t')), image])
+            expected.append(paragraphs)
+        self.assertEqual(ir, expected)
+
+
+class BatchTest(unittest.TestCase):
+    """Пакетный режим (main.py --batch)."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.workdir = self.tmp.name
+        for name, title in (('one', 'Общие сведения'), ('two', 'Назначение')):
+            os.makedirs(f"{self.workdir}/{name}")
+            make_docx(f"{self.workdir}/{name}/spec.docx",
+                      [heading(title), para('Текст'), heading('Состав', 2)], {})
+        with open(f"{self.workdir}/null.png", 'wb') as f:
+            f.write(png(1, 1))
+        self.output_dir = write_settings(self.workdir)
+
+    def batch(self, *args: str) -> subprocess.CompletedProcess:
+        return subprocess.run([sys.executable, os.path.join(REPO_DIR, 'main.py'), '--batch', *args],
+                              cwd=self.workdir, capture_output=True, env={**os.environ, 'PYTHONPATH': REPO_DIR})
+
+    def test_topics_are_built_from_docx_headings(self):
+        result = self.batch('one/spec.docx=ONE', 'two/spec.docx=TWO')
+        self.assertEqual(result.returncode, 0, result.stderr)
+        summary = result.stdout.decode('utf-8')
+        self.assertIn('[ONE]: topics=2 ', summary)
+        self.assertIn('[TWO]: topics=2 ', summary)
+        self.assertTrue(os.path.exists(f"{self.output_dir}/ONE/topic/obschie_svedeniya.dita"))
+        self.assertEqual(len(os.listdir(f"{self.output_dir}/TWO/topic")), 2)
+        self.assertIn('ONE.ditamap', os.listdir(self.output_dir))
+        self.assertIn('TWO.ditamap', os.listdir(self.output_dir))
+
+    def test_duplicate_types_are_rejected(self):
+        result = self.batch('one', 'two')  # обе папки дают тип "spec"
+        self.assertNotEqual(result.returncode, 0)
+        self.assertIn('share a document type', result.stderr.decode('utf-8'))
+        self.assertFalse(os.path.exists(f"{self.output_dir}/spec"))
+
+    def test_jobs_must_be_positive(self):
+        result = self.batch('one/spec.docx=ONE', '--jobs', '0')
+        self.assertEqual(result.returncode, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()